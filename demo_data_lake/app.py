@@ -21,7 +21,7 @@ aws_env = cdk.Environment(account=props.account, region=props.region)
 
 DataLakeStack(app, "DataLakeStack", env=aws_env, props=props)
 
-EtlStack(app, "EtlStack", env=aws_env)
+EtlStack(app, "EtlStack", env=aws_env, props=props)
 
 ExampleStack(app, "ExampleStack", env=aws_env
     )
@@ -0,0 +1,197 @@
+"""
+End-to-end run of scrape -> landing -> processed -> published without AWS, timed per stage.
+
+    python benchmarks/benchmark_pipeline.py --targets 20 --rows 1000 --runs 5
+    python benchmarks/benchmark_pipeline.py --backend moto --output-format jsonl --compression zstd
+
+Targets are synthetic pages served from a local HTTP stand-in. Buckets are directories under a temporary
+LOCAL_ROOT, or buckets of an in-process moto server reached through LOCAL_ENDPOINT_URL with --backend moto.
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from scraper_fixtures import SCRAPER_DIR, TEMPLATE_PAGE, serve, synthetic_page
+
+BUCKETS = {"landing": "pipeline-landing", "processed": "pipeline-processed", "published": "pipeline-published"}
+LANDING_PREFIX = "population_scrape/"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def local_backend(backend: str, work_dir: str) -> Iterator[Dict[str, str]]:
+    """
+    Environment that routes the pipeline's S3 calls to a directory or to an in-process moto server
+    """
+    if backend == "local":
+        yield {"LOCAL_ROOT": os.path.join(work_dir, "lake")}
+        return
+
+    import boto3
+    from moto.server import ThreadedMotoServer
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "local")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "local")
+    port = free_port()
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    try:
+        endpoint_url = f"http://127.0.0.1:{port}"
+        client = boto3.client("s3", endpoint_url=endpoint_url)
+        for bucket in BUCKETS.values():
+            client.create_bucket(Bucket=bucket)
+        yield {"LOCAL_ENDPOINT_URL": endpoint_url}
+    finally:
+        server.stop()
+
+
+def write_pages(directory: str, targets: int, rows: int, template: str) -> List[str]:
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for index in range(targets):
+        name = f"target-{index:03d}"
+        with open(os.path.join(directory, f"{name}.html"), "w", encoding="utf-8") as f:
+            f.write(synthetic_page(rows, template, seed=index))
+        names.append(name)
+    return names
+
+
+def load_module(name: str, filename: str):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRAPER_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def timed(func) -> Dict[str, Any]:
+    started = time.perf_counter()
+    # the scraper prints EMF metrics to stdout, keep them out of the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        res = func()
+    return {"ms": round((time.perf_counter() - started) * 1000, 3), "result": res}
+
+
+def run_pipeline(args, work_dir: str) -> Dict[str, Any]:
+    pages_dir = os.path.join(work_dir, "pages")
+    names = write_pages(pages_dir, args.targets, args.rows, args.template)
+
+    with serve(pages_dir) as url_template, local_backend(args.backend, work_dir) as backend_env:
+        os.environ.update(backend_env)
+        os.environ.update({
+            "S3_BUCKET": BUCKETS["landing"],
+            "S3_PATH": LANDING_PREFIX,
+            "TARGETS": json.dumps(names),
+            "TARGET_URL_TEMPLATE": url_template,
+            "EXTRACTION_BACKEND": "http",
+            "OUTPUT_FORMAT": args.output_format,
+            "COMPRESSION": args.compression,
+            "CHANGE_DETECTION": args.change_detection,
+            "MAX_WORKERS": str(args.workers),
+            "POWERTOOLS_LOG_LEVEL": "WARNING",
+            "AWS_DEFAULT_REGION": os.environ.get("AWS_DEFAULT_REGION", "us-east-1"),
+        })
+        # the scraper picks its landing store from the environment at import
+        scraper = load_module("population_scraper_lambda", "lambda.py")
+        from object_store import configured_store
+        from landing_reader import parse_landing_key
+        import compaction
+        import published_layer
+
+        targets = scraper.load_targets(None, os.environ["TARGETS"], LANDING_PREFIX, "", url_template)
+        stores = {zone: configured_store(bucket) for zone, bucket in BUCKETS.items()}
+
+        stages: Dict[str, Any] = {"scrape_runs_ms": []}
+        started = datetime(2025, 1, 1, 8, tzinfo=timezone.utc)
+        for run in range(args.runs):
+            # a week apart so runs spread over several monthly partitions
+            run_time = started + timedelta(weeks=run)
+            scrape = timed(lambda: scraper.scrape_targets(targets, run_time, args.workers))
+            failed = [res for res in scrape["result"] if res["status"] != "succeeded"]
+            if failed:
+                raise RuntimeError(f"Scrape failed: {failed[0]}")
+            stages["scrape_runs_ms"].append(scrape["ms"])
+
+        compact = timed(lambda: compaction.run_compaction(stores["landing"], stores["processed"], stores["published"], LANDING_PREFIX))
+        # nothing changed since, measures the incremental check on its own
+        recheck = timed(lambda: compaction.run_compaction(stores["landing"], stores["processed"], stores["published"], LANDING_PREFIX))
+
+        publish = timed(lambda: published_layer.run_publish(stores["processed"], stores["published"]))
+        republish = timed(lambda: published_layer.run_publish(stores["processed"], stores["published"]))
+
+        # manifests and change detection state are left out
+        landing_objects = [obj for obj in stores["landing"].list_objects(LANDING_PREFIX) if parse_landing_key(obj.key)]
+        stages.update({
+            "scrape_run_median_ms": sorted(stages["scrape_runs_ms"])[len(stages["scrape_runs_ms"]) // 2],
+            "compaction_ms": compact["ms"],
+            "compaction_partitions": len(compact["result"]),
+            "compaction_rows": sum(res["rows"] for res in compact["result"]),
+            "compaction_recheck_ms": recheck["ms"],
+            "publish_ms": publish["ms"],
+            "publish_partitions": len(publish["result"]),
+            "publish_recheck_ms": republish["ms"],
+            "landing_objects": len(landing_objects),
+            "landing_bytes": sum(obj.size for obj in landing_objects),
+        })
+        return stages
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the population pipeline end to end without AWS.")
+    parser.add_argument("--backend", choices=["local", "moto"], default="local")
+    parser.add_argument("--targets", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=100, help="Rows per target page, the scraper reads up to 100")
+    parser.add_argument("--runs", type=int, default=3, help="Scrape runs, one week apart")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--output-format", default="parquet")
+    parser.add_argument("--compression", default="none")
+    parser.add_argument("--change-detection", default="off")
+    parser.add_argument("--template", default=TEMPLATE_PAGE)
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory for inspection")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="pipeline-benchmark-")
+    try:
+        stages = run_pipeline(args, work_dir)
+    finally:
+        if args.keep:
+            print(f"Working directory kept at {work_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+        },
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "template", "keep")},
+        "stages": stages,
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
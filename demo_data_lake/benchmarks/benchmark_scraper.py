@@ -0,0 +1,190 @@
+"""
+Per-phase timings of a population scrape against replayed pages, so the lambda timeout budget can be split
+between driver startup, page load, table extraction, row validation, serialization and upload.
+
+    python benchmarks/benchmark_scraper.py --sizes 10,100,1000 --output scraper.json
+    python benchmarks/benchmark_scraper.py --backend selenium --chrome-binary /opt/chrome/chrome --chrome-driver /opt/chromedriver
+
+Pages are synthetic tables built on the recorded page layout and served from a local HTTP stand-in,
+uploads go to a directory standing in for S3 unless --s3-endpoint points at a local S3 such as moto_server.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+from urllib.request import Request, urlopen
+
+from scraper_fixtures import SCRAPER_DIR, TEMPLATE_PAGE, serve, write_synthetic_pages
+
+PHASES = ["driver_startup", "page_load", "table_extraction", "validation", "serialization", "upload"]
+
+
+def load_scraper(chrome_binary: str, chrome_driver: str):
+    os.environ["LOCAL"] = "true"
+    os.environ["CHROME_BINARY"] = chrome_binary
+    os.environ["CHROME_DRIVER"] = chrome_driver
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+    # lambda.py can't be imported by name since lambda is a keyword
+    spec = importlib.util.spec_from_file_location("population_scraper_lambda", os.path.join(SCRAPER_DIR, "lambda.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def timed(timings: Dict[str, float], phase: str, func: Callable[[], Any]) -> Any:
+    started = time.perf_counter()
+    res = func()
+    timings[phase] = (time.perf_counter() - started) * 1000
+    return res
+
+
+def landing_store(args, local_root: str):
+    from object_store import LocalObjectStore, S3ObjectStore
+
+    if args.s3_endpoint:
+        import boto3
+
+        client = boto3.client("s3", endpoint_url=args.s3_endpoint)
+        client.create_bucket(Bucket=args.bucket)
+        return S3ObjectStore(args.bucket, client)
+    return LocalObjectStore(os.path.join(local_root, args.bucket))
+
+
+def http_run(scraper, url: str, rows: int, timings: Dict[str, float]):
+    from http_extractor import USER_AGENT, parse_table_html
+
+    def load_page() -> str:
+        request = Request(url, headers={"User-Agent": USER_AGENT, "Accept": "text/html"})
+        with urlopen(request, timeout=30) as response:
+            return response.read().decode(response.headers.get_content_charset() or "utf-8")
+
+    timings["driver_startup"] = 0.0
+    html = timed(timings, "page_load", load_page)
+    return timed(timings, "table_extraction", lambda: parse_table_html(html, rows))
+
+
+def selenium_run(scraper, url: str, rows: int, timings: Dict[str, float], mode: str):
+    temp_root = tempfile.mkdtemp(prefix="chrome-")
+    driver = timed(timings, "driver_startup", lambda: scraper.create_chrome_driver(temp_root))
+    try:
+        def load_page():
+            driver.get(url)
+            scraper.WebDriverWait(driver, 30).until(
+                scraper.EC.presence_of_element_located((scraper.By.CLASS_NAME, "wpr-table"))
+            )
+
+        timed(timings, "page_load", load_page)
+        return timed(timings, "table_extraction", lambda: scraper.SELENIUM_TABLE_READERS[mode](driver, rows))
+    finally:
+        driver.quit()
+        shutil.rmtree(temp_root, ignore_errors=True)
+
+
+def scrape_once(scraper, args, store, url: str, rows: int, output_format: str) -> Dict[str, Any]:
+    timings: Dict[str, float] = {}
+    if args.backend == "selenium":
+        headers, table_rows = selenium_run(scraper, url, rows, timings, args.selenium_mode)
+    else:
+        headers, table_rows = http_run(scraper, url, rows, timings)
+    if len(table_rows) != rows:
+        raise RuntimeError(f"Expected {rows} rows, extracted {len(table_rows)}")
+
+    normalized = timed(timings, "validation", lambda: scraper.normalization.normalize_rows(headers, table_rows))
+    if normalized.bad_rows:
+        raise RuntimeError(f"Extracted rows failed validation: {normalized.report()}")
+
+    scrape_time = datetime.now(timezone.utc)
+    output = timed(timings, "serialization", lambda: scraper.serialize_rows(headers, table_rows, scrape_time, output_format))
+    key = scraper.create_s3_key(f"benchmark/{output_format}/{rows}", scrape_time, "population_ranks", output.file_type)
+    timed(timings, "upload", lambda: store.put(key, output.body, output.content_type))
+    return {"timings": timings, "bytes": len(output.body)}
+
+
+def summarize(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    phases = {}
+    for phase in PHASES:
+        values = sorted(sample["timings"][phase] for sample in samples)
+        phases[phase] = {
+            "median_ms": round(statistics.median(values), 3),
+            "p95_ms": round(values[min(len(values) - 1, int(0.95 * len(values)))], 3),
+        }
+    total_ms = statistics.median(sum(sample["timings"].values()) for sample in samples)
+    for phase in PHASES:
+        phases[phase]["share"] = round(phases[phase]["median_ms"] / total_ms, 4) if total_ms else 0.0
+    return {"phases": phases, "total_median_ms": round(total_ms, 3), "payload_bytes": samples[-1]["bytes"]}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Time each phase of a population scrape against replayed pages.")
+    parser.add_argument("--sizes", default="10,100,1000", help="Comma separated table row counts")
+    parser.add_argument("--repeats", type=int, default=5, help="Scrapes per size and format")
+    parser.add_argument("--formats", default="json,parquet", help="Comma separated output formats to serialize")
+    parser.add_argument("--backend", choices=["http", "selenium"], default="http")
+    parser.add_argument("--selenium-mode", choices=["script", "elements"], default="script")
+    parser.add_argument("--chrome-binary", default=os.environ.get("CHROME_BINARY", ""))
+    parser.add_argument("--chrome-driver", default=os.environ.get("CHROME_DRIVER", ""))
+    parser.add_argument("--template", default=TEMPLATE_PAGE, help="Recorded page whose layout the tables use")
+    parser.add_argument("--s3-endpoint", help="Upload to a local S3 endpoint instead of a directory")
+    parser.add_argument("--bucket", default="benchmark-landing")
+    parser.add_argument("--targets", type=int, default=50, help="Targets per run, for the budget estimate")
+    parser.add_argument("--workers", type=int, default=8, help="MAX_WORKERS, for the budget estimate")
+    parser.add_argument("--timeout-budget", type=float, default=300, help="Lambda timeout in seconds")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    formats = args.formats.split(",")
+    scraper = load_scraper(args.chrome_binary, args.chrome_driver)
+
+    work_dir = tempfile.mkdtemp(prefix="scraper-benchmark-")
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "selenium_mode": args.selenium_mode if args.backend == "selenium" else None,
+            "upload": args.s3_endpoint or "local directory",
+        },
+        "results": [],
+    }
+    try:
+        pages_dir = os.path.join(work_dir, "pages")
+        names = write_synthetic_pages(sizes, pages_dir, args.template)
+        store = landing_store(args, work_dir)
+
+        with serve(pages_dir) as url_template:
+            for size, name in zip(sizes, names):
+                url = url_template.format(name=name)
+                for output_format in formats:
+                    samples = [scrape_once(scraper, args, store, url, size, output_format) for _ in range(args.repeats)]
+                    summary = summarize(samples)
+                    # targets run MAX_WORKERS at a time, Chrome runs one browser per pool slot
+                    per_target_seconds = summary["total_median_ms"] / 1000
+                    estimated_seconds = per_target_seconds * -(-args.targets // args.workers)
+                    summary["estimated_run_seconds"] = round(estimated_seconds, 2)
+                    summary["timeout_budget_share"] = round(estimated_seconds / args.timeout_budget, 4)
+                    results["results"].append({"rows": size, "output_format": output_format, **summary})
+                    print(f"rows={size} format={output_format} total={summary['total_median_ms']}ms", file=sys.stderr)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
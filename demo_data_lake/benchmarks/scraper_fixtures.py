@@ -0,0 +1,174 @@
+"""
+Record worldpopulationreview.com pages once and replay them from a local HTTP stand-in.
+
+    python benchmarks/scraper_fixtures.py record california texas
+    python benchmarks/scraper_fixtures.py serve --port 8001
+
+Point the scraper at the stand-in with TARGET_URL_TEMPLATE=http://127.0.0.1:8001/{name}.html
+"""
+import argparse
+import contextlib
+import functools
+import http.server
+import json
+import os
+import random
+import re
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+from urllib.request import Request, urlopen
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_LAKE_DIR = os.path.dirname(BENCHMARKS_DIR)
+SCRAPER_DIR = os.path.join(DATA_LAKE_DIR, "src", "assets", "lambdas", "population_scraper")
+RECORDINGS_DIR = os.path.join(BENCHMARKS_DIR, "fixtures")
+# page layout used for synthetic tables when no recording is given
+TEMPLATE_PAGE = os.path.join(DATA_LAKE_DIR, "tests", "fixtures", "wpr_california.html")
+INDEX_FILE = "index.json"
+
+if SCRAPER_DIR not in sys.path:
+    sys.path.insert(0, SCRAPER_DIR)
+
+from http_extractor import USER_AGENT  # noqa: E402
+from targets import DEFAULT_URL_TEMPLATE  # noqa: E402
+
+
+def record(names: List[str], out_dir: str = RECORDINGS_DIR, url_template: str = DEFAULT_URL_TEMPLATE,
+           timeout: int = 30) -> List[dict]:
+    """
+    Save the live page of every target as <name>.html and note where and when it came from in index.json
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    index_path = os.path.join(out_dir, INDEX_FILE)
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+
+    recorded = []
+    for name in names:
+        url = url_template.format(name=name)
+        request = Request(url, headers={"User-Agent": USER_AGENT, "Accept": "text/html"})
+        with urlopen(request, timeout=timeout) as response:
+            body = response.read()
+
+        with open(os.path.join(out_dir, f"{name}.html"), "wb") as f:
+            f.write(body)
+        index[name] = {
+            "url": url,
+            "bytes": len(body),
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        recorded.append({"name": name, **index[name]})
+        print(f"Recorded {name}: {len(body)} bytes", file=sys.stderr)
+
+    with open(index_path, "w") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    return recorded
+
+
+def synthetic_row(rank: int, rng: random.Random) -> str:
+    population = int(4_000_000 / rank ** 0.9) + rng.randint(0, 500)
+    prior = int(population * rng.uniform(0.95, 1.05))
+    area = rng.randint(5, 500)
+    return (
+        "        <tr>\n"
+        f"          <td>{rank}</td>\n"
+        f"          <td><a href=\"/us-cities/synthetic/city-{rank}\">City {rank}</a></td>\n"
+        f"          <td>{population:,}</td>\n"
+        f"          <td>{prior:,}</td>\n"
+        f"          <td>{(population - prior) / prior * 100:.2f}%</td>\n"
+        f"          <td>{population // area:,}</td>\n"
+        f"          <td>{area}</td>\n"
+        "        </tr>\n"
+    )
+
+
+def synthetic_page(rows: int, template_path: str = TEMPLATE_PAGE, seed: int = 42) -> str:
+    """
+    Template page with its wpr-table body replaced by the given number of generated rows
+    """
+    with open(template_path, encoding="utf-8") as f:
+        page = f.read()
+
+    table_start = re.search(r"<table[^>]*\bwpr-table\b", page).start()
+    body_start = page.index("<tbody>", table_start) + len("<tbody>")
+    body_end = page.index("</tbody>", body_start)
+
+    rng = random.Random(seed)
+    body = "\n" + "".join(synthetic_row(rank, rng) for rank in range(1, rows + 1)) + "      "
+    return page[:body_start] + body + page[body_end:]
+
+
+def write_synthetic_pages(sizes: List[int], out_dir: str, template_path: str = TEMPLATE_PAGE) -> List[str]:
+    """
+    Write synthetic_<rows>.html for every size, returns the target names to request them by
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    names = []
+    for size in sizes:
+        name = f"synthetic_{size}"
+        with open(os.path.join(out_dir, f"{name}.html"), "w", encoding="utf-8") as f:
+            f.write(synthetic_page(size, template_path))
+        names.append(name)
+    return names
+
+
+class Quiet_handler(http.server.SimpleHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def serve(directory: str = RECORDINGS_DIR, port: int = 0) -> Iterator[str]:
+    """
+    Serve recorded pages over HTTP, yields the URL template for TARGET_URL_TEMPLATE
+    """
+    handler = functools.partial(Quiet_handler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/{{name}}.html"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Record and replay population scraper pages.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="Save live target pages")
+    record_parser.add_argument("names", nargs="+", help="Target names like california or new-york")
+    record_parser.add_argument("--out-dir", default=RECORDINGS_DIR)
+    record_parser.add_argument("--url-template", default=DEFAULT_URL_TEMPLATE)
+
+    serve_parser = commands.add_parser("serve", help="Serve recorded pages until interrupted")
+    serve_parser.add_argument("--dir", default=RECORDINGS_DIR)
+    serve_parser.add_argument("--port", type=int, default=8001)
+
+    synthetic_parser = commands.add_parser("synthetic", help="Write synthetic pages with the given row counts")
+    synthetic_parser.add_argument("sizes", nargs="+", type=int)
+    synthetic_parser.add_argument("--out-dir", default=RECORDINGS_DIR)
+    synthetic_parser.add_argument("--template", default=TEMPLATE_PAGE)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        record(args.names, args.out_dir, args.url_template)
+    elif args.command == "synthetic":
+        for name in write_synthetic_pages(args.sizes, args.out_dir, args.template):
+            print(name)
+    else:
+        with serve(args.dir, args.port) as url_template:
+            print(f"TARGET_URL_TEMPLATE={url_template}", file=sys.stderr)
+            threading.Event().wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+import argparse
+import importlib.util
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import compression
+import partition_manifest
+from http_extractor import fetch_page, parse_table_html
+from landing_reader import SNAPSHOT_SUFFIX
+from object_store import object_store
+from targets import DEFAULT_URL_TEMPLATE, Target, target_from_spec
+
+SCRAPER_DIR = os.path.dirname(os.path.abspath(__file__))
+S3_BUCKET = os.environ.get("S3_BUCKET", "")
+S3_PATH = os.environ.get("S3_PATH", "population_scrape/")
+OUTPUT_FORMAT = os.environ.get("OUTPUT_FORMAT", "parquet")
+COMPRESSION = os.environ.get("COMPRESSION", "none")
+# directory holding one sub directory per bucket, used instead of S3 for local runs
+LOCAL_ROOT = os.environ.get("LOCAL_ROOT", "")
+# local S3 stand-in such as moto_server, used when LOCAL_ROOT is not set
+LOCAL_ENDPOINT_URL = os.environ.get("LOCAL_ENDPOINT_URL", "")
+# Wayback Machine capture closest to the timestamp, id_ returns the page as archived without the toolbar
+ARCHIVE_URL_TEMPLATE = "https://web.archive.org/web/{timestamp}id_/" + DEFAULT_URL_TEMPLATE
+# the archive redirects to the capture it picked, its timestamp is the real scrape time
+CAPTURE_TIMESTAMP = re.compile(r"/web/(\d{14})")
+MAX_ROWS = 100
+ARCHIVE_TIMEOUT_SECONDS = 30
+# <snapshot dir>/<target>/<timestamp>.html, the create_s3_key timestamp, a date or a Wayback timestamp
+SNAPSHOT_TIME_FORMATS = ("%Y-%m-%d_%H-%M-%S", "%Y-%m-%d", "%Y%m%d%H%M%S")
+INTERVALS = ("day", "week", "month")
+
+
+class BackfillJob(NamedTuple):
+    target: Target
+    scrape_time: datetime
+    # archived HTML file, or the URL to download it from
+    source: str
+    # archive captures are only kept when taken in [scrape_time, window_end)
+    window_end: Optional[datetime] = None
+
+
+def parse_snapshot_time(name: str) -> datetime:
+    stem = os.path.splitext(os.path.basename(name))[0]
+    for time_format in SNAPSHOT_TIME_FORMATS:
+        try:
+            return datetime.strptime(stem, time_format).replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+    raise ValueError(f"No scrape time in snapshot name: {name}")
+
+
+def snapshot_jobs(directory: str, s3_path: str = S3_PATH) -> List[BackfillJob]:
+    """
+    One job per archived page, the sub directory names the target and the file name the scrape time
+    """
+    jobs = []
+    for name in sorted(os.listdir(directory)):
+        target_dir = os.path.join(directory, name)
+        if not os.path.isdir(target_dir):
+            continue
+        target = target_from_spec({"name": name, "url": target_dir}, s3_path)
+        for filename in sorted(os.listdir(target_dir)):
+            if filename.endswith((".html", ".htm")):
+                jobs.append(BackfillJob(target, parse_snapshot_time(filename), os.path.join(target_dir, filename)))
+    return jobs
+
+
+def scrape_times(start: date, end: date, interval: str = "month") -> List[datetime]:
+    """
+    Midnight UTC of every day, week or month start from start to end inclusive
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"Unknown backfill interval: {interval}")
+    times = []
+    current = start
+    while current <= end:
+        times.append(datetime(current.year, current.month, current.day, tzinfo=timezone.utc))
+        current = next_scrape_date(current, interval)
+    return times
+
+
+def next_scrape_date(current: date, interval: str) -> date:
+    if interval == "day":
+        return current + timedelta(days=1)
+    if interval == "week":
+        return current + timedelta(weeks=1)
+    return date(current.year + current.month // 12, current.month % 12 + 1, 1)
+
+
+def capture_window_end(scrape_time: datetime, interval: str) -> datetime:
+    """
+    Start of the next interval, cut at the end of the month so a capture stays in the job's partition
+    """
+    window_end = next_scrape_date(scrape_time.date(), interval)
+    window_end = min(window_end, next_scrape_date(scrape_time.date(), "month"))
+    return datetime(window_end.year, window_end.month, window_end.day, tzinfo=timezone.utc)
+
+
+def archive_jobs(targets: List[Target], start: date, end: date, interval: str = "month",
+                 url_template: str = ARCHIVE_URL_TEMPLATE) -> List[BackfillJob]:
+    """
+    One job per target and interval. The archive serves the capture closest to the requested time,
+    which is the middle of the interval so the capture most likely falls inside it.
+    """
+    jobs = []
+    for target in targets:
+        for scrape_time in scrape_times(start, end, interval):
+            window_end = capture_window_end(scrape_time, interval)
+            requested = scrape_time + (window_end - scrape_time) / 2
+            source = url_template.format(name=target.name, timestamp=requested.strftime("%Y%m%d%H%M%S"))
+            jobs.append(BackfillJob(target, scrape_time, source, window_end))
+    return jobs
+
+
+def capture_time(job: BackfillJob, url: str) -> datetime:
+    """
+    When the served page was archived, the job's scrape time when the URL doesn't say
+    """
+    match = CAPTURE_TIMESTAMP.search(url)
+    if not match:
+        return job.scrape_time
+    return datetime.strptime(match.group(1), "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc)
+
+
+def partition_jobs(jobs: List[BackfillJob]) -> Dict[Tuple[str, int, int], List[BackfillJob]]:
+    """
+    Jobs grouped by landing partition, every partition manifest gets a single writing process
+    """
+    partitions = defaultdict(list)
+    for job in jobs:
+        partitions[(job.target.name, job.scrape_time.year, job.scrape_time.month)].append(job)
+    return {key: sorted(group, key=lambda job: job.scrape_time) for key, group in sorted(partitions.items())}
+
+
+# the scraper module of this worker process, loaded once by init_worker
+_scraper = None
+
+
+def init_worker(config: Dict[str, str]) -> None:
+    """
+    Load lambda.py in the worker and point it at the backfill destination instead of its env config
+    """
+    global _scraper
+    # one info log per upload would drown out the summary
+    os.environ.setdefault("POWERTOOLS_LOG_LEVEL", "WARNING")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+    # lambda.py can't be imported by name since lambda is a keyword
+    spec = importlib.util.spec_from_file_location("population_scraper_lambda", os.path.join(SCRAPER_DIR, "lambda.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    module.landing_store = object_store(config["bucket"], config["local_root"], config.get("endpoint_url") or None)
+    module.S3_PATH = config["s3_path"]
+    module.OUTPUT_FORMAT = config["output_format"]
+    module.COMPRESSION = config["compression"]
+    _scraper = module
+
+
+def read_table(job: BackfillJob, max_rows: int) -> Tuple[List[str], List[List[str]], datetime]:
+    """
+    Headers, rows and the time the page was captured
+    """
+    if job.source.startswith(("http://", "https://")):
+        headers, rows, url = fetch_page(job.source, max_rows, timeout=ARCHIVE_TIMEOUT_SECONDS)
+        return headers, rows, capture_time(job, url)
+    with open(job.source, encoding="utf-8", errors="replace") as f:
+        headers, rows = parse_table_html(f.read(), max_rows)
+    return headers, rows, job.scrape_time
+
+
+def snapshot_key(job: BackfillJob, scrape_time: datetime) -> str:
+    file_type = compression.compressed_file_type(_scraper.OUTPUT_FORMAT, _scraper.COMPRESSION)
+    return _scraper.create_s3_key(job.target.s3_path, scrape_time, SNAPSHOT_SUFFIX, file_type)
+
+
+def in_window(job: BackfillJob, scrape_time: datetime) -> bool:
+    return job.window_end is None or job.scrape_time <= scrape_time < job.window_end
+
+
+def run_partition(jobs: List[BackfillJob], force: bool = False, max_rows: int = MAX_ROWS) -> List[Dict[str, Any]]:
+    """
+    Upload the jobs of one partition in scrape time order.
+    A snapshot already in the partition manifest, or for archive jobs any capture of the job's interval,
+    is skipped. Keys only depend on the scrape time so a forced re-run overwrites the same objects.
+    """
+    first = jobs[0]
+    recorded = {
+        entry.key: entry.scraped_at
+        for entry in partition_manifest.load_manifest(_scraper.landing_store, first.target.s3_path,
+                                                      first.scrape_time.year, first.scrape_time.month)
+    }
+
+    results = []
+    for job in jobs:
+        result = {"target": job.target.name, "scrape_time": job.scrape_time.isoformat(), "source": job.source}
+        if not force:
+            key = snapshot_key(job, job.scrape_time)
+            if job.window_end is not None:
+                key = next((key for key, scraped_at in recorded.items() if in_window(job, scraped_at)), None)
+            if key in recorded:
+                results.append({**result, "status": "skipped", "s3_key": key})
+                continue
+        try:
+            headers, rows, captured_at = read_table(job, max_rows)
+            if not headers or not rows:
+                raise ValueError("No population table in the page.")
+            if not in_window(job, captured_at):
+                # the closest capture belongs to another interval, storing it here would duplicate it as history
+                results.append({**result, "status": "skipped", "capture_time": captured_at.isoformat(),
+                                "reason": "No capture in the interval."})
+                continue
+            # change detection is off, backfilled history must not move the live scrape's diff base
+            stored = _scraper.store_table(job.target, captured_at, headers, rows, "off", update_index=False)
+        except Exception as e:
+            results.append({**result, "status": "failed", "error": str(e)})
+            continue
+        results.append({**result, **stored, "status": "uploaded", "scrape_time": captured_at.isoformat()})
+    return results
+
+
+def run_backfill(jobs: List[BackfillJob], config: Dict[str, str], workers: int = 1, force: bool = False,
+                 max_rows: int = MAX_ROWS) -> List[Dict[str, Any]]:
+    """
+    Spread the partitions over worker processes, then list the touched partitions in the manifest index once
+    """
+    partitions = partition_jobs(jobs)
+    if workers <= 1:
+        init_worker(config)
+        partition_results = {key: run_partition(group, force, max_rows) for key, group in partitions.items()}
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(config,)) as executor:
+            futures = {key: executor.submit(run_partition, group, force, max_rows) for key, group in partitions.items()}
+            partition_results = {key: future.result() for key, future in futures.items()}
+
+    # the index is shared by every partition, so only this process writes it
+    store = object_store(config["bucket"], config["local_root"], config.get("endpoint_url") or None)
+    touched = defaultdict(list)
+    for (name, year, month), results in partition_results.items():
+        if any(res["status"] != "failed" for res in results):
+            touched[(name, partitions[(name, year, month)][0].target.s3_path)].append(partition_manifest.partition_name(year, month))
+    for (name, s3_path), names in sorted(touched.items()):
+        partition_manifest.index_partitions(store, config["s3_path"], name, s3_path, names)
+
+    return [res for group in partition_results.values() for res in group]
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    counts: Dict[str, int] = defaultdict(int)
+    for res in results:
+        counts[res["status"]] += 1
+    return {
+        "jobs": len(results),
+        **{status: counts[status] for status in ("uploaded", "skipped", "failed")},
+        "failures": [res for res in results if res["status"] == "failed"],
+    }
+
+
+def parse_date(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Backfill the landing zone from archived population pages.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshots_parser = commands.add_parser("snapshots", help="Replay saved pages from <dir>/<target>/<timestamp>.html")
+    snapshots_parser.add_argument("directory")
+
+    archive_parser = commands.add_parser("archive", help="Fetch archived pages for a date range")
+    archive_parser.add_argument("--targets", required=True, help="Comma separated target names")
+    archive_parser.add_argument("--start", required=True, type=parse_date, help="YYYY-MM-DD")
+    archive_parser.add_argument("--end", required=True, type=parse_date, help="YYYY-MM-DD")
+    archive_parser.add_argument("--interval", choices=INTERVALS, default="month")
+    archive_parser.add_argument("--url-template", default=ARCHIVE_URL_TEMPLATE, help="Formatted with {name} and {timestamp}")
+
+    for command_parser in (snapshots_parser, archive_parser):
+        command_parser.add_argument("--bucket", default=S3_BUCKET or "landing")
+        command_parser.add_argument("--local-root", default=LOCAL_ROOT, help="directory with one sub directory per bucket")
+        command_parser.add_argument("--endpoint-url", default=LOCAL_ENDPOINT_URL, help="local S3 endpoint such as moto_server")
+        command_parser.add_argument("--s3-path", default=S3_PATH)
+        command_parser.add_argument("--output-format", default=OUTPUT_FORMAT)
+        command_parser.add_argument("--compression", choices=compression.COMPRESSIONS, default=COMPRESSION)
+        command_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        command_parser.add_argument("--max-rows", type=int, default=MAX_ROWS)
+        command_parser.add_argument("--force", action="store_true", help="Upload scrape times that are already in the manifests")
+    args = parser.parse_args(argv)
+
+    if args.command == "snapshots":
+        jobs = snapshot_jobs(args.directory, args.s3_path)
+    else:
+        targets = [target_from_spec(name, args.s3_path) for name in args.targets.split(",")]
+        jobs = archive_jobs(targets, args.start, args.end, args.interval, args.url_template)
+
+    config = {
+        "bucket": args.bucket,
+        "local_root": args.local_root,
+        "endpoint_url": args.endpoint_url,
+        "s3_path": args.s3_path,
+        "output_format": args.output_format,
+        "compression": args.compression,
+    }
+    summary = summarize(run_backfill(jobs, config, args.workers, args.force, args.max_rows))
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
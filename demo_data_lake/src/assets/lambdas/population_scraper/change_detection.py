@@ -0,0 +1,90 @@
+import hashlib
+import json
+from typing import Dict, List, Optional
+
+from object_store import ObjectStore
+from population_schema import column_specs
+
+# off uploads every scrape, skip drops unchanged scrapes, diff also writes changed scrapes as row diffs
+CHANGE_DETECTION_MODES = ("off", "skip", "diff")
+STATE_PREFIX = "_state/change_detection"
+# a diff larger than this share of the table is written as a new full snapshot instead
+MAX_DIFF_RATIO = 0.5
+
+
+def normalized_records(headers: List[str], rows: List[List[str]]) -> List[Dict[str, str]]:
+    """
+    raw_json with whitespace collapsed, so layout-only changes on the page don't look like new data
+    """
+    clean_headers = [" ".join(header.split()) for header in headers]
+    return [dict(zip(clean_headers, (" ".join(cell.split()) for cell in row))) for row in rows]
+
+
+def content_hash(records: List[Dict[str, str]]) -> str:
+    payload = json.dumps(records, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def key_header(headers: List[str]) -> str:
+    """
+    Header of the city column, rows are matched on it when diffing
+    """
+    for header, (name, _) in zip(headers, column_specs(headers)):
+        if name == "city":
+            return header
+    raise ValueError("No city column to diff rows on.")
+
+
+def row_diff(base_records: List[Dict[str, str]], records: List[Dict[str, str]], key: str) -> Dict[str, list]:
+    """
+    Rows added, removed (by key) and changed between the base snapshot and the new scrape
+    """
+    base_by_key = {record[key]: record for record in base_records}
+    new_keys = {record[key] for record in records}
+
+    return {
+        "added": [record for record in records if record[key] not in base_by_key],
+        "changed": [record for record in records if record[key] in base_by_key and base_by_key[record[key]] != record],
+        "removed": [record[key] for record in base_records if record[key] not in new_keys],
+    }
+
+
+def diff_size(diff: Dict[str, list]) -> int:
+    return sum(len(rows) for rows in diff.values())
+
+
+def state_key(target: str) -> str:
+    return f"{STATE_PREFIX}/{target}.json"
+
+
+def load_state(store: ObjectStore, target: str) -> Optional[dict]:
+    """
+    Last hash per target plus the full snapshot diffs are taken against
+    """
+    key = state_key(target)
+    if not store.exists(key):
+        return None
+    return json.loads(store.get(key))
+
+
+def save_state(store: ObjectStore, target: str, state: dict) -> None:
+    store.put(state_key(target), json.dumps(state).encode("utf-8"), "application/json")
+
+
+def plan_diff(state: Optional[dict], records: List[Dict[str, str]]) -> Optional[Dict[str, list]]:
+    """
+    Row diff against the state's base snapshot, None when a full snapshot should be written instead
+    """
+    clean_headers = list(records[0].keys())
+    if not state or not state.get("base_records") or state.get("headers") != clean_headers:
+        return None
+
+    try:
+        key = key_header(clean_headers)
+    except ValueError:
+        return None
+
+    diff = row_diff(state["base_records"], records, key)
+    if diff_size(diff) > MAX_DIFF_RATIO * len(records):
+        return None
+    return diff
@@ -0,0 +1,210 @@
+import argparse
+import io
+import json
+import os
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional
+
+from aws_lambda_powertools import Logger
+
+import partition_manifest
+import scrape_metrics
+from object_store import ObjectInfo, ObjectStore, object_store
+from landing_reader import DIFF_SUFFIX, SNAPSHOT_SUFFIX, parse_landing_key, read_landing_table
+
+LANDING_BUCKET = os.environ.get("LANDING_BUCKET", "")
+PROCESSED_BUCKET = os.environ.get("PROCESSED_BUCKET", "")
+PUBLISHED_BUCKET = os.environ.get("PUBLISHED_BUCKET", "")
+LANDING_PREFIX = os.environ.get("LANDING_PREFIX", "population_scrape/")
+# directory holding one sub directory per bucket, used instead of S3 for local runs
+LOCAL_ROOT = os.environ.get("LOCAL_ROOT", "")
+# local S3 stand-in such as moto_server, used when LOCAL_ROOT is not set
+LOCAL_ENDPOINT_URL = os.environ.get("LOCAL_ENDPOINT_URL", "")
+
+PROCESSED_PREFIX = "population_scrape"
+PUBLISHED_PREFIX = "population_city_latest"
+STATE_KEY = "_state/compaction/population_scrape.json"
+PART_NAME = "part-00000.parquet"
+
+logger = Logger(service=scrape_metrics.SERVICE_NAME)
+
+
+class Partition(NamedTuple):
+    target: str
+    year: str
+    month: str
+
+    @property
+    def id(self) -> str:
+        return f"{self.target}/year={self.year}/month={self.month}"
+
+    def key(self, prefix: str) -> str:
+        return f"{prefix}/{self.id}/{PART_NAME}"
+
+
+def group_landing_objects(objects: List[ObjectInfo]) -> Dict[Partition, List[ObjectInfo]]:
+    partitions = defaultdict(list)
+    for obj in objects:
+        parts = parse_landing_key(obj.key)
+        if parts is None or parts["suffix"] not in (SNAPSHOT_SUFFIX, DIFF_SUFFIX):
+            continue
+        partitions[Partition(parts["target"], parts["year"], parts["month"])].append(obj)
+    return partitions
+
+
+def indexed_landing_objects(landing: ObjectStore, landing_prefix: str) -> Optional[List[ObjectInfo]]:
+    """
+    Landing objects listed in the partition manifests of the index, one read per partition instead of listing
+    the prefix. None when the prefix has no index yet.
+    """
+    index = partition_manifest.load_index(landing, landing_prefix)
+    if not index:
+        return None
+
+    objects = []
+    for target, listed in sorted(index.items()):
+        for partition in listed["partitions"]:
+            year, month = (int(part) for part in partition.split("-"))
+            # the content hash stands in for the version, a replaced object gets a new manifest entry
+            objects.extend(
+                ObjectInfo(entry.key, entry.bytes, entry.content_hash)
+                for entry in partition_manifest.load_manifest(landing, listed["s3_path"], year, month)
+            )
+    return objects
+
+
+def landing_objects(landing: ObjectStore, landing_prefix: str) -> List[ObjectInfo]:
+    objects = indexed_landing_objects(landing, landing_prefix)
+    if objects is None:
+        logger.info("No manifest index, listing the landing prefix", extra={"prefix": landing_prefix})
+        return list(landing.list_objects(landing_prefix))
+    return objects
+
+
+def load_state(store: ObjectStore) -> Dict[str, Dict[str, str]]:
+    if not store.exists(STATE_KEY):
+        return {}
+    return json.loads(store.get(STATE_KEY))
+
+
+def changed_partitions(partitions: Dict[Partition, List[ObjectInfo]], state: Dict[str, Dict[str, str]]) -> List[Partition]:
+    """
+    A partition is reprocessed when a landing object was added, replaced or removed since the last run
+    """
+    changed = []
+    for partition, objects in sorted(partitions.items()):
+        if state.get(partition.id) != {obj.key: obj.version for obj in objects}:
+            changed.append(partition)
+    return changed
+
+
+def drop_duplicates(table, keys: List[str]):
+    """
+    Keep the first row for every combination of keys, the lowest position per group as in normalization.duplicate_keys
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if not table.num_rows:
+        return table
+    positions = pa.array(range(table.num_rows), type=pa.int64())
+    first = table.select(keys).append_column("position", positions).group_by(keys, use_threads=False).aggregate([("position", "min")])
+    keep = first.column("position_min")
+    return table.take(pc.take(keep, pc.sort_indices(keep)))
+
+
+def compact_partition(landing: ObjectStore, objects: List[ObjectInfo]):
+    """
+    Merge every landing snapshot of a partition into one table ordered by scrape time and rank
+    """
+    import pyarrow as pa
+
+    tables = [read_landing_table(landing, obj.key) for obj in objects]
+    table = pa.concat_tables(tables, promote_options="default")
+    table = table.sort_by([("scraped_at", "ascending"), ("rank", "ascending")])
+    # a snapshot uploaded twice shows up as repeated city/scraped_at pairs
+    return drop_duplicates(table, ["city", "scraped_at"])
+
+
+def latest_per_city(table):
+    """
+    Most recent row of every city in the partition
+    """
+    return drop_duplicates(table.sort_by([("scraped_at", "descending"), ("rank", "ascending")]), ["city"]).sort_by("rank")
+
+
+def write_parquet(store: ObjectStore, key: str, table) -> None:
+    import pyarrow.parquet as pq
+
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression="zstd")
+    store.put(key, buffer.getvalue(), "application/vnd.apache.parquet")
+
+
+def run_compaction(landing: ObjectStore, processed: ObjectStore, published: ObjectStore,
+                   landing_prefix: str = LANDING_PREFIX) -> List[dict]:
+    """
+    Compact landing partitions that received new objects into processed and refresh their published aggregates.
+    Changes are found from the partition manifests, the prefix is only listed when it has no manifest index.
+    """
+    partitions = group_landing_objects(landing_objects(landing, landing_prefix))
+    state = load_state(processed)
+
+    results = []
+    for partition in changed_partitions(partitions, state):
+        objects = partitions[partition]
+        table = compact_partition(landing, objects)
+
+        write_parquet(processed, partition.key(PROCESSED_PREFIX), table)
+        write_parquet(published, partition.key(PUBLISHED_PREFIX), latest_per_city(table))
+
+        # state is saved per partition so a failed run resumes where it stopped
+        state[partition.id] = {obj.key: obj.version for obj in objects}
+        processed.put(STATE_KEY, json.dumps(state, indent=1, sort_keys=True).encode("utf-8"), "application/json")
+
+        logger.info("Compacted partition", extra={"partition": partition.id, "landing_objects": len(objects),
+                                                  "rows": table.num_rows})
+        results.append({"partition": partition.id, "landing_objects": len(objects), "rows": table.num_rows})
+
+    return results
+
+
+def lambda_handler(event=None, context=None):
+    try:
+        results = run_compaction(
+            object_store(LANDING_BUCKET, LOCAL_ROOT, LOCAL_ENDPOINT_URL or None),
+            object_store(PROCESSED_BUCKET, LOCAL_ROOT, LOCAL_ENDPOINT_URL or None),
+            object_store(PUBLISHED_BUCKET, LOCAL_ROOT, LOCAL_ENDPOINT_URL or None),
+        )
+    except Exception as e:
+        logger.exception("Compaction failed")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"error": str(e)})
+        }
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps({
+            "message": f"Compacted {len(results)} partitions",
+            "partitions": results,
+        })
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact landing scrapes into the processed and published zones.")
+    parser.add_argument("--local-root", default=LOCAL_ROOT, help="directory with one sub directory per bucket")
+    parser.add_argument("--endpoint-url", default=LOCAL_ENDPOINT_URL, help="local S3 endpoint such as moto_server")
+    parser.add_argument("--landing-bucket", default=LANDING_BUCKET or "landing")
+    parser.add_argument("--processed-bucket", default=PROCESSED_BUCKET or "processed")
+    parser.add_argument("--published-bucket", default=PUBLISHED_BUCKET or "published")
+    args = parser.parse_args()
+    if not args.local_root and not args.endpoint_url:
+        parser.error("one of --local-root or --endpoint-url is required")
+
+    print(json.dumps(run_compaction(
+        object_store(args.landing_bucket, args.local_root, args.endpoint_url or None),
+        object_store(args.processed_bucket, args.local_root, args.endpoint_url or None),
+        object_store(args.published_bucket, args.local_root, args.endpoint_url or None),
+    ), indent=2))
@@ -0,0 +1,91 @@
+import zlib
+from typing import Optional, Tuple
+
+# none leaves text objects as they are, parquet and arrow are compressed internally and never wrapped
+COMPRESSIONS = ("none", "gzip", "zstd")
+COMPRESSED_FILE_TYPES = ("json", "jsonl")
+EXTENSIONS = {"gzip": "gz", "zstd": "zst"}
+CONTENT_ENCODINGS = {"gzip": "gzip", "zstd": "zstd"}
+COMPRESSION_BY_EXTENSION = {extension: compression for compression, extension in EXTENSIONS.items()}
+# gzip header and trailer around a raw deflate stream
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def validate_compression(compression: str) -> str:
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    return compression
+
+
+def applies_to(file_type: str, compression: str) -> bool:
+    return validate_compression(compression) != "none" and file_type in COMPRESSED_FILE_TYPES
+
+
+def compressed_file_type(file_type: str, compression: str) -> str:
+    """
+    File type for create_s3_key, "jsonl" becomes "jsonl.gz" or "jsonl.zst"
+    """
+    if not applies_to(file_type, compression):
+        return file_type
+    return f"{file_type}.{EXTENSIONS[compression]}"
+
+
+def split_file_type(file_type: str) -> Tuple[str, str]:
+    """
+    Base file type and compression of a landing key's file type, "json.gz" -> ("json", "gzip")
+    """
+    base, _, extension = file_type.rpartition(".")
+    if base and extension in COMPRESSION_BY_EXTENSION:
+        return base, COMPRESSION_BY_EXTENSION[extension]
+    return file_type, "none"
+
+
+def content_encoding(compression: str) -> Optional[str]:
+    return CONTENT_ENCODINGS.get(compression)
+
+
+class ChunkCompressor:
+    """
+    Compress a body handed over in chunks, the output of every call can be written out straight away.
+    zstd chunks become independent frames, which decoders read back as one stream.
+    """
+
+    def __init__(self, compression: str):
+        self.compression = validate_compression(compression)
+        self._gzip = zlib.compressobj(6, zlib.DEFLATED, GZIP_WBITS) if compression == "gzip" else None
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.compression == "gzip":
+            return self._gzip.compress(chunk)
+        if self.compression == "zstd":
+            import pyarrow as pa
+
+            return pa.compress(chunk, codec="zstd", asbytes=True) if chunk else b""
+        return chunk
+
+    def flush(self) -> bytes:
+        if self.compression == "gzip":
+            return self._gzip.flush()
+        return b""
+
+
+def compress(body: bytes, compression: str) -> bytes:
+    compressor = ChunkCompressor(compression)
+    return compressor.compress(body) + compressor.flush()
+
+
+def decompress(body: bytes, compression: str) -> bytes:
+    validate_compression(compression)
+    if compression == "gzip":
+        # decompressobj stops after one gzip member, loop so concatenated members are read too
+        res = []
+        while body:
+            decompressor = zlib.decompressobj(GZIP_WBITS)
+            res.append(decompressor.decompress(body))
+            body = decompressor.unused_data
+        return b"".join(res)
+    if compression == "zstd":
+        import pyarrow as pa
+
+        return pa.CompressedInputStream(pa.BufferReader(body), "zstd").read()
+    return body
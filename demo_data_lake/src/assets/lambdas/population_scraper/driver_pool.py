@@ -0,0 +1,109 @@
+import shutil
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from tempfile import mkdtemp
+from typing import Any, Callable, Iterator, List
+
+from aws_lambda_powertools import Logger
+from selenium.common.exceptions import WebDriverException
+
+from scrape_metrics import SERVICE_NAME, phase
+
+logger = Logger(service=SERVICE_NAME, child=True)
+
+
+@dataclass
+class PooledDriver:
+    driver: Any
+    temp_root: str
+    uses: int = 0
+
+
+class ChromeDriverPool:
+    """
+    Keep Chrome sessions alive across warm Lambda invocations.
+
+    Sessions are health checked on checkout and recycled after max_uses or when the
+    browser crashed. Each session owns one temp directory for its profile, data and
+    cache dirs, which is removed together with the session so /tmp does not fill up.
+    """
+
+    def __init__(self, factory: Callable[[str], Any], max_uses: int = 20, max_size: int = 1):
+        self.factory = factory
+        self.max_uses = max_uses
+        self.max_size = max_size
+        self._idle: List[PooledDriver] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    @contextmanager
+    def driver(self) -> Iterator[Any]:
+        """
+        Borrow a healthy driver, blocking while max_size drivers are in use
+        """
+        self._slots.acquire()
+        pooled = None
+        try:
+            pooled = self._checkout()
+            yield pooled.driver
+        except WebDriverException:
+            # the session can't be trusted after a driver level failure
+            if pooled:
+                self._discard(pooled)
+                pooled = None
+            raise
+        finally:
+            if pooled:
+                with self._lock:
+                    self._idle.append(pooled)
+            self._slots.release()
+
+    def close(self):
+        """
+        Quit every idle driver and remove its temp directory
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._discard(pooled)
+
+    def _checkout(self) -> PooledDriver:
+        while True:
+            with self._lock:
+                pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                break
+            if pooled.uses < self.max_uses and self._is_healthy(pooled):
+                pooled.uses += 1
+                return pooled
+            logger.info("Recycling WebDriver", extra={"uses": pooled.uses})
+            self._discard(pooled)
+
+        logger.info("Starting WebDriver")
+        temp_root = mkdtemp(prefix="chrome-")
+        try:
+            with phase("driver_init"):
+                driver = self.factory(temp_root)
+        except Exception:
+            shutil.rmtree(temp_root, ignore_errors=True)
+            raise
+        return PooledDriver(driver=driver, temp_root=temp_root, uses=1)
+
+    @staticmethod
+    def _is_healthy(pooled: PooledDriver) -> bool:
+        try:
+            return pooled.driver.execute_script("return 1;") == 1
+        except WebDriverException as e:
+            logger.warning("WebDriver failed health check", extra={"error": str(e)})
+            return False
+
+    @staticmethod
+    def _discard(pooled: PooledDriver):
+        try:
+            pooled.driver.quit()
+            logger.info("WebDriver closed")
+        except Exception as e:
+            logger.warning("Error closing WebDriver", extra={"error": str(e)})
+        finally:
+            shutil.rmtree(pooled.temp_root, ignore_errors=True)
@@ -0,0 +1,178 @@
+import codecs
+import http.client
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from aws_lambda_powertools import Logger
+
+from scrape_metrics import SERVICE_NAME, phase
+
+logger = Logger(service=SERVICE_NAME, child=True)
+
+TABLE_CLASS = "wpr-table"
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+CHUNK_SIZE = 64 * 1024
+
+
+class WprTableParser(HTMLParser):
+    """
+    Streaming parser that collects the header and body cells of the first table with the wpr-table class.
+    Mirrors the selenium scrape: header text from "thead th", body rows from "tbody tr" / "td".
+    A row directly under the table is a body row, like the tbody a browser inserts around it.
+    """
+
+    def __init__(self, table_class: str = TABLE_CLASS, max_rows: Optional[int] = None):
+        super().__init__(convert_charrefs=True)
+        self.table_class = table_class
+        self.max_rows = max_rows
+        self.headers: List[str] = []
+        self.rows: List[List[str]] = []
+        self.done = False
+
+        self._depth = 0  # table nesting depth, 1 means directly inside the target table
+        self._section: Optional[str] = None
+        self._row: Optional[List[str]] = None
+        self._cell: Optional[List[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+
+        if tag == "table":
+            if self._depth:
+                self._depth += 1
+            elif self.table_class in (dict(attrs).get("class") or "").split():
+                self._depth = 1
+            return
+
+        if self._depth != 1:
+            return
+
+        if tag in ("thead", "tbody"):
+            self._section = tag
+        elif tag == "tr":
+            self._close_row()
+            if self._section is None:
+                self._section = "tbody"
+            self._row = []
+        elif tag in ("th", "td"):
+            self._close_cell()
+            if self._keep_cell(tag):
+                self._cell = []
+
+    def handle_endtag(self, tag):
+        if self.done or not self._depth:
+            return
+
+        if tag == "table":
+            self._depth -= 1
+            if not self._depth:
+                self._close_row()
+                self.done = True
+            return
+
+        if self._depth != 1:
+            return
+
+        if tag in ("th", "td"):
+            self._close_cell()
+        elif tag == "tr":
+            self._close_row()
+        elif tag in ("thead", "tbody"):
+            self._close_row()
+            self._section = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def _keep_cell(self, tag: str) -> bool:
+        return (self._section == "thead" and tag == "th") or (self._section == "tbody" and tag == "td")
+
+    def _close_cell(self):
+        if self._cell is None:
+            return
+        text = " ".join("".join(self._cell).split())
+        if self._section == "thead":
+            self.headers.append(text)
+        elif self._row is not None:
+            self._row.append(text)
+        self._cell = None
+
+    def _close_row(self):
+        self._close_cell()
+        if self._row is None:
+            return
+        if self._section == "tbody" and self._row:
+            self.rows.append(self._row)
+            if self.max_rows is not None and len(self.rows) >= self.max_rows:
+                self.done = True
+        self._row = None
+
+
+def parse_table_html(html: str, max_iter: int = 10) -> Tuple[List[str], List[List[str]]]:
+    """
+    Parse an already downloaded page, used for saved fixtures and archived snapshots.
+    """
+    parser = WprTableParser(max_rows=max_iter)
+    parser.feed(html)
+    parser.close()
+    return parser.headers, parser.rows
+
+
+def fetch_table(data_url: str, max_iter: int = 10, timeout: int = 10) -> Tuple[List[str], List[List[str]]]:
+    """
+    Stream the page over HTTP into the parser, stopping the download once enough rows are read.
+    """
+    headers, rows, _ = fetch_page(data_url, max_iter, timeout)
+    return headers, rows
+
+
+def fetch_page(data_url: str, max_iter: int = 10, timeout: int = 10) -> Tuple[List[str], List[List[str]], str]:
+    """
+    fetch_table plus the URL the page was served from after redirects
+    """
+    request = Request(data_url, headers={"User-Agent": USER_AGENT, "Accept": "text/html"})
+    parser = WprTableParser(max_rows=max_iter)
+
+    with phase("navigation"):
+        response = urlopen(request, timeout=timeout)
+
+    # the body is parsed as it downloads, so extraction includes the transfer of the table rows
+    with response, phase("extraction"):
+        charset = response.headers.get_content_charset() or "utf-8"
+        decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+
+        while not parser.done:
+            chunk = response.read(CHUNK_SIZE)
+            if not chunk:
+                parser.feed(decoder.decode(b"", final=True))
+                break
+            parser.feed(decoder.decode(chunk))
+
+    parser.close()
+    return parser.headers, parser.rows, response.geturl()
+
+
+def extract_most_populated_cities_http(data_url: str, max_iter: int = 10) -> Tuple[List[str], List[List[str]]]:
+    """
+    Browserless version of extract_most_populated_cities, returns empty lists when no table is found
+    """
+    try:
+        headers, rows = fetch_table(data_url, max_iter)
+    except HTTPError as e:
+        logger.warning("HTTP error fetching page", extra={"url": data_url, "error": str(e)})
+        return [], []
+    except (OSError, ValueError, http.client.HTTPException) as e:
+        # unreachable host, reset connection, bad URL or malformed response, auto mode falls back to selenium
+        logger.warning("Could not reach page", extra={"url": data_url, "error": str(e)})
+        return [], []
+
+    if not headers or not rows:
+        logger.info("Table not found in static HTML", extra={"url": data_url})
+        return [], []
+
+    logger.debug("Found table from static HTML", extra={"url": data_url, "rows": len(rows)})
+    return headers, rows
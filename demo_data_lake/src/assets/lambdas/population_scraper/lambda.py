@@ -1,34 +1,78 @@
 import json
 import os
-import boto3
-from typing import Tuple, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Tuple, List, Dict, Any, Optional
 from datetime import datetime, timezone
 from tempfile import mkdtemp
+from aws_lambda_powertools import Logger, Metrics
+from aws_lambda_powertools.metrics import MetricUnit
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException, TimeoutException, StaleElementReferenceException
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, StaleElementReferenceException, WebDriverException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from http_extractor import extract_most_populated_cities_http
+from driver_pool import ChromeDriverPool
+from targets import Target, load_targets, DEFAULT_URL_TEMPLATE
+from output_formats import STREAMING_SERIALIZERS, compress_output, compress_stream, serialize_rows, stream_rows
+from object_store import configured_store
+from landing_reader import SNAPSHOT_SUFFIX, DIFF_SUFFIX, parse_landing_key
+import change_detection
+import compression
+import normalization
+import partition_manifest
+import scrape_metrics
 
 S3_BUCKET = os.environ.get("S3_BUCKET", "")
 S3_PATH = os.environ.get("S3_PATH", "")
 DATA_URL = os.environ.get("DATA_URL", "")
+# JSON list of target names or {"name", "url", "s3_path"} objects, overridden by event["targets"]
+TARGETS = os.environ.get("TARGETS", "")
+TARGET_URL_TEMPLATE = os.environ.get("TARGET_URL_TEMPLATE", DEFAULT_URL_TEMPLATE)
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", "8"))
+# json keeps the raw string dicts, parquet and arrow write typed columns
+OUTPUT_FORMAT = os.environ.get("OUTPUT_FORMAT", "json")
+# none, gzip or zstd around json/jsonl objects and row diffs, parquet and arrow are compressed internally
+COMPRESSION = os.environ.get("COMPRESSION", "none")
+# off, skip or diff, see change_detection.CHANGE_DETECTION_MODES
+CHANGE_DETECTION = os.environ.get("CHANGE_DETECTION", "off")
 CHROME_DRIVER = os.environ.get("CHROME_DRIVER", "")
 CHROME_BINARY = os.environ.get("CHROME_BINARY", "")
 LOCAL = os.environ.get("LOCAL", "")
+# "auto" tries the plain HTTP fetch first and only starts Chrome when no table is found
+EXTRACTION_BACKEND = os.environ.get("EXTRACTION_BACKEND", "auto")
+# "script" reads the whole table in one execute_script call, "elements" walks it with find_elements
+SELENIUM_EXTRACTION_MODE = os.environ.get("SELENIUM_EXTRACTION_MODE", "script")
+# a warm browser is recycled after this many scrapes to keep memory growth in check
+MAX_DRIVER_USES = int(os.environ.get("MAX_DRIVER_USES", "20"))
+# each headless chrome takes a few hundred MB, one browser leaves the rest of the 3 GB function for the http workers
+DRIVER_POOL_SIZE = int(os.environ.get("DRIVER_POOL_SIZE", "1"))
+# seconds kept back from the lambda timeout to report on targets that are still running
+TIMEOUT_MARGIN_SECONDS = 10
 
-s3 = boto3.client("s3")
+logger = Logger(service=scrape_metrics.SERVICE_NAME)
+metrics = Metrics(namespace=scrape_metrics.METRICS_NAMESPACE, service=scrape_metrics.SERVICE_NAME)
 
-def validate_row_length(validation_header:List, validation_rows:List[List]) -> bool:
-    """
-    Check if the data collected from each row matches the length of the header
-    """
-    for x in validation_rows:
-        if len(x) != len(validation_header):
-            return False
-    return True
+# innerText matches what WebElement.text returns for the cells
+TABLE_SCRIPT = """
+const table = document.getElementsByClassName(arguments[0])[0];
+if (!table) {
+    return null;
+}
+const cellText = (cell) => cell.innerText.trim();
+const headers = Array.from(table.querySelectorAll("thead th"), cellText);
+const rows = Array.from(table.querySelectorAll("tbody tr"))
+    .slice(0, arguments[1])
+    .map((tr) => Array.from(tr.querySelectorAll("td"), cellText));
+return [headers, rows];
+"""
+
+# LOCAL_ROOT or LOCAL_ENDPOINT_URL swap S3 for a directory or a local endpoint, see object_store.configured_store
+landing_store = configured_store(S3_BUCKET)
 
 def create_s3_key(path_prefix: str, scrape_time: datetime, suffix: str, file_type: str = "json") -> str:
     """
@@ -39,62 +83,94 @@ def create_s3_key(path_prefix: str, scrape_time: datetime, suffix: str, file_typ
     key = f"{path_prefix.rstrip('/')}/year={scrape_time.year}/month={scrape_time.month:02d}/{date_str}_{suffix}.{file_type}"
     return key
 
-def extract_most_populated_cities(driver, data_url:str, max_iter:int = 10) -> Tuple[List[str], List[List[str]]]:
+def read_table_elements(driver, max_iter:int) -> Tuple[List[str], List[List[str]]]:
     """
-    Navigate to URL and extract cities ranked by population
+    Walk the table element by element, one WebDriver round-trip per cell
     """
-    driver.get(data_url)
+    # locate the table
+    table = driver.find_element(By.CLASS_NAME, "wpr-table")
 
-    try:
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "wpr-table"))
-        )
+    # get table header
+    headers = [th.text.strip() for th in table.find_elements(By.CSS_SELECTOR, "thead th")]
 
-        # locate the table
-        table = driver.find_element(By.CLASS_NAME, "wpr-table")
+    # get rows
+    rows = []
+    n = 0
+    for tr in table.find_elements(By.CSS_SELECTOR, "tbody tr"):
+        if n >= max_iter:
+            break
+        cells = [td.text.strip() for td in tr.find_elements(By.CSS_SELECTOR, "td")]
+        rows.append(cells)
+        n += 1
 
-        # get table header
-        headers = [th.text.strip() for th in table.find_elements(By.CSS_SELECTOR, "thead th")]
-        if headers:
-            print("Found table header for processing.")
-        else:
-            print("Can not find table header for processing.")
-            raise Exception("Can not find table header for processing.")
+    return headers, rows
 
-        # get rows
-        rows = []
-        n = 0
-        for tr in table.find_elements(By.CSS_SELECTOR, "tbody tr"):
-            if n >= max_iter:
-                break
-            cells = [td.text.strip() for td in tr.find_elements(By.CSS_SELECTOR, "td")]
-            rows.append(cells)
-            n += 1
+def read_table_script(driver, max_iter:int) -> Tuple[List[str], List[List[str]]]:
+    """
+    Pull the header and body matrix out of the page in a single execute_script round-trip
+    """
+    result = driver.execute_script(TABLE_SCRIPT, "wpr-table", max_iter)
+    if result is None:
+        raise NoSuchElementException("wpr-table not found by table script.")
 
-        if rows:
-            print("Found cities from table scrape.")
-        else:
-            print("Can not find rows for cities")
-            raise Exception("Can not find rows for cities.")
+    headers, rows = result
+    return [str(th) for th in headers], [[str(td) for td in tr] for tr in rows]
+
+SELENIUM_TABLE_READERS = {
+    "elements": read_table_elements,
+    "script": read_table_script,
+}
+
+def extract_most_populated_cities(driver, data_url:str, max_iter:int = 10, mode:str = SELENIUM_EXTRACTION_MODE) -> Tuple[List[str], List[List[str]]]:
+    """
+    Navigate to URL and extract cities ranked by population
+    """
+    read_table = SELENIUM_TABLE_READERS[mode]
+    # a failing get propagates so the pool discards the driver, waiting for the table counts as navigation too
+    with scrape_metrics.phase("navigation"):
+        driver.get(data_url)
 
+    try:
+        with scrape_metrics.phase("navigation"):
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.CLASS_NAME, "wpr-table"))
+            )
+
+        with scrape_metrics.phase("extraction"):
+            headers, rows = read_table(driver, max_iter)
 
+        if not headers:
+            raise Exception("Can not find table header for processing.")
+        if not rows:
+            raise Exception("Can not find rows for cities.")
 
     except NoSuchElementException as e:
-        print("Table or element not found:", e)
+        logger.warning("Table or element not found", extra={"url": data_url, "error": str(e)})
         return [], []
     except TimeoutException as e:
-        print("Timed out waiting for table:", e)
+        logger.warning("Timed out waiting for table", extra={"url": data_url, "error": str(e)})
         return [], []
     except StaleElementReferenceException as e:
-        print("Element went stale during scrape:", e)
+        logger.warning("Element went stale during scrape", extra={"url": data_url, "error": str(e)})
         return [], []
+    except WebDriverException as e:
+        # the browser or session died mid scrape, propagate so the pool discards the driver instead of reusing it
+        logger.warning("WebDriver failed during scrape", extra={"url": data_url, "error": str(e)})
+        raise
     except Exception as e:
-        print("Unexpected error:", e)
+        logger.warning("Unexpected error during scrape", extra={"url": data_url, "error": str(e)})
         return [], []
 
     return headers, rows
 
-def configure_chrome_driver() -> webdriver.Chrome:
+def chrome_temp_dir(temp_root:str, name:str) -> str:
+    path = os.path.join(temp_root, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def configure_chrome_driver(temp_root:str = None) -> webdriver.Chrome:
+    temp_root = temp_root or mkdtemp()
+
     chrome_options = Options()
     chrome_options.binary_location = CHROME_BINARY#"/opt/chrome/chrome"
     chrome_options.add_argument("--headless")
@@ -105,18 +181,19 @@ def configure_chrome_driver() -> webdriver.Chrome:
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--disable-dev-tools")
     chrome_options.add_argument("--no-zygote")
-    chrome_options.add_argument("--remote-debugging-port=9222")
-    chrome_options.add_argument(f"--user-data-dir={mkdtemp()}")
-    chrome_options.add_argument(f"--data-path={mkdtemp()}")
-    chrome_options.add_argument(f"--disk-cache-dir={mkdtemp()}")
+    # port 0 lets every pooled browser pick a free port, a fixed one collides once DRIVER_POOL_SIZE > 1
+    chrome_options.add_argument("--remote-debugging-port=0")
+    chrome_options.add_argument(f"--user-data-dir={chrome_temp_dir(temp_root, 'user-data')}")
+    chrome_options.add_argument(f"--data-path={chrome_temp_dir(temp_root, 'data')}")
+    chrome_options.add_argument(f"--disk-cache-dir={chrome_temp_dir(temp_root, 'cache')}")
 
     return webdriver.Chrome(
         options=chrome_options,
         service=ChromeService(CHROME_DRIVER) #"/opt/chromedriver"
     )
 
-def configure_chrome_driver_local() -> webdriver.Chrome:
-    tmp = mkdtemp()
+def configure_chrome_driver_local(temp_root:str = None) -> webdriver.Chrome:
+    tmp = temp_root or mkdtemp()
     
     chrome_options = Options()
     chrome_options.binary_location = CHROME_BINARY
@@ -131,64 +208,328 @@ def configure_chrome_driver_local() -> webdriver.Chrome:
     service = ChromeService(CHROME_DRIVER)
     return webdriver.Chrome(service=service, options=chrome_options)
 
-def lambda_handler(event=None, context=None):
-    now_utc = datetime.now(timezone.utc)
+def create_chrome_driver(temp_root:str) -> webdriver.Chrome:
+    if LOCAL:
+        return configure_chrome_driver_local(temp_root)
+    return configure_chrome_driver(temp_root)
+
+# lives at module level so warm invocations reuse the running browser
+driver_pool = ChromeDriverPool(create_chrome_driver, max_uses=MAX_DRIVER_USES, max_size=DRIVER_POOL_SIZE)
+
+def extract_with_selenium(data_url:str, max_iter:int = 10) -> Tuple[List[str], List[List[str]]]:
+    """
+    Scrape with a pooled driver, Chrome is only started on the first call in a container
+    """
+    with driver_pool.driver() as driver:
+        return extract_most_populated_cities(driver, data_url, max_iter)
+
+EXTRACTION_BACKENDS = {
+    "http": extract_most_populated_cities_http,
+    "selenium": extract_with_selenium,
+}
+
+def backend_order(backend:str) -> List[str]:
+    if backend == "auto":
+        return ["http", "selenium"]
+    if backend not in EXTRACTION_BACKENDS:
+        raise ValueError(f"Unknown extraction backend: {backend}")
+    return [backend]
+
+def extract_table(data_url:str, max_iter:int = 10, backend:str = EXTRACTION_BACKEND) -> Tuple[List[str], List[List[str]]]:
+    """
+    Run the configured extraction backends in order until one returns a table
+    """
+    for name in backend_order(backend):
+        logger.debug("Extracting table", extra={"url": data_url, "backend": name})
+        headers, rows = EXTRACTION_BACKENDS[name](data_url, max_iter)
+        if headers and rows:
+            return headers, rows
+    return [], []
+
+def upload_snapshot(target:Target, scrape_time:datetime, raw_header:List[str], raw_rows:List[List[str]]) -> Tuple[str, int]:
+    """
+    Upload a full scrape, returns its key and size in bytes
+    """
+    if OUTPUT_FORMAT in STREAMING_SERIALIZERS:
+        return stream_snapshot(target, scrape_time, raw_header, raw_rows)
+
+    with scrape_metrics.phase("serialization"):
+        output = compress_output(serialize_rows(raw_header, raw_rows, scrape_time, OUTPUT_FORMAT), COMPRESSION)
+    s3_key = create_s3_key(target.s3_path, scrape_time, SNAPSHOT_SUFFIX, output.file_type)
 
-    s3_key = create_s3_key(S3_PATH, now_utc, "population_ranks")
+    with scrape_metrics.phase("upload"):
+        landing_store.put(s3_key, output.body, output.content_type, output.content_encoding)
+    scrape_metrics.add_payload_bytes(len(output.body))
+    logger.info("Uploaded snapshot", extra={"target": target.name, "s3_key": s3_key, "bytes": len(output.body)})
+    return s3_key, len(output.body)
+
+def stream_snapshot(target:Target, scrape_time:datetime, raw_header:List[str], raw_rows:List[List[str]]) -> Tuple[str, int]:
+    """
+    Serialize and upload chunk by chunk, large scrapes go up as a multipart upload without a full copy in memory
+    """
+    output = compress_stream(stream_rows(raw_header, raw_rows, scrape_time, OUTPUT_FORMAT), COMPRESSION)
+    s3_key = create_s3_key(target.s3_path, scrape_time, SNAPSHOT_SUFFIX, output.file_type)
 
-    driver = None
+    writer = landing_store.open_writer(s3_key, output.content_type, output.content_encoding)
     try:
-        print("Starting WebDriver")
+        while True:
+            with scrape_metrics.phase("serialization"):
+                chunk = next(output.chunks, None)
+            if chunk is None:
+                break
+            with scrape_metrics.phase("upload"):
+                writer.write(chunk)
+        # the last part and the multipart completion happen on close
+        with scrape_metrics.phase("upload"):
+            writer.close()
+    except Exception:
+        writer.abort()
+        raise
 
-        if LOCAL:
-            driver = configure_chrome_driver_local()
-        else:
-            driver = configure_chrome_driver()
-
-        print("Extracting data from table")
-        raw_header, raw_rows = extract_most_populated_cities(driver, DATA_URL, 100)
-        
-        if not raw_header or not raw_rows:
-            raise Exception("Problem grabbing data.")
-        
-        if not validate_row_length(raw_header, raw_rows):
-            raise Exception("Heder length not matching rows.")
-        
-        raw_json = [dict(zip(raw_header, row)) for row in raw_rows]
-            
-
-        s3.put_object(
-            Bucket=S3_BUCKET,
-            Key=s3_key,
-            Body=json.dumps(raw_json),
-            ContentType="application/json"
-        )
-        print("Upload to S3 successful")
+    scrape_metrics.add_payload_bytes(writer.bytes_written)
+    logger.info("Uploaded snapshot", extra={"target": target.name, "s3_key": s3_key, "bytes": writer.bytes_written})
+    return s3_key, writer.bytes_written
 
-        return {
-            "statusCode": 200,
-            "body": json.dumps({
-                "message": "Scraping and upload completed",
-            })
+def upload_diff(target:Target, scrape_time:datetime, state:Dict[str, Any], diff:Dict[str, list]) -> Tuple[str, int]:
+    s3_key = create_s3_key(target.s3_path, scrape_time, DIFF_SUFFIX, compression.compressed_file_type("json", COMPRESSION))
+    with scrape_metrics.phase("serialization"):
+        body = json.dumps({"base_key": state["base_key"], "headers": state["headers"], **diff}).encode("utf-8")
+        body = compression.compress(body, COMPRESSION)
+
+    with scrape_metrics.phase("upload"):
+        landing_store.put(s3_key, body, "application/json", compression.content_encoding(COMPRESSION))
+    scrape_metrics.add_payload_bytes(len(body))
+    logger.info("Uploaded row diff", extra={"target": target.name, "s3_key": s3_key, "bytes": len(body)})
+    return s3_key, len(body)
+
+def record_manifest(target:Target, scrape_time:datetime, s3_key:str, size:int, rows:int, content_hash:str, kind:str,
+                    update_index:bool = True) -> None:
+    """
+    List the new object in its partition manifest, consumers resolve date ranges from there instead of listing
+    """
+    entry = partition_manifest.ManifestEntry(
+        key=s3_key,
+        rows=rows,
+        bytes=size,
+        content_hash=content_hash,
+        scrape_time=scrape_time.astimezone(timezone.utc).isoformat(),
+        kind=kind,
+    )
+    with scrape_metrics.phase("upload"):
+        partition_manifest.record_object(landing_store, S3_PATH, target.name, target.s3_path, entry, update_index)
+
+class Deadline:
+    """
+    Time budget of one scrape run. Threads of timed out targets keep running, and in a warm container
+    resume on the next invocation, so every write checks it first and gives up once the run moved on.
+    """
+
+    def __init__(self, timeout:Optional[float] = None):
+        self.expires_at = None if timeout is None else time.monotonic() + timeout
+        # set when the run reports its unfinished targets, the monotonic clock may not advance while the container is frozen
+        self.abandoned = threading.Event()
+
+    def expired(self) -> bool:
+        return self.abandoned.is_set() or (self.expires_at is not None and time.monotonic() >= self.expires_at)
+
+    def check(self, target:Target, step:str) -> None:
+        if self.expired():
+            raise TimeoutError(f"Run deadline passed before the {step} of {target.name}")
+
+def check_deadline(deadline:Optional[Deadline], target:Target, step:str) -> None:
+    if deadline is not None:
+        deadline.check(target, step)
+
+def scrape_target(target:Target, scrape_time:datetime, mode:str = None, deadline:Optional[Deadline] = None) -> Dict[str, Any]:
+    """
+    Scrape and upload one target, its per-phase timings and payload size are added to the result
+    """
+    with scrape_metrics.recording() as timings:
+        result = scrape_and_upload(target, scrape_time, mode, deadline)
+    result.update(timings.as_dict())
+    return result
+
+def scrape_and_upload(target:Target, scrape_time:datetime, mode:str = None, deadline:Optional[Deadline] = None) -> Dict[str, Any]:
+    """
+    Scrape one target and upload it as its own partitioned object, unchanged tables are skipped unless mode is off
+    """
+    mode = mode or CHANGE_DETECTION
+    if mode not in change_detection.CHANGE_DETECTION_MODES:
+        raise ValueError(f"Unknown change detection mode: {mode}")
+
+    raw_header, raw_rows = extract_table(target.url, 100)
+    
+    if not raw_header or not raw_rows:
+        raise Exception("Problem grabbing data.")
+    
+    return store_table(target, scrape_time, raw_header, raw_rows, mode, deadline=deadline)
+
+def landed_in_month(s3_key:str, scrape_time:datetime) -> bool:
+    """
+    Whether a landing key is in the year/month partition of the scrape time
+    """
+    parts = parse_landing_key(s3_key)
+    return parts is not None and (parts["scrape_time"].year, parts["scrape_time"].month) == (scrape_time.year, scrape_time.month)
+
+def store_table(target:Target, scrape_time:datetime, raw_header:List[str], raw_rows:List[List[str]], mode:str,
+                update_index:bool = True, deadline:Optional[Deadline] = None) -> Dict[str, Any]:
+    """
+    Validate an extracted table and upload it for the given scrape time, shared by live scrapes and backfills.
+    Nothing is uploaded or recorded once the deadline has passed.
+    """
+    with scrape_metrics.phase("validation"):
+        normalized = normalization.normalize_rows(raw_header, raw_rows)
+    if not normalized.num_rows:
+        raise Exception(f"No rows passed validation: {json.dumps(normalized.report())}")
+
+    result = {"target": target.name, "status": "succeeded", "rows": normalized.num_rows}
+    if normalized.bad_rows:
+        # bad rows are reported and left out, the rest of the table is still uploaded
+        report = normalized.report()
+        logger.warning("Dropped rows that failed validation", extra={"target": target.name, **report})
+        result.update(rejected_rows=len(normalized.bad_rows), validation=report)
+        raw_rows = [raw_rows[row] for row in normalized.valid_rows]
+    records = change_detection.normalized_records(raw_header, raw_rows)
+    content_hash = change_detection.content_hash(records)
+    if mode == "off":
+        check_deadline(deadline, target, "upload")
+        s3_key, size = upload_snapshot(target, scrape_time, raw_header, raw_rows)
+        check_deadline(deadline, target, "manifest update")
+        record_manifest(target, scrape_time, s3_key, size, len(raw_rows), content_hash, "snapshot", update_index)
+        result.update(action="uploaded", s3_key=s3_key)
+        return result
+
+    state = change_detection.load_state(landing_store, target.name)
+
+    unchanged = bool(state) and state["hash"] == content_hash
+    # the first scrape of a month is kept even when unchanged, or compaction and publish never create the month's partition
+    if unchanged and landed_in_month(state["last_key"], scrape_time):
+        logger.info("No change, skipping upload", extra={"target": target.name})
+        result.update(action="skipped", s3_key=state["last_key"])
+        return result
+
+    diff = change_detection.plan_diff(state, records) if mode == "diff" and not unchanged else None
+    check_deadline(deadline, target, "upload")
+    if diff is not None:
+        s3_key, size = upload_diff(target, scrape_time, state, diff)
+        check_deadline(deadline, target, "manifest update")
+        record_manifest(target, scrape_time, s3_key, size, len(raw_rows), content_hash, "diff", update_index)
+        state.update(hash=content_hash, last_key=s3_key)
+        result.update(action="diff", s3_key=s3_key)
+    else:
+        s3_key, size = upload_snapshot(target, scrape_time, raw_header, raw_rows)
+        check_deadline(deadline, target, "manifest update")
+        record_manifest(target, scrape_time, s3_key, size, len(raw_rows), content_hash, "snapshot", update_index)
+        state = {
+            "hash": content_hash,
+            "last_key": s3_key,
+            "base_key": s3_key,
+            "headers": list(records[0].keys()),
+            "base_records": records,
         }
+        result.update(action="uploaded", s3_key=s3_key)
+
+    # only recorded once the upload went through, a failed upload is retried on the next run
+    check_deadline(deadline, target, "state update")
+    with scrape_metrics.phase("upload"):
+        change_detection.save_state(landing_store, target.name, state)
+    return result
+
+def remaining_seconds(context) -> Optional[float]:
+    get_remaining = getattr(context, "get_remaining_time_in_millis", None)
+    if get_remaining is None:
+        return None
+    return max(get_remaining() / 1000 - TIMEOUT_MARGIN_SECONDS, 0)
+
+def scrape_targets(targets:List[Target], scrape_time:datetime, max_workers:int = MAX_WORKERS, timeout:Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Scrape targets concurrently, a failing or slow target is reported without failing the others
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(targets))))
+    started = time.monotonic()
+    deadline = Deadline(timeout)
+    futures = {executor.submit(scrape_target, target, scrape_time, deadline=deadline): target for target in targets}
+    wait(futures, timeout=timeout)
+    # from here on unfinished targets are reported as timed out, their threads must not write anything
+    deadline.abandoned.set()
+
+    results = []
+    for future, target in futures.items():
+        if not future.done():
+            future.cancel()
+            results.append({"target": target.name, "status": "timed_out",
+                             "error": f"Not finished after {time.monotonic() - started:.0f} seconds"})
+        elif future.exception():
+            logger.error("Scrape failed", extra={"target": target.name, "error": str(future.exception())})
+            results.append({"target": target.name, "status": "failed", "error": str(future.exception())})
+        else:
+            results.append(future.result())
+
+    # don't hold the invocation open for threads that blew the time budget
+    executor.shutdown(wait=False, cancel_futures=True)
+    return results
 
+def record_metrics(results:List[Dict[str, Any]], run_ms:float) -> None:
+    """
+    EMF metrics for the run, every target adds one value per phase so CloudWatch can report percentiles
+    """
+    for status, metric_name in scrape_metrics.TARGET_STATUS_METRICS.items():
+        count = sum(1 for res in results if res["status"] == status)
+        metrics.add_metric(name=metric_name, unit=MetricUnit.Count, value=count)
+
+    for res in results:
+        if res["status"] != "succeeded":
+            continue
+        metrics.add_metric(name=scrape_metrics.ROWS_METRIC, unit=MetricUnit.Count, value=res["rows"])
+        metrics.add_metric(name=scrape_metrics.REJECTED_ROWS_METRIC, unit=MetricUnit.Count, value=res.get("rejected_rows", 0))
+        metrics.add_metric(name=scrape_metrics.PAYLOAD_BYTES_METRIC, unit=MetricUnit.Bytes, value=res.get("payload_bytes", 0))
+        for phase, ms in res.get("phases_ms", {}).items():
+            metrics.add_metric(name=scrape_metrics.PHASE_METRICS[phase], unit=MetricUnit.Milliseconds, value=ms)
+
+    metrics.add_metric(name=scrape_metrics.RUN_DURATION_METRIC, unit=MetricUnit.Milliseconds, value=run_ms)
+    metrics.add_metric(name=scrape_metrics.PEAK_RSS_METRIC, unit=MetricUnit.Bytes, value=scrape_metrics.peak_rss_bytes())
+
+@metrics.log_metrics
+def lambda_handler(event=None, context=None):
+    now_utc = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    logger.append_keys(request_id=getattr(context, "aws_request_id", None))
+
+    try:
+        targets = load_targets(event, TARGETS, S3_PATH, DATA_URL, TARGET_URL_TEMPLATE)
     except Exception as e:
-        print("ERROR:", str(e))
+        logger.error("Could not load scrape targets", extra={"error": str(e)})
         return {
-            "statusCode": 500,
+            "statusCode": 400,
             "body": json.dumps({"error": str(e)})
         }
 
-    finally:
-        if driver:
-            driver.quit()
-            print("WebDriver closed")
+    results = scrape_targets(targets, now_utc, timeout=remaining_seconds(context))
+    succeeded = sum(1 for res in results if res["status"] == "succeeded")
+    run_ms = (time.perf_counter() - started) * 1000
+    record_metrics(results, run_ms)
+    logger.info("Scrape finished", extra={
+        "targets": len(results),
+        "succeeded": succeeded,
+        "rows": sum(res.get("rows", 0) for res in results),
+        "run_ms": round(run_ms, 3),
+        "peak_rss_bytes": scrape_metrics.peak_rss_bytes(),
+    })
+
+    if succeeded == len(results):
+        status_code = 200
+    elif succeeded:
+        status_code = 207
+    else:
+        status_code = 500
+
+    return {
+        "statusCode": status_code,
+        "body": json.dumps({
+            "message": f"Scraped {succeeded} of {len(results)} targets",
+            "results": results,
+        })
+    }
 
 if __name__ == "__main__":
     lambda_handler({}, {})
-
-    ######################################
-    # add  power tools
-    # custom metrics
-    # alarm on custom metric
-    ######################################
\ No newline at end of file
@@ -0,0 +1,109 @@
+import io
+import json
+import re
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+import compression
+from object_store import ObjectStore
+from output_formats import arrow_table
+
+SNAPSHOT_SUFFIX = "population_ranks"
+# row level changes against an earlier full snapshot, written by the diff change detection mode
+DIFF_SUFFIX = "population_ranks_diff"
+
+# "<prefix>/<target>/year=2025/month=08/2025-08-20_14-35-22_population_ranks.parquet"
+LANDING_KEY = re.compile(
+    r"^(?P<prefix>.*?)/?(?P<target>[^/]+)/year=(?P<year>\d{4})/month=(?P<month>\d{2})/"
+    r"(?P<timestamp>\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})_(?P<suffix>[^/.]+)\.(?P<file_type>[^/]+)$"
+)
+
+
+def parse_landing_key(key: str) -> Optional[dict]:
+    """
+    Split a create_s3_key style key into its parts, None for anything else (manifests, state, temp files)
+    """
+    match = LANDING_KEY.match(key)
+    if not match:
+        return None
+    parts = match.groupdict()
+    parts["scrape_time"] = datetime.strptime(parts["timestamp"], "%Y-%m-%d_%H-%M-%S").replace(tzinfo=timezone.utc)
+    return parts
+
+
+def read_landing_body(store: ObjectStore, key: str, parts: Optional[dict] = None) -> Tuple[str, bytes]:
+    """
+    Uncompressed body of a landing object and its base file type, "jsonl.gz" objects come back as ("jsonl", <lines>)
+    """
+    parts = parts or parse_landing_key(key)
+    if parts is None:
+        raise ValueError(f"Not a landing object key: {key}")
+    # the key extension decides, S3 clients don't undo ContentEncoding on get_object
+    file_type, compression_name = compression.split_file_type(parts["file_type"])
+    return file_type, compression.decompress(store.get(key), compression_name)
+
+
+def read_snapshot_table(store: ObjectStore, key: str, parts: dict):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    file_type, body = read_landing_body(store, key, parts)
+
+    if file_type == "parquet":
+        return pq.read_table(io.BytesIO(body))
+    if file_type == "arrow":
+        return pa.ipc.open_file(pa.BufferReader(body)).read_all()
+    if file_type == "json":
+        raw_json = json.loads(body)
+        headers = list(raw_json[0].keys()) if raw_json else []
+        rows = [[record.get(header, "") for header in headers] for record in raw_json]
+        return arrow_table(headers, rows, parts["scrape_time"])
+    if file_type == "jsonl":
+        records = [json.loads(line) for line in body.splitlines() if line.strip()]
+        headers = list(records[0].keys()) if records else []
+        rows = [[record.get(header, "") for header in headers] for record in records]
+        return arrow_table(headers, rows, parts["scrape_time"])
+    raise ValueError(f"Unsupported landing file type: {file_type}")
+
+
+def read_diff_table(store: ObjectStore, key: str, parts: dict):
+    """
+    Rebuild the full table of a diff object from its base snapshot
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    _, body = read_landing_body(store, key, parts)
+    diff = json.loads(body)
+    base_parts = parse_landing_key(diff["base_key"])
+    base = read_snapshot_table(store, diff["base_key"], base_parts)
+
+    upserts = diff["added"] + diff["changed"]
+    upsert_table = arrow_table(diff["headers"], [[record.get(h, "") for h in diff["headers"]] for record in upserts], parts["scrape_time"])
+
+    replaced = set(diff["removed"]) | set(upsert_table.column("city").to_pylist())
+    base = base.filter(pc.invert(pc.is_in(base.column("city"), value_set=pa.array(sorted(replaced), type=pa.string()))))
+    # unchanged rows carry over from the base but belong to this scrape
+    index = base.schema.get_field_index("scraped_at")
+    field = base.schema.field(index)
+    base = base.set_column(index, field, pa.array([parts["scrape_time"]] * base.num_rows, type=field.type))
+
+    return pa.concat_tables([base, upsert_table], promote_options="default").sort_by("rank")
+
+
+def read_landing_table(store: ObjectStore, key: str):
+    """
+    Read one landing object of any output format into a typed Arrow table
+    """
+    import pyarrow as pa
+
+    parts = parse_landing_key(key)
+    if parts is None:
+        raise ValueError(f"Not a landing object key: {key}")
+
+    if parts["suffix"] == DIFF_SUFFIX:
+        table = read_diff_table(store, key, parts)
+    else:
+        table = read_snapshot_table(store, key, parts)
+
+    return table.append_column("target", pa.array([parts["target"]] * table.num_rows, type=pa.string()))
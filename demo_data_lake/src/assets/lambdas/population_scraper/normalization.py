@@ -0,0 +1,213 @@
+from dataclasses import dataclass, field
+from itertools import zip_longest
+from typing import Any, Dict, List, Tuple
+
+from population_schema import COLUMN_RANGES, KEY_COLUMN, NULL_VALUES, REQUIRED_COLUMNS, column_specs, population_years
+
+# numbers a cleaned cell may hold, checked before the cast so one bad cell can't fail the column
+NUMBER_PATTERNS = {
+    "int": r"^-?\d{1,18}$",
+    "float": r"^-?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?$",
+}
+# bad rows kept in a report, the counts cover all of them
+REPORT_SAMPLE_SIZE = 20
+
+
+@dataclass(frozen=True)
+class BadRow:
+    # position in the scraped rows
+    row: int
+    # {"column", "rule", "value"} for every check the row failed
+    errors: List[Dict[str, Any]]
+
+
+@dataclass
+class NormalizedBatch:
+    """
+    Typed Arrow table of the rows that passed validation, plus what was wrong with the others
+    """
+    table: Any
+    valid_rows: List[int]
+    bad_rows: List[BadRow] = field(default_factory=list)
+
+    @property
+    def num_rows(self) -> int:
+        return len(self.valid_rows)
+
+    def report(self, sample_size: int = REPORT_SAMPLE_SIZE) -> Dict[str, Any]:
+        rules: Dict[str, int] = {}
+        for bad_row in self.bad_rows:
+            for error in bad_row.errors:
+                name = f"{error['column']}:{error['rule']}"
+                rules[name] = rules.get(name, 0) + 1
+        return {
+            "valid_rows": self.num_rows,
+            "bad_rows": len(self.bad_rows),
+            "errors_by_rule": rules,
+            "sample": [{"row": bad_row.row, "errors": bad_row.errors} for bad_row in self.bad_rows[:sample_size]],
+        }
+
+
+def string_columns(width: int, rows: List[List[str]]):
+    """
+    Transpose the scraped matrix into one Arrow string array per column, missing cells become null
+    """
+    import pyarrow as pa
+
+    if all(len(row) == width for row in rows):
+        columns = list(zip(*rows)) if rows else [()] * width
+    else:
+        columns = list(zip_longest(*rows, fillvalue=None))[:width] if rows else []
+        columns += [()] * (width - len(columns))
+    return [pa.array(values if values else [None] * len(rows), type=pa.string()) for values in columns]
+
+
+def clean_strings(values, type_name: str):
+    """
+    Trimmed text with null markers as nulls, numbers also lose thousands separators and % signs
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    text = pc.utf8_trim_whitespace(values)
+    if type_name == "string":
+        return pc.if_else(pc.equal(text, ""), pa.scalar(None, pa.string()), text)
+
+    text = pc.replace_substring(text, ",", "")
+    if type_name == "float":
+        text = pc.utf8_trim_whitespace(pc.utf8_rtrim(text, characters="%"))
+    text = pc.replace_substring_regex(text, r"^\+", "")
+    is_null = pc.is_in(pc.utf8_lower(text), value_set=pa.array(sorted(NULL_VALUES), type=pa.string()))
+    return pc.if_else(is_null, pa.scalar(None, pa.string()), text)
+
+
+def typed_column(values, type_name: str):
+    """
+    Typed array of a string column and the mask of cells that were present but could not be parsed
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    text = clean_strings(values, type_name)
+    if type_name == "string":
+        return text, pa.array([False] * len(text), type=pa.bool_())
+
+    arrow_type = pa.int64() if type_name == "int" else pa.float64()
+    try:
+        # clean columns cast in one go, the regex is only needed to find the cells that don't parse
+        return pc.cast(text, arrow_type), pa.array([False] * len(text), type=pa.bool_())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        pass
+    matches = pc.match_substring_regex(text, NUMBER_PATTERNS[type_name])
+    invalid = pc.fill_null(pc.invert(matches), False)
+    parsable = pc.if_else(invalid, pa.scalar(None, pa.string()), text)
+    return pc.cast(parsable, arrow_type), invalid
+
+
+def typed_arrays(headers: List[str], rows: List[List[str]]) -> Tuple[List[Any], List[Any], Dict[str, Any]]:
+    """
+    Arrow fields and arrays of the canonical columns, with the parse failure mask of every column.
+    Cells that fail to parse or are missing become null.
+    """
+    import pyarrow as pa
+
+    arrow_types = {"int": pa.int64(), "float": pa.float64(), "string": pa.string()}
+    specs = column_specs(headers)
+
+    fields, arrays, invalid = [], [], {}
+    for (name, type_name), values in zip(specs, string_columns(len(specs), rows)):
+        array, invalid[name] = typed_column(values, type_name)
+        fields.append(pa.field(name, arrow_types[type_name]))
+        arrays.append(array)
+
+    for name, year in population_years(headers).items():
+        fields.append(pa.field(name, pa.int64()))
+        arrays.append(pa.array([year] * len(rows), type=pa.int64()))
+
+    return fields, arrays, invalid
+
+
+def duplicate_keys(keys):
+    """
+    Every occurrence of a key after its first one
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    positions = pa.array(range(len(keys)), type=pa.int64())
+    first = pa.table({"key": keys, "position": positions}).group_by("key", use_threads=False).aggregate([("position", "min")])
+    return pc.and_(pc.is_valid(keys), pc.invert(pc.is_in(positions, value_set=first.column("position_min"))))
+
+
+def length_error(row: List[str], width: int) -> Dict[str, Any]:
+    return {"column": None, "rule": "length", "value": len(row), "expected": width}
+
+
+def normalize_rows(headers: List[str], rows: List[List[str]]) -> NormalizedBatch:
+    """
+    Parse the scraped rows into a typed Arrow table in bulk and drop the rows that fail a check:
+    header length, cell types, required columns, value ranges (population_schema) and a unique city.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    width = len(headers)
+    lengths = pa.array([len(row) for row in rows], type=pa.int64())
+    complete = pc.equal(lengths, width)
+    # only rows of the right length are parsed, a shifted row would put values in the wrong columns
+    complete_rows = pc.indices_nonzero(complete).to_pylist()
+    if not complete_rows:
+        # nothing to parse, e.g. after a site layout change; Arrow kernels on the empty columns can crash the process
+        fields, _, _ = typed_arrays(headers, [])
+        return NormalizedBatch(
+            table=pa.schema(fields).empty_table(),
+            valid_rows=[],
+            bad_rows=[BadRow(row, [length_error(rows[row], width)]) for row in range(len(rows))],
+        )
+    candidate_rows = [rows[i] for i in complete_rows] if len(complete_rows) != len(rows) else rows
+
+    fields, arrays, invalid = typed_arrays(headers, candidate_rows)
+    table = pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+    checks = []
+    for name, mask in invalid.items():
+        checks.append((name, "type", mask))
+    for name in REQUIRED_COLUMNS:
+        if name in table.column_names:
+            checks.append((name, "required", pc.is_null(table.column(name))))
+        else:
+            checks.append((name, "required", pa.array([True] * table.num_rows, type=pa.bool_())))
+    for name, (low, high) in COLUMN_RANGES.items():
+        if name not in table.column_names:
+            continue
+        column = table.column(name)
+        if low is not None:
+            checks.append((name, "min", pc.fill_null(pc.less(column, low), False)))
+        if high is not None:
+            checks.append((name, "max", pc.fill_null(pc.greater(column, high), False)))
+    if KEY_COLUMN in table.column_names:
+        checks.append((KEY_COLUMN, "unique", duplicate_keys(table.column(KEY_COLUMN).combine_chunks())))
+
+    failed = pa.array([False] * table.num_rows, type=pa.bool_())
+    for _, _, mask in checks:
+        failed = pc.or_(failed, mask)
+
+    # errors are only built for the failing rows, clean scrapes never leave Arrow
+    errors: Dict[int, List[Dict[str, Any]]] = {}
+    for row in pc.indices_nonzero(pc.invert(complete)).to_pylist():
+        errors[row] = [length_error(rows[row], width)]
+    column_index = {name: index for index, (name, _) in enumerate(column_specs(headers))}
+    for name, rule, mask in checks:
+        for position in pc.indices_nonzero(mask).to_pylist():
+            row = complete_rows[position]
+            index = column_index.get(name)
+            value = rows[row][index] if index is not None else None
+            errors.setdefault(row, []).append({"column": name, "rule": rule, "value": value})
+
+    keep = pc.invert(failed)
+    valid_positions = pc.indices_nonzero(keep).to_pylist()
+    return NormalizedBatch(
+        table=table.filter(keep),
+        valid_rows=[complete_rows[position] for position in valid_positions],
+        bad_rows=[BadRow(row, errors[row]) for row in sorted(errors)],
+    )
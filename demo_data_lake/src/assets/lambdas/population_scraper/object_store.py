@@ -0,0 +1,305 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+# S3 parts other than the last must be at least 5 MiB, smaller outputs are written with a single put
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class ObjectInfo:
+    key: str
+    size: int
+    # changes whenever the object body changes, S3 ETag or local mtime/size
+    version: str
+
+
+def object_headers(content_type: Optional[str] = None, content_encoding: Optional[str] = None) -> dict:
+    """
+    put_object / create_multipart_upload arguments, the encoding tells clients how the body was compressed
+    """
+    extra = {"ContentType": content_type} if content_type else {}
+    if content_encoding:
+        extra["ContentEncoding"] = content_encoding
+    return extra
+
+
+class ObjectWriter(ABC):
+    """
+    Write handle for one object, the object only appears once close() succeeds.
+    Used as a context manager the upload is aborted when the block raises.
+    """
+
+    def __init__(self):
+        self.bytes_written = 0
+
+    @abstractmethod
+    def write(self, data: bytes) -> int:
+        ...
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+    @abstractmethod
+    def abort(self) -> None:
+        ...
+
+    def __enter__(self) -> "ObjectWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class BufferedObjectWriter(ObjectWriter):
+    """
+    Fallback writer for stores without streaming uploads, collects the body and puts it on close
+    """
+
+    def __init__(self, store: "ObjectStore", key: str, content_type: Optional[str] = None,
+                 content_encoding: Optional[str] = None):
+        super().__init__()
+        self.store = store
+        self.key = key
+        self.content_type = content_type
+        self.content_encoding = content_encoding
+        self.buffer = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        self.bytes_written += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        self.store.put(self.key, bytes(self.buffer), self.content_type, self.content_encoding)
+        self.buffer = bytearray()
+
+    def abort(self) -> None:
+        self.buffer = bytearray()
+
+
+class ObjectStore(ABC):
+    """
+    The few bucket operations the pipeline needs, so jobs can run against S3 or a local directory
+    """
+
+    @abstractmethod
+    def list_objects(self, prefix: str = "") -> Iterator[ObjectInfo]:
+        ...
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def put(self, key: str, body: bytes, content_type: Optional[str] = None,
+            content_encoding: Optional[str] = None) -> None:
+        ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    def open_writer(self, key: str, content_type: Optional[str] = None,
+                    content_encoding: Optional[str] = None) -> ObjectWriter:
+        return BufferedObjectWriter(self, key, content_type, content_encoding)
+
+
+class S3ObjectWriter(ObjectWriter):
+    """
+    Holds at most one part in memory, switches to a multipart upload once the body passes part_size
+    """
+
+    def __init__(self, client, bucket: str, key: str, content_type: Optional[str] = None,
+                 part_size: int = MULTIPART_THRESHOLD, content_encoding: Optional[str] = None):
+        super().__init__()
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.extra = object_headers(content_type, content_encoding)
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.upload_id: Optional[str] = None
+        self.parts = []
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        self.bytes_written += len(data)
+        if len(self.buffer) >= self.part_size:
+            self._upload_part()
+        return len(data)
+
+    def _upload_part(self) -> None:
+        if self.upload_id is None:
+            self.upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key, **self.extra)["UploadId"]
+        part_number = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=part_number, Body=bytes(self.buffer)
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+        self.buffer = bytearray()
+
+    def close(self) -> None:
+        if self.upload_id is None:
+            self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer), **self.extra)
+            self.buffer = bytearray()
+            return
+
+        try:
+            if self.buffer:
+                self._upload_part()
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, MultipartUpload={"Parts": self.parts}
+            )
+        except Exception:
+            self.abort()
+            raise
+
+    def abort(self) -> None:
+        self.buffer = bytearray()
+        if self.upload_id is not None:
+            # uploaded parts are billed until the upload is aborted
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            self.upload_id = None
+
+
+class LocalObjectWriter(ObjectWriter):
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        self.file = open(self.tmp_path, "wb")
+
+    def write(self, data: bytes) -> int:
+        self.file.write(data)
+        self.bytes_written += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class S3ObjectStore(ObjectStore):
+
+    def __init__(self, bucket: str, client=None, endpoint_url: Optional[str] = None):
+        if client is None:
+            import boto3
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.client = client
+
+    def list_objects(self, prefix: str = "") -> Iterator[ObjectInfo]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield ObjectInfo(key=obj["Key"], size=obj["Size"], version=obj["ETag"].strip('"'))
+
+    def get(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def put(self, key: str, body: bytes, content_type: Optional[str] = None,
+            content_encoding: Optional[str] = None) -> None:
+        extra = object_headers(content_type, content_encoding)
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=body, **extra)
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def open_writer(self, key: str, content_type: Optional[str] = None,
+                    content_encoding: Optional[str] = None) -> ObjectWriter:
+        return S3ObjectWriter(self.client, self.bucket, key, content_type, content_encoding=content_encoding)
+
+
+class LocalObjectStore(ObjectStore):
+    """
+    Directory stand-in for a bucket, keys map to relative file paths
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"Key escapes the local store: {key}")
+        return path
+
+    def list_objects(self, prefix: str = "") -> Iterator[ObjectInfo]:
+        if not os.path.isdir(self.root):
+            return
+        keys = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if ".tmp-" in filename:
+                    continue
+                key = os.path.relpath(os.path.join(dirpath, filename), self.root).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    keys.append(key)
+
+        # S3 lists keys in lexicographic order, keep the same contract
+        for key in sorted(keys):
+            stat = os.stat(self._path(key))
+            yield ObjectInfo(key=key, size=stat.st_size, version=f"{stat.st_mtime_ns}-{stat.st_size}")
+
+    def get(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def put(self, key: str, body: bytes, content_type: Optional[str] = None,
+            content_encoding: Optional[str] = None) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        # write then rename so readers never see a partial object
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def open_writer(self, key: str, content_type: Optional[str] = None,
+                    content_encoding: Optional[str] = None) -> ObjectWriter:
+        return LocalObjectWriter(self._path(key))
+
+
+def object_store(bucket: str, local_root: Optional[str] = None, endpoint_url: Optional[str] = None) -> ObjectStore:
+    """
+    S3 bucket, or <local_root>/<bucket> when a local root directory is given.
+    endpoint_url sends the S3 calls to a local stand-in such as moto_server instead.
+    """
+    if local_root:
+        return LocalObjectStore(os.path.join(local_root, bucket))
+    return S3ObjectStore(bucket, endpoint_url=endpoint_url)
+
+
+def configured_store(bucket: str) -> ObjectStore:
+    """
+    object_store for the local backend settings in the environment, S3 when none are set.
+    LOCAL_ROOT is a directory with one sub directory per bucket, LOCAL_ENDPOINT_URL a local S3 endpoint.
+    """
+    return object_store(bucket, os.environ.get("LOCAL_ROOT") or None, os.environ.get("LOCAL_ENDPOINT_URL") or None)
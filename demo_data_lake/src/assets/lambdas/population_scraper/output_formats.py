@@ -0,0 +1,150 @@
+import io
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+import compression
+from normalization import typed_arrays
+
+PARQUET_COMPRESSION = "zstd"
+# rows serialized per chunk when streaming, keeps the serialized copy of a scrape to one chunk
+JSONL_CHUNK_ROWS = 500
+
+
+@dataclass
+class SerializedOutput:
+    body: bytes
+    file_type: str
+    content_type: str
+    content_encoding: Optional[str] = None
+
+
+@dataclass
+class StreamingOutput:
+    chunks: Iterator[bytes]
+    file_type: str
+    content_type: str
+    content_encoding: Optional[str] = None
+
+
+def arrow_table(headers: List[str], rows: List[List[str]], scrape_time: datetime):
+    """
+    Typed Arrow table of the scrape with the scrape timestamp as a column
+    """
+    # pyarrow is only loaded when a columnar format is requested
+    import pyarrow as pa
+
+    fields, arrays, _ = typed_arrays(headers, rows)
+
+    fields.append(pa.field("scraped_at", pa.timestamp("ms", tz="UTC")))
+    arrays.append(pa.array([scrape_time] * len(rows), type=pa.timestamp("ms", tz="UTC")))
+
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def to_json(headers: List[str], rows: List[List[str]], scrape_time: datetime) -> SerializedOutput:
+    raw_json = [dict(zip(headers, row)) for row in rows]
+    return SerializedOutput(json.dumps(raw_json).encode("utf-8"), "json", "application/json")
+
+
+def jsonl_chunks(headers: List[str], rows: List[List[str]]) -> Iterator[bytes]:
+    """
+    One raw string dict per line, same records as the json format
+    """
+    for start in range(0, len(rows), JSONL_CHUNK_ROWS):
+        lines = (json.dumps(dict(zip(headers, row))) for row in rows[start:start + JSONL_CHUNK_ROWS])
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def stream_jsonl(headers: List[str], rows: List[List[str]], scrape_time: datetime) -> StreamingOutput:
+    return StreamingOutput(jsonl_chunks(headers, rows), "jsonl", "application/x-ndjson")
+
+
+def to_jsonl(headers: List[str], rows: List[List[str]], scrape_time: datetime) -> SerializedOutput:
+    output = stream_jsonl(headers, rows, scrape_time)
+    return SerializedOutput(b"".join(output.chunks), output.file_type, output.content_type)
+
+
+def to_parquet(headers: List[str], rows: List[List[str]], scrape_time: datetime) -> SerializedOutput:
+    import pyarrow.parquet as pq
+
+    buffer = io.BytesIO()
+    pq.write_table(arrow_table(headers, rows, scrape_time), buffer, compression=PARQUET_COMPRESSION)
+    return SerializedOutput(buffer.getvalue(), "parquet", "application/vnd.apache.parquet")
+
+
+def to_arrow(headers: List[str], rows: List[List[str]], scrape_time: datetime) -> SerializedOutput:
+    import pyarrow as pa
+
+    table = arrow_table(headers, rows, scrape_time)
+    buffer = io.BytesIO()
+    options = pa.ipc.IpcWriteOptions(compression=PARQUET_COMPRESSION)
+    with pa.ipc.new_file(buffer, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return SerializedOutput(buffer.getvalue(), "arrow", "application/vnd.apache.arrow.file")
+
+
+SERIALIZERS = {
+    "json": to_json,
+    "jsonl": to_jsonl,
+    "parquet": to_parquet,
+    "arrow": to_arrow,
+}
+
+
+# formats written chunk by chunk through ObjectStore.open_writer instead of as one body
+STREAMING_SERIALIZERS = {
+    "jsonl": stream_jsonl,
+}
+
+
+def stream_rows(headers: List[str], rows: List[List[str]], scrape_time: datetime, output_format: str) -> StreamingOutput:
+    if output_format not in STREAMING_SERIALIZERS:
+        raise ValueError(f"Output format can't be streamed: {output_format}")
+    return STREAMING_SERIALIZERS[output_format](headers, rows, scrape_time)
+
+
+def serialize_rows(headers: List[str], rows: List[List[str]], scrape_time: datetime, output_format: str = "json") -> SerializedOutput:
+    """
+    Serialize a scrape in the landing output format, json keeps the raw string dicts
+    """
+    if output_format not in SERIALIZERS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    return SERIALIZERS[output_format](headers, rows, scrape_time)
+
+
+def compress_output(output: SerializedOutput, compression_name: str) -> SerializedOutput:
+    """
+    Wrap a text output in gzip or zstd, the file type gains the matching extension for create_s3_key
+    """
+    if not compression.applies_to(output.file_type, compression_name):
+        return output
+    return SerializedOutput(
+        compression.compress(output.body, compression_name),
+        compression.compressed_file_type(output.file_type, compression_name),
+        output.content_type,
+        compression.content_encoding(compression_name),
+    )
+
+
+def compressed_chunks(chunks: Iterator[bytes], compression_name: str) -> Iterator[bytes]:
+    compressor = compression.ChunkCompressor(compression_name)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    tail = compressor.flush()
+    if tail:
+        yield tail
+
+
+def compress_stream(output: StreamingOutput, compression_name: str) -> StreamingOutput:
+    if not compression.applies_to(output.file_type, compression_name):
+        return output
+    return StreamingOutput(
+        compressed_chunks(output.chunks, compression_name),
+        compression.compressed_file_type(output.file_type, compression_name),
+        output.content_type,
+        compression.content_encoding(compression_name),
+    )
@@ -0,0 +1,160 @@
+import json
+import threading
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, time, timezone
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from object_store import ObjectStore
+
+# underscore names are skipped by Athena and Glue, and don't match landing_reader.LANDING_KEY
+MANIFEST_NAME = "_manifest.json"
+INDEX_NAME = "_manifests/index.json"
+
+# targets are scraped on parallel threads, they share the index but every partition has one writer per run
+_index_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    key: str
+    rows: int
+    bytes: int
+    # change_detection.content_hash of the normalized rows, equal for equal tables whatever the file format
+    content_hash: str
+    # ISO 8601 in UTC
+    scrape_time: str
+    # snapshot or diff
+    kind: str = "snapshot"
+
+    @property
+    def scraped_at(self) -> datetime:
+        return datetime.fromisoformat(self.scrape_time)
+
+
+def partition_prefix(s3_path: str, year: int, month: int) -> str:
+    """
+    Same layout as create_s3_key
+    """
+    return f"{s3_path.rstrip('/')}/year={year}/month={month:02d}"
+
+
+def manifest_key(s3_path: str, year: int, month: int) -> str:
+    return f"{partition_prefix(s3_path, year, month)}/{MANIFEST_NAME}"
+
+
+def index_key(prefix: str) -> str:
+    prefix = prefix.strip("/")
+    return f"{prefix}/{INDEX_NAME}" if prefix else INDEX_NAME
+
+
+def read_json(store: ObjectStore, key: str, default: dict) -> dict:
+    if not store.exists(key):
+        return default
+    return json.loads(store.get(key))
+
+
+def write_json(store: ObjectStore, key: str, value: dict) -> None:
+    store.put(key, json.dumps(value, indent=1, sort_keys=True).encode("utf-8"), "application/json")
+
+
+def load_manifest(store: ObjectStore, s3_path: str, year: int, month: int) -> List[ManifestEntry]:
+    manifest = read_json(store, manifest_key(s3_path, year, month), {"objects": []})
+    return [ManifestEntry(**entry) for entry in manifest["objects"]]
+
+
+def load_index(store: ObjectStore, prefix: str) -> Dict[str, dict]:
+    """
+    {target: {"s3_path": ..., "partitions": ["2025-08", ...]}} for every target with a manifest
+    """
+    return read_json(store, index_key(prefix), {"targets": {}})["targets"]
+
+
+def record_object(store: ObjectStore, prefix: str, target: str, s3_path: str, entry: ManifestEntry,
+                  update_index: bool = True) -> None:
+    """
+    Add an uploaded landing object to its partition manifest and the partition to the index.
+    Recording the same key again replaces its entry, so replays don't duplicate it.
+    """
+    scraped_at = entry.scraped_at
+    key = manifest_key(s3_path, scraped_at.year, scraped_at.month)
+    entries = {existing.key: existing for existing in load_manifest(store, s3_path, scraped_at.year, scraped_at.month)}
+    entries[entry.key] = entry
+
+    objects = sorted(entries.values(), key=lambda e: (e.scrape_time, e.key))
+    write_json(store, key, {
+        "target": target,
+        "partition": f"year={scraped_at.year}/month={scraped_at.month:02d}",
+        "rows": sum(e.rows for e in objects),
+        "bytes": sum(e.bytes for e in objects),
+        "objects": [asdict(e) for e in objects],
+    })
+
+    if update_index:
+        index_partitions(store, prefix, target, s3_path, [partition_name(scraped_at.year, scraped_at.month)])
+
+
+def partition_name(year: int, month: int) -> str:
+    return f"{year}-{month:02d}"
+
+
+def index_partitions(store: ObjectStore, prefix: str, target: str, s3_path: str, partitions: List[str]) -> None:
+    """
+    Add partitions of a target to the index, a no-op when they are all listed already
+    """
+    with _index_lock:
+        targets = load_index(store, prefix)
+        listed = targets.get(target, {"s3_path": s3_path, "partitions": []})
+        if set(partitions) <= set(listed["partitions"]) and listed["s3_path"] == s3_path:
+            return
+        listed["s3_path"] = s3_path
+        listed["partitions"] = sorted(set(listed["partitions"]) | set(partitions))
+        targets[target] = listed
+        write_json(store, index_key(prefix), {"targets": targets})
+
+
+def as_utc(value: Union[date, datetime], end: bool = False) -> datetime:
+    """
+    Dates cover the whole day, naive datetimes are taken as UTC
+    """
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time.max if end else time.min)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def months_between(start: datetime, end: datetime) -> Iterator[Tuple[int, int]]:
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def resolve_range(store: ObjectStore, prefix: str, start: Union[date, datetime], end: Union[date, datetime],
+                  targets: Optional[List[str]] = None) -> List[ManifestEntry]:
+    """
+    Landing objects scraped between start and end (inclusive) without listing the bucket,
+    one read for the index plus one per partition in the range that has data
+    """
+    start, end = as_utc(start), as_utc(end, end=True)
+    if end < start:
+        raise ValueError(f"Range ends before it starts: {start.isoformat()} - {end.isoformat()}")
+
+    index = load_index(store, prefix)
+    wanted = set(months_between(start, end))
+
+    entries = []
+    for target in sorted(index if targets is None else targets):
+        if target not in index:
+            continue
+        listed = index[target]
+        for partition in listed["partitions"]:
+            year, month = (int(part) for part in partition.split("-"))
+            if (year, month) not in wanted:
+                continue
+            entries.extend(
+                entry for entry in load_manifest(store, listed["s3_path"], year, month)
+                if start <= entry.scraped_at <= end
+            )
+
+    return sorted(entries, key=lambda e: (e.scrape_time, e.key))
@@ -0,0 +1,94 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+NULL_VALUES = {"", "-", "—", "n/a", "na", "null"}
+
+# header pattern -> canonical column name and type, first match wins
+COLUMN_RULES: List[Tuple["re.Pattern", str, str]] = [
+    (re.compile(r"^rank$", re.I), "rank", "int"),
+    (re.compile(r"^(name|city)$", re.I), "city", "string"),
+    (re.compile(r"(change|growth)", re.I), "growth_pct", "float"),
+    (re.compile(r"density", re.I), "density_per_sq_mi", "float"),
+    (re.compile(r"area", re.I), "area_sq_mi", "float"),
+]
+POPULATION_HEADER = re.compile(r"^(\d{4})\s+pop", re.I)
+
+# validation rules on canonical columns, bounds are inclusive and None is open
+KEY_COLUMN = "city"
+REQUIRED_COLUMNS = ("rank", "city", "population")
+COLUMN_RANGES: Dict[str, Tuple[Optional[float], Optional[float]]] = {
+    "rank": (1, None),
+    "population": (0, None),
+    "prior_population": (0, None),
+    "growth_pct": (-100, None),
+    "density_per_sq_mi": (0, None),
+    "area_sq_mi": (0, None),
+}
+
+
+def snake_case(header: str) -> str:
+    name = re.sub(r"[^0-9a-z]+", "_", header.lower()).strip("_")
+    return name or "column"
+
+
+def header_years(headers: List[str]) -> List[int]:
+    """
+    Years of the "<year> Pop." columns, newest first
+    """
+    matches = (POPULATION_HEADER.match(header.strip()) for header in headers)
+    return sorted({int(m.group(1)) for m in matches if m}, reverse=True)
+
+
+def population_column(year: int, years: List[int]) -> str:
+    position = years.index(year)
+    if position == 0:
+        return "population"
+    if position == 1:
+        return "prior_population"
+    return f"population_{year}"
+
+
+def column_specs(headers: List[str]) -> List[Tuple[str, str]]:
+    """
+    Map scraped headers to canonical (name, type) pairs.
+    The newest "<year> Pop." column becomes population and the older one prior_population,
+    so the output schema does not change when the site rolls over to a new year.
+    """
+    years = header_years(headers)
+
+    specs = []
+    for header in headers:
+        header = header.strip()
+        pop_match = POPULATION_HEADER.match(header)
+        if pop_match:
+            specs.append((population_column(int(pop_match.group(1)), years), "int"))
+            continue
+
+        for pattern, name, type_name in COLUMN_RULES:
+            if pattern.search(header):
+                specs.append((name, type_name))
+                break
+        else:
+            specs.append((snake_case(header), "string"))
+
+    # keep names unique if the site ever repeats a header
+    seen: Dict[str, int] = {}
+    unique = []
+    for name, type_name in specs:
+        seen[name] = seen.get(name, 0) + 1
+        unique.append((name if seen[name] == 1 else f"{name}_{seen[name]}", type_name))
+    return unique
+
+
+def population_years(headers: List[str]) -> Dict[str, int]:
+    """
+    Year columns that go along with population / prior_population
+    """
+    years = header_years(headers)
+    res = {}
+    if years:
+        res["population_year"] = years[0]
+    if len(years) > 1:
+        res["prior_population_year"] = years[1]
+    return res
+
@@ -0,0 +1,289 @@
+import argparse
+import io
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from aws_lambda_powertools import Logger
+
+import scrape_metrics
+from compaction import PART_NAME, PROCESSED_PREFIX, Partition
+from object_store import ObjectInfo, ObjectStore, object_store
+
+PROCESSED_BUCKET = os.environ.get("PROCESSED_BUCKET", "")
+PUBLISHED_BUCKET = os.environ.get("PUBLISHED_BUCKET", "")
+# directory holding one sub directory per bucket, used instead of S3 for local runs
+LOCAL_ROOT = os.environ.get("LOCAL_ROOT", "")
+# local S3 stand-in such as moto_server, used when LOCAL_ROOT is not set
+LOCAL_ENDPOINT_URL = os.environ.get("LOCAL_ENDPOINT_URL", "")
+FASTEST_GROWING_LIMIT = int(os.environ.get("FASTEST_GROWING_LIMIT", "10"))
+
+# month end ranking of every target and month, the input of the deltas
+MONTHLY_PREFIX = "population_city_monthly"
+# month over month population and rank changes, one partition per target and month
+DELTAS_PREFIX = "population_city_deltas"
+# latest month of every target in a single file per table, what dashboards read
+RANKINGS_KEY = f"population_rankings/{PART_NAME}"
+FASTEST_GROWING_KEY = f"population_fastest_growing/{PART_NAME}"
+# where every published file is, with the processed version it was built from
+INDEX_KEY = "_index/population.json"
+
+logger = Logger(service=scrape_metrics.SERVICE_NAME)
+
+PROCESSED_KEY = re.compile(
+    rf"^{PROCESSED_PREFIX}/(?P<target>[^/]+)/year=(?P<year>\d{{4}})/month=(?P<month>\d{{2}})/{re.escape(PART_NAME)}$"
+)
+MONTHLY_COLUMNS = ["target", "city", "rank", "population", "scraped_at"]
+
+
+def processed_partitions(objects: List[ObjectInfo]) -> Dict[Partition, ObjectInfo]:
+    partitions = {}
+    for obj in objects:
+        match = PROCESSED_KEY.match(obj.key)
+        if match:
+            partitions[Partition(match["target"], match["year"], match["month"])] = obj
+    return partitions
+
+
+def load_index(store: ObjectStore) -> Dict[str, Any]:
+    if not store.exists(INDEX_KEY):
+        return {"partitions": {}, "tables": {}}
+    return json.loads(store.get(INDEX_KEY))
+
+
+def save_index(store: ObjectStore, index: Dict[str, Any]) -> None:
+    store.put(INDEX_KEY, json.dumps(index, indent=1, sort_keys=True).encode("utf-8"), "application/json")
+
+
+def read_parquet(store: ObjectStore, key: str):
+    import pyarrow.parquet as pq
+
+    return pq.read_table(io.BytesIO(store.get(key)))
+
+
+def write_sorted_parquet(store: ObjectStore, key: str, table, sort_keys: List[str]) -> Dict[str, Any]:
+    """
+    Write the table ordered by sort_keys and declare the order in the footer,
+    so readers can prune row groups and binary search on the keys
+    """
+    import pyarrow.parquet as pq
+
+    ordering = [(name, "ascending") for name in sort_keys]
+    table = table.sort_by(ordering)
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression="zstd",
+                   sorting_columns=pq.SortingColumn.from_ordering(table.schema, ordering))
+    body = buffer.getvalue()
+    store.put(key, body, "application/vnd.apache.parquet")
+    return {"key": key, "rows": table.num_rows, "bytes": len(body)}
+
+
+def month_end(table):
+    """
+    Ranking of the last scrape in the partition. Earlier scrapes are left out, a city that fell
+    out of the scraped top rows would otherwise keep a stale rank next to the city that took it.
+    """
+    import pyarrow.compute as pc
+
+    last = pc.max(table.column("scraped_at"))
+    latest = table.filter(pc.equal(table.column("scraped_at"), last))
+    return latest.select(MONTHLY_COLUMNS).sort_by("rank")
+
+
+def month_over_month(current, previous):
+    """
+    Current month end ranking with the population and rank of every city in the previous one.
+    A positive rank_change means the city moved up, cities new to the ranking have null changes.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if previous is None:
+        previous = current.schema.empty_table()
+    before = previous.select(["city", "rank", "population", "scraped_at"]).rename_columns(
+        ["city", "previous_rank", "previous_population", "previous_scraped_at"]
+    )
+    joined = current.join(before, keys="city", join_type="left outer", use_threads=False)
+
+    population = pc.cast(joined.column("population"), pa.float64())
+    previous_population = pc.cast(joined.column("previous_population"), pa.float64())
+    population_change = pc.subtract(joined.column("population"), joined.column("previous_population"))
+    change_pct = pc.multiply(pc.divide(pc.subtract(population, previous_population), previous_population), 100.0)
+    # a zero population has no meaningful growth rate
+    change_pct = pc.if_else(pc.equal(previous_population, 0.0), pa.scalar(None, pa.float64()), change_pct)
+
+    return (joined
+            .append_column("rank_change", pc.subtract(joined.column("previous_rank"), joined.column("rank")))
+            .append_column("population_change", population_change)
+            .append_column("population_change_pct", change_pct)
+            .sort_by("rank"))
+
+
+def fastest_growing(deltas, limit: int = FASTEST_GROWING_LIMIT):
+    """
+    Cities of the month with the largest relative growth, numbered from 1 in growth_rank
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    growing = deltas.filter(pc.is_valid(deltas.column("population_change_pct")))
+    top = growing.sort_by([("population_change_pct", "descending"), ("rank", "ascending")]).slice(0, limit)
+    return top.append_column("growth_rank", pa.array(range(1, top.num_rows + 1), type=pa.int64()))
+
+
+def concat(tables: List[Any]):
+    import pyarrow as pa
+
+    return pa.concat_tables(tables, promote_options="default")
+
+
+def publish_target(processed: ObjectStore, published: ObjectStore, index: Dict[str, Any],
+                   partitions: List[Partition], versions: Dict[Partition, str]) -> List[dict]:
+    """
+    Rebuild the month end ranking of every changed partition of a target, then the deltas of those months
+    and of the month following each of them. Only the small monthly tables are read for the deltas.
+    """
+    entries = index["partitions"]
+    changed = [p for p in partitions if entries.get(p.id, {}).get("source_version") != versions[p]]
+    if not changed:
+        return []
+
+    monthly: Dict[Partition, Any] = {}
+    for partition in changed:
+        monthly[partition] = month_end(read_parquet(processed, partition.key(PROCESSED_PREFIX)))
+        entries.setdefault(partition.id, {})["monthly"] = write_sorted_parquet(
+            published, partition.key(MONTHLY_PREFIX), monthly[partition], ["rank"]
+        )
+
+    def month_table(partition: Partition):
+        if partition not in monthly:
+            monthly[partition] = read_parquet(published, entries[partition.id]["monthly"]["key"])
+        return monthly[partition]
+
+    stale = set(changed)
+    for position, partition in enumerate(partitions):
+        if partition in changed and position + 1 < len(partitions):
+            stale.add(partitions[position + 1])
+
+    results = []
+    for position, partition in enumerate(partitions):
+        if partition not in stale:
+            continue
+        # the previous month with a scrape, gaps in the history are skipped
+        previous = month_table(partitions[position - 1]) if position else None
+        deltas = month_over_month(month_table(partition), previous)
+        entry = entries.setdefault(partition.id, {})
+        entry["deltas"] = write_sorted_parquet(published, partition.key(DELTAS_PREFIX), deltas, ["rank"])
+        # processed versions of both months, the latest tables are rebuilt when they differ
+        entry["deltas"]["sources"] = [versions[partition], versions[partitions[position - 1]] if position else None]
+        entry["previous"] = partitions[position - 1].id if position else None
+        results.append({"partition": partition.id, "rows": deltas.num_rows, "source_changed": partition in changed})
+
+    # recorded last, a run that stopped half way rebuilds the partition next time
+    for partition in changed:
+        entries[partition.id]["source_version"] = versions[partition]
+    return results
+
+
+def publish_latest(published: ObjectStore, index: Dict[str, Any], latest: Dict[str, Partition],
+                   limit: int = FASTEST_GROWING_LIMIT) -> bool:
+    """
+    Rankings and fastest growing cities of the latest month of every target,
+    rebuilt when the deltas of a latest month were built from other processed data
+    """
+    months = {target: partition.id for target, partition in sorted(latest.items())}
+    sources = {target: index["partitions"][partition_id]["deltas"]["sources"] for target, partition_id in months.items()}
+    tables = index["tables"]
+    if all(tables.get(name, {}).get("sources") == sources for name in ("rankings", "fastest_growing")):
+        return False
+
+    deltas = [read_parquet(published, index["partitions"][partition_id]["deltas"]["key"]) for partition_id in months.values()]
+    rankings = concat(deltas)
+    growing = concat([fastest_growing(table, limit) for table in deltas])
+
+    tables["rankings"] = {
+        **write_sorted_parquet(published, RANKINGS_KEY, rankings, ["target", "rank"]),
+        "months": months,
+        "sources": sources,
+    }
+    tables["fastest_growing"] = {
+        **write_sorted_parquet(published, FASTEST_GROWING_KEY, growing, ["target", "growth_rank"]),
+        "months": months,
+        "sources": sources,
+    }
+    return True
+
+
+def run_publish(processed: ObjectStore, published: ObjectStore, limit: int = FASTEST_GROWING_LIMIT) -> List[dict]:
+    """
+    Refresh the published aggregates from processed partitions that changed since the last run
+    """
+    objects = processed_partitions(list(processed.list_objects(f"{PROCESSED_PREFIX}/")))
+    versions = {partition: obj.version for partition, obj in objects.items()}
+    index = load_index(published)
+
+    by_target: Dict[str, List[Partition]] = defaultdict(list)
+    for partition in sorted(objects):
+        by_target[partition.target].append(partition)
+
+    results = []
+    for target, partitions in sorted(by_target.items()):
+        target_results = publish_target(processed, published, index, partitions, versions)
+        if target_results:
+            # saved per target so a failed run resumes where it stopped
+            save_index(published, index)
+            logger.info("Published target", extra={"target": target, "months": len(target_results)})
+        results.extend(target_results)
+
+    latest = {target: partitions[-1] for target, partitions in by_target.items()}
+    if latest and publish_latest(published, index, latest, limit):
+        save_index(published, index)
+        logger.info("Published rankings", extra={"targets": len(latest)})
+    return results
+
+
+def lambda_handler(event=None, context=None):
+    try:
+        results = run_publish(
+            object_store(PROCESSED_BUCKET, LOCAL_ROOT, LOCAL_ENDPOINT_URL or None),
+            object_store(PUBLISHED_BUCKET, LOCAL_ROOT, LOCAL_ENDPOINT_URL or None),
+        )
+    except Exception as e:
+        logger.exception("Publish failed")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"error": str(e)})
+        }
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps({
+            "message": f"Published {len(results)} partitions",
+            "partitions": results,
+        })
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build the published population rankings and deltas from the processed zone.")
+    parser.add_argument("--local-root", default=LOCAL_ROOT, help="directory with one sub directory per bucket")
+    parser.add_argument("--endpoint-url", default=LOCAL_ENDPOINT_URL, help="local S3 endpoint such as moto_server")
+    parser.add_argument("--processed-bucket", default=PROCESSED_BUCKET or "processed")
+    parser.add_argument("--published-bucket", default=PUBLISHED_BUCKET or "published")
+    parser.add_argument("--limit", type=int, default=FASTEST_GROWING_LIMIT, help="Fastest growing cities per target")
+    args = parser.parse_args(argv)
+    if not args.local_root and not args.endpoint_url:
+        parser.error("one of --local-root or --endpoint-url is required")
+
+    print(json.dumps(run_publish(
+        object_store(args.processed_bucket, args.local_root, args.endpoint_url or None),
+        object_store(args.published_bucket, args.local_root, args.endpoint_url or None),
+        args.limit,
+    ), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    main()
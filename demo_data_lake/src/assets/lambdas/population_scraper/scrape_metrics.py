@@ -0,0 +1,101 @@
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+# EtlStack alarms on these, keep the namespace, service and metric names stable
+METRICS_NAMESPACE = "PopulationScraper"
+SERVICE_NAME = "population_scraper"
+
+PHASES = ("driver_init", "navigation", "extraction", "validation", "serialization", "upload")
+PHASE_METRICS = {
+    "driver_init": "DriverInitDuration",
+    "navigation": "NavigationDuration",
+    "extraction": "ExtractionDuration",
+    "validation": "ValidationDuration",
+    "serialization": "SerializationDuration",
+    "upload": "UploadDuration",
+}
+ROWS_METRIC = "RowsScraped"
+REJECTED_ROWS_METRIC = "RowsRejected"
+PAYLOAD_BYTES_METRIC = "PayloadBytes"
+PEAK_RSS_METRIC = "PeakRss"
+RUN_DURATION_METRIC = "RunDuration"
+TARGET_STATUS_METRICS = {
+    "succeeded": "TargetsSucceeded",
+    "failed": "TargetsFailed",
+    "timed_out": "TargetsTimedOut",
+}
+
+# every target is scraped on its own worker thread, phases are recorded against that thread's target
+_local = threading.local()
+
+
+class Scrape_timings:
+    """
+    Milliseconds spent per phase and bytes written while scraping one target
+    """
+
+    def __init__(self):
+        self.phases_ms: Dict[str, float] = {}
+        self.payload_bytes = 0
+
+    def add(self, phase: str, elapsed_ms: float) -> None:
+        self.phases_ms[phase] = self.phases_ms.get(phase, 0.0) + elapsed_ms
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "phases_ms": {phase: round(ms, 3) for phase, ms in self.phases_ms.items()},
+            "payload_bytes": self.payload_bytes,
+        }
+
+
+@contextmanager
+def recording() -> Iterator[Scrape_timings]:
+    """
+    Collect the phases timed on this thread until the block exits
+    """
+    timings = Scrape_timings()
+    previous = getattr(_local, "timings", None)
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+def current() -> Optional[Scrape_timings]:
+    return getattr(_local, "timings", None)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Time a block as one of PHASES, a no-op outside recording() so helpers can be called on their own
+    """
+    if name not in PHASE_METRICS:
+        raise ValueError(f"Unknown scrape phase: {name}")
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = current()
+        if timings is not None:
+            timings.add(name, (time.perf_counter() - started) * 1000)
+
+
+def add_payload_bytes(size: int) -> None:
+    timings = current()
+    if timings is not None:
+        timings.payload_bytes += size
+
+
+def peak_rss_bytes() -> int:
+    """
+    Peak resident set of this process, Chrome runs as a separate process and is not included
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and KB on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
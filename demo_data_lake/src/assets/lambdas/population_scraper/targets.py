@@ -0,0 +1,51 @@
+import json
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+DEFAULT_URL_TEMPLATE = "https://worldpopulationreview.com/us-cities/{name}"
+
+
+@dataclass(frozen=True)
+class Target:
+    name: str
+    url: str
+    s3_path: str
+
+
+def target_from_spec(spec: Any, s3_path: str, url_template: str = DEFAULT_URL_TEMPLATE) -> Target:
+    """
+    Build a target from a bare name like "texas" or a dict with name and optional url / s3_path
+    """
+    if isinstance(spec, str):
+        spec = {"name": spec}
+    if not isinstance(spec, dict) or not spec.get("name"):
+        raise ValueError(f"Invalid scrape target: {spec}")
+
+    name = str(spec["name"]).strip().lower()
+    return Target(
+        name=name,
+        url=spec.get("url") or url_template.format(name=name),
+        s3_path=spec.get("s3_path") or f"{s3_path.rstrip('/')}/{name}/",
+    )
+
+
+def load_targets(event: Optional[dict], configured_targets: str, s3_path: str, data_url: str = "",
+                 url_template: str = DEFAULT_URL_TEMPLATE) -> List[Target]:
+    """
+    Targets from the invocation event win over the TARGETS config, a lone DATA_URL is the legacy single target
+    """
+    specs = (event or {}).get("targets")
+    if specs is None and configured_targets:
+        specs = json.loads(configured_targets)
+
+    if specs:
+        targets = [target_from_spec(spec, s3_path, url_template) for spec in specs]
+        names = [target.name for target in targets]
+        if len(set(names)) != len(names):
+            raise ValueError("Scrape target names must be unique.")
+        return targets
+
+    if data_url:
+        return [Target(name=data_url.rstrip("/").rsplit("/", 1)[-1], url=data_url, s3_path=s3_path)]
+
+    raise ValueError("No scrape targets configured.")
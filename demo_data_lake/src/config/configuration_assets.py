@@ -6,6 +6,12 @@ class ApplicationProps:
     account: str
     region: str
     lf_admin_role_arn: str
+    population_scrape_targets: list
+    # "first,last" year Athena partition projection generates for the population tables
+    population_scrape_years: str
+    # OUTPUT_FORMAT and CHANGE_DETECTION of the scraper, the landing table is only cataloged for parquet snapshots
+    population_scrape_output_format: str
+    population_scrape_change_detection: str
 
 
     def __init__(self, path:str):
@@ -15,4 +21,8 @@ class ApplicationProps:
 
         self.account = config['account']
         self.region = config['region']
-        self.lf_admin_role_arn = config['lf_admin_role_arn']
\ No newline at end of file
+        self.lf_admin_role_arn = config['lf_admin_role_arn']
+        self.population_scrape_targets = config['population_scrape_targets']
+        self.population_scrape_years = config.get('population_scrape_years', "2020,2035")
+        self.population_scrape_output_format = config.get('population_scrape_output_format', "parquet")
+        self.population_scrape_change_detection = config.get('population_scrape_change_detection', "skip")
\ No newline at end of file
@@ -4,6 +4,7 @@ from aws_cdk import (
     aws_sqs as sqs,
     aws_s3 as s3,
     aws_iam as iam,
+    aws_glue as glue,
     aws_lakeformation as lf,
     RemovalPolicy,
     CfnOutput
@@ -11,6 +12,31 @@ from aws_cdk import (
 from constructs import Construct
 from src.config.configuration_assets import ApplicationProps
 
+# population scraper layout, create_s3_key in the population_scraper lambda
+POPULATION_SCRAPE_PREFIX = "population_scrape"
+# canonical columns of population_schema, target is left out since the partition key already carries it
+POPULATION_SCRAPE_COLUMNS = [
+    ("rank", "bigint"),
+    ("city", "string"),
+    ("population", "bigint"),
+    ("prior_population", "bigint"),
+    ("growth_pct", "double"),
+    ("density_per_sq_mi", "double"),
+    ("area_sq_mi", "double"),
+    ("population_year", "bigint"),
+    ("prior_population_year", "bigint"),
+    ("scraped_at", "timestamp"),
+]
+
+
+def landing_is_parquet(props: ApplicationProps) -> bool:
+    """
+    The scraper lands parquet snapshots, json/jsonl keep the raw headers and diffs have their own layout,
+    neither fits the parquet table, the compaction job reads them into the processed zone
+    """
+    return props.population_scrape_output_format == "parquet" and props.population_scrape_change_detection != "diff"
+
+
 class DataLakeStack(Stack):
 
     def __init__(self, scope: Construct, construct_id: str, props:ApplicationProps, **kwargs) -> None:
@@ -38,6 +64,23 @@ class DataLakeStack(Stack):
         CfnOutput(self, "ProcessedBucketName", value=processed_bucket.bucket_name, export_name="ProcessedBucketName")
         CfnOutput(self, "PublishedBucketName", value=published_bucket.bucket_name, export_name="PublishedBucketName")
 
+        # One database per zone. Partitions are projected from the key layout, so Athena prunes them
+        # without crawler runs or MSCK REPAIR
+        for zone, bucket in [("landing", landing_bucket), ("processed", processed_bucket)]:
+            database = glue.CfnDatabase(
+                self, f"{zone.capitalize()}Database",
+                catalog_id=self.account,
+                database_input=glue.CfnDatabase.DatabaseInputProperty(
+                    name=f"data_lake_{zone}",
+                    description=f"Tables over the {zone} bucket"
+                )
+            )
+            # processed is always parquet, written by the compaction job
+            if zone == "landing" and not landing_is_parquet(props):
+                continue
+            population_table = self.population_scrape_table(zone, bucket, f"data_lake_{zone}", props)
+            population_table.add_dependency(database)
+
         lf_admin_role = iam.Role(
             self, "LFAdminRole",
             assumed_by=iam.ArnPrincipal(props.lf_admin_role_arn),
@@ -62,4 +105,47 @@ class DataLakeStack(Stack):
         #         resource_type="DATA_LOCATION",
         #         resource_arn=bucket.bucket_arn,
         #         role_arn=props.lf_admin_role_arn
-        #     )
\ No newline at end of file
+        #     )
+
+    def population_scrape_table(self, zone: str, bucket: s3.IBucket, database_name: str, props: ApplicationProps) -> glue.CfnTable:
+        """
+        Parquet table over <bucket>/population_scrape/<target>/year=YYYY/month=MM/ with projected partitions
+        """
+        location = f"s3://{bucket.bucket_name}/{POPULATION_SCRAPE_PREFIX}/"
+        return glue.CfnTable(
+            self, f"{zone.capitalize()}PopulationScrapeTable",
+            catalog_id=self.account,
+            database_name=database_name,
+            table_input=glue.CfnTable.TableInputProperty(
+                name=POPULATION_SCRAPE_PREFIX,
+                description=f"Population scrapes in the {zone} zone",
+                table_type="EXTERNAL_TABLE",
+                partition_keys=[
+                    glue.CfnTable.ColumnProperty(name="target", type="string"),
+                    glue.CfnTable.ColumnProperty(name="year", type="int"),
+                    glue.CfnTable.ColumnProperty(name="month", type="int"),
+                ],
+                parameters={
+                    "classification": "parquet",
+                    "EXTERNAL": "TRUE",
+                    "projection.enabled": "true",
+                    "projection.target.type": "enum",
+                    "projection.target.values": ",".join(props.population_scrape_targets),
+                    "projection.year.type": "integer",
+                    "projection.year.range": props.population_scrape_years,
+                    "projection.month.type": "integer",
+                    "projection.month.range": "1,12",
+                    "projection.month.digits": "2",
+                    "storage.location.template": location + "${target}/year=${year}/month=${month}/",
+                },
+                storage_descriptor=glue.CfnTable.StorageDescriptorProperty(
+                    location=location,
+                    columns=[glue.CfnTable.ColumnProperty(name=name, type=type_name) for name, type_name in POPULATION_SCRAPE_COLUMNS],
+                    input_format="org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat",
+                    output_format="org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat",
+                    serde_info=glue.CfnTable.SerdeInfoProperty(
+                        serialization_library="org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe"
+                    )
+                )
+            )
+        )
@@ -6,20 +6,32 @@ from aws_cdk import (
     aws_lambda as _lambda,
     aws_events as events,
     aws_events_targets as targets,
+    aws_cloudwatch as cloudwatch,
     Fn
 )
 from constructs import Construct
+from src.config.configuration_assets import ApplicationProps
+import json
 import os
 
+# must match METRICS_NAMESPACE and SERVICE_NAME in the scraper's scrape_metrics.py
+SCRAPER_METRICS_NAMESPACE = "PopulationScraper"
+SCRAPER_SERVICE_NAME = "population_scraper"
 
 class EtlStack(Stack):
 
-    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
+    def __init__(self, scope: Construct, construct_id: str, props:ApplicationProps, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
         landing_bucket_name = Fn.import_value("LandingBucketName")
         landing_bucket = s3.Bucket.from_bucket_name(self, "LandingBucketRef", landing_bucket_name)
 
+        processed_bucket_name = Fn.import_value("ProcessedBucketName")
+        processed_bucket = s3.Bucket.from_bucket_name(self, "ProcessedBucketRef", processed_bucket_name)
+
+        published_bucket_name = Fn.import_value("PublishedBucketName")
+        published_bucket = s3.Bucket.from_bucket_name(self, "PublishedBucketRef", published_bucket_name)
+
 
         # Population Scraper Dockerfile directory
         docker_image_path = os.path.join(os.getcwd(), "src/assets/lambdas/population_scraper")
@@ -32,17 +44,27 @@ class EtlStack(Stack):
                 directory=docker_image_path
             ),
             memory_size=3008,
-            timeout=Duration.seconds(300),
+            timeout=Duration.seconds(600),
             environment = {
                 "S3_BUCKET": landing_bucket_name,
-                "S3_PATH": "population_scrape/california/",
+                "S3_PATH": "population_scrape/",
                 "CHROME_BINARY": "/opt/chrome/chrome",
                 "CHROME_DRIVER": "/opt/chromedriver",
-                "DATA_URL": "https://worldpopulationreview.com/us-cities/california"
+                "EXTRACTION_BACKEND": "auto",
+                "SELENIUM_EXTRACTION_MODE": "script",
+                "MAX_DRIVER_USES": "20",
+                "DRIVER_POOL_SIZE": "1",
+                "MAX_WORKERS": "8",
+                "OUTPUT_FORMAT": props.population_scrape_output_format,
+                "COMPRESSION": "gzip",
+                "CHANGE_DETECTION": props.population_scrape_change_detection,
+                "TARGETS": json.dumps(props.population_scrape_targets),
+                "TARGET_URL_TEMPLATE": "https://worldpopulationreview.com/us-cities/{name}"
             }
         )
 
-        landing_bucket.grant_put(population_scraper_lambda)
+        # read access for the change detection state kept next to the scrapes
+        landing_bucket.grant_read_write(population_scraper_lambda)
 
         rule = events.Rule(
             self, "PopulationScraperMidnightPSTRule",
@@ -54,4 +76,125 @@ class EtlStack(Stack):
 
         rule.add_target(targets.LambdaFunction(population_scraper_lambda))
 
+        def scraper_metric(metric_name: str, statistic: str) -> cloudwatch.Metric:
+            # the scraper runs once a day, so alarms look at the whole day
+            return cloudwatch.Metric(
+                namespace=SCRAPER_METRICS_NAMESPACE,
+                metric_name=metric_name,
+                dimensions_map={"service": SCRAPER_SERVICE_NAME},
+                statistic=statistic,
+                period=Duration.days(1)
+            )
+
+        cloudwatch.Alarm(
+            self, "PopulationScraperFailedTargetsAlarm",
+            alarm_description="Population scrape targets failed or timed out",
+            metric=cloudwatch.MathExpression(
+                expression="failed + timed_out",
+                using_metrics={
+                    "failed": scraper_metric("TargetsFailed", "Sum"),
+                    "timed_out": scraper_metric("TargetsTimedOut", "Sum"),
+                },
+                period=Duration.days(1)
+            ),
+            threshold=1,
+            evaluation_periods=1,
+            comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD,
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+        )
+
+        # no rows for a day means the scraper did not run or every target came back empty
+        cloudwatch.Alarm(
+            self, "PopulationScraperNoRowsAlarm",
+            alarm_description="Population scraper wrote no rows today",
+            metric=scraper_metric("RowsScraped", "Sum"),
+            threshold=1,
+            evaluation_periods=1,
+            comparison_operator=cloudwatch.ComparisonOperator.LESS_THAN_THRESHOLD,
+            treat_missing_data=cloudwatch.TreatMissingData.BREACHING
+        )
+
+        cloudwatch.Alarm(
+            self, "PopulationScraperRunDurationAlarm",
+            alarm_description="Population scrape used over 80% of the lambda timeout",
+            metric=scraper_metric("RunDuration", "Maximum"),
+            threshold=population_scraper_lambda.timeout.to_milliseconds() * 0.8,
+            evaluation_periods=1,
+            comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+        )
+
+        # slow page loads point at the site rather than Chrome or S3
+        cloudwatch.Alarm(
+            self, "PopulationScraperNavigationLatencyAlarm",
+            alarm_description="p95 page navigation time of the population scrape is over 20 seconds",
+            metric=scraper_metric("NavigationDuration", "p95"),
+            threshold=20000,
+            evaluation_periods=1,
+            comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+        )
+
+        # Compaction runs from the same image as the scraper with a different handler
+        population_compaction_lambda = _lambda.DockerImageFunction(
+            self,
+            "PopulationCompactionLambda",
+            code=_lambda.DockerImageCode.from_image_asset(
+                directory=docker_image_path,
+                cmd=["compaction.lambda_handler"]
+            ),
+            memory_size=1024,
+            timeout=Duration.seconds(300),
+            environment = {
+                "LANDING_BUCKET": landing_bucket_name,
+                "PROCESSED_BUCKET": processed_bucket_name,
+                "PUBLISHED_BUCKET": published_bucket_name,
+                "LANDING_PREFIX": "population_scrape/"
+            }
+        )
+
+        landing_bucket.grant_read(population_compaction_lambda)
+        processed_bucket.grant_read_write(population_compaction_lambda)
+        published_bucket.grant_read_write(population_compaction_lambda)
+
+        # an hour after the scrape so the day's landing objects are in place
+        compaction_rule = events.Rule(
+            self, "PopulationCompactionRule",
+            schedule=events.Schedule.cron(
+                minute="0",
+                hour="9",
+            )
+        )
+
+        compaction_rule.add_target(targets.LambdaFunction(population_compaction_lambda))
+
+        # Rankings and month over month deltas for dashboards, built from processed partitions the compaction changed
+        population_publish_lambda = _lambda.DockerImageFunction(
+            self,
+            "PopulationPublishLambda",
+            code=_lambda.DockerImageCode.from_image_asset(
+                directory=docker_image_path,
+                cmd=["published_layer.lambda_handler"]
+            ),
+            memory_size=1024,
+            timeout=Duration.seconds(300),
+            environment = {
+                "PROCESSED_BUCKET": processed_bucket_name,
+                "PUBLISHED_BUCKET": published_bucket_name,
+                "FASTEST_GROWING_LIMIT": "10"
+            }
+        )
+
+        processed_bucket.grant_read(population_publish_lambda)
+        published_bucket.grant_read_write(population_publish_lambda)
+
+        # after the compaction has refreshed the processed zone
+        publish_rule = events.Rule(
+            self, "PopulationPublishRule",
+            schedule=events.Schedule.cron(
+                minute="30",
+                hour="9",
+            )
+        )
 
+        publish_rule.add_target(targets.LambdaFunction(population_publish_lambda))
@@ -0,0 +1,78 @@
+import functools
+import http.server
+import importlib.util
+import os
+import sys
+import threading
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(TESTS_DIR, "fixtures")
+SCRAPER_DIR = os.path.join(os.path.dirname(TESTS_DIR), "src", "assets", "lambdas", "population_scraper")
+
+# the scraper modules are copied flat into the lambda image, mirror that here
+if SCRAPER_DIR not in sys.path:
+    sys.path.insert(0, SCRAPER_DIR)
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import http_extractor  # noqa: E402
+from object_store import LocalObjectStore  # noqa: E402
+from targets import Target  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def scraper_lambda():
+    # lambda.py can't be imported by name since lambda is a keyword
+    spec = importlib.util.spec_from_file_location("population_scraper_lambda", os.path.join(SCRAPER_DIR, "lambda.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def california_html():
+    with open(os.path.join(FIXTURES_DIR, "wpr_california.html"), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture
+def stores(tmp_path):
+    return {name: LocalObjectStore(str(tmp_path / name)) for name in ("landing", "processed", "published")}
+
+
+@pytest.fixture
+def landing(stores, scraper_lambda, monkeypatch):
+    """
+    Landing store the scraper uploads parquet snapshots and manifests to
+    """
+    monkeypatch.setattr(scraper_lambda, "landing_store", stores["landing"])
+    monkeypatch.setattr(scraper_lambda, "S3_PATH", "population_scrape/")
+    monkeypatch.setattr(scraper_lambda, "OUTPUT_FORMAT", "parquet")
+    return stores["landing"]
+
+
+@pytest.fixture
+def scrape(scraper_lambda, monkeypatch, california_html):
+    """
+    Scrape a target without fetching anything, the page holds the first 10 California rows unless a table is given
+    """
+    page = http_extractor.parse_table_html(california_html, max_iter=10)
+
+    def scrape(name, scrape_time, mode="off", table=None):
+        monkeypatch.setattr(scraper_lambda, "extract_table", lambda url, max_iter: table or page)
+        target = Target(name, f"http://example.com/{name}", f"population_scrape/{name}/")
+        return scraper_lambda.scrape_and_upload(target, scrape_time, mode)
+    return scrape
+
+
+@pytest.fixture
+def fixture_server():
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=FIXTURES_DIR)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
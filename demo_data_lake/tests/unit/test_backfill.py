@@ -0,0 +1,126 @@
+import http.server
+import os
+import shutil
+import threading
+from datetime import date, datetime, timezone
+
+import backfill
+import partition_manifest
+from landing_reader import parse_landing_key
+from object_store import LocalObjectStore
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+
+
+def config(tmp_path, **overrides):
+    return {
+        "bucket": "landing",
+        "local_root": str(tmp_path / "lake"),
+        "s3_path": "population_scrape/",
+        "output_format": "parquet",
+        "compression": "none",
+        **overrides,
+    }
+
+
+def landing_keys(tmp_path):
+    store = LocalObjectStore(str(tmp_path / "lake" / "landing"))
+    return sorted(obj.key for obj in store.list_objects("population_scrape/") if parse_landing_key(obj.key))
+
+
+def test_scrape_times():
+    assert backfill.scrape_times(date(2024, 11, 15), date(2025, 2, 1)) == [
+        datetime(2024, 11, 15, tzinfo=timezone.utc),
+        datetime(2024, 12, 1, tzinfo=timezone.utc),
+        datetime(2025, 1, 1, tzinfo=timezone.utc),
+        datetime(2025, 2, 1, tzinfo=timezone.utc),
+    ]
+    assert len(backfill.scrape_times(date(2025, 1, 1), date(2025, 1, 31), "week")) == 5
+
+
+def test_snapshots_replayed_in_parallel(tmp_path):
+    snapshots = tmp_path / "snapshots"
+    for target, stamp in [("california", "2024-12-31_23-00-00"), ("california", "2025-01-15"), ("texas", "20250102080000")]:
+        os.makedirs(snapshots / target, exist_ok=True)
+        shutil.copy(os.path.join(FIXTURES_DIR, "wpr_california.html"), snapshots / target / f"{stamp}.html")
+
+    jobs = backfill.snapshot_jobs(str(snapshots))
+    results = backfill.run_backfill(jobs, config(tmp_path), workers=2)
+
+    assert [res["status"] for res in results] == ["uploaded"] * 3
+    assert landing_keys(tmp_path) == [
+        "population_scrape/california/year=2024/month=12/2024-12-31_23-00-00_population_ranks.parquet",
+        "population_scrape/california/year=2025/month=01/2025-01-15_00-00-00_population_ranks.parquet",
+        "population_scrape/texas/year=2025/month=01/2025-01-02_08-00-00_population_ranks.parquet",
+    ]
+    store = LocalObjectStore(str(tmp_path / "lake" / "landing"))
+    assert len(partition_manifest.resolve_range(store, "population_scrape/", date(2025, 1, 1), date(2025, 1, 31))) == 2
+
+    rerun = backfill.summarize(backfill.run_backfill(jobs, config(tmp_path), workers=2))
+    assert (rerun["uploaded"], rerun["skipped"]) == (0, 3)
+
+    forced = backfill.summarize(backfill.run_backfill(jobs, config(tmp_path), workers=1, force=True))
+    assert forced["uploaded"] == 3
+    assert len(landing_keys(tmp_path)) == 3
+    assert len(partition_manifest.load_manifest(store, "population_scrape/california/", 2025, 1)) == 1
+
+
+def test_archive_date_range(tmp_path, fixture_server):
+    targets = [backfill.target_from_spec("california", "population_scrape/")]
+    jobs = backfill.archive_jobs(targets, date(2025, 6, 1), date(2025, 8, 1), "month",
+                                 fixture_server + "/wpr_{name}.html?at={timestamp}")
+    missing = backfill.archive_jobs([backfill.target_from_spec("nevada", "population_scrape/")], date(2025, 6, 1),
+                                    date(2025, 6, 1), "month", fixture_server + "/wpr_{name}.html?at={timestamp}")
+
+    summary = backfill.summarize(backfill.run_backfill(jobs + missing, config(tmp_path, compression="gzip", output_format="jsonl")))
+
+    assert (summary["uploaded"], summary["failed"]) == (3, 1)
+    assert summary["failures"][0]["target"] == "nevada"
+    # the middle of each month is requested so the closest capture most likely falls inside it
+    assert jobs[0].source.endswith("?at=20250616000000")
+    assert [key.rsplit("/", 1)[1] for key in landing_keys(tmp_path)] == [
+        "2025-06-01_00-00-00_population_ranks.jsonl.gz",
+        "2025-07-01_00-00-00_population_ranks.jsonl.gz",
+        "2025-08-01_00-00-00_population_ranks.jsonl.gz",
+    ]
+
+
+def test_archive_capture_time(tmp_path):
+    with open(os.path.join(FIXTURES_DIR, "wpr_california.html"), "rb") as f:
+        page = f.read()
+
+    class ArchiveHandler(http.server.BaseHTTPRequestHandler):
+        # like the archive, every timestamp redirects to the one capture closest to it
+        def do_GET(self):
+            if self.path.startswith("/web/20250703120000id_/"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.end_headers()
+                self.wfile.write(page)
+            else:
+                self.send_response(302)
+                self.send_header("Location", "/web/20250703120000id_/" + self.path.rsplit("/", 1)[1])
+                self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ArchiveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        targets = [backfill.target_from_spec("california", "population_scrape/")]
+        jobs = backfill.archive_jobs(targets, date(2025, 6, 1), date(2025, 8, 1), "month",
+                                     f"http://127.0.0.1:{server.server_port}/web/{{timestamp}}id_/{{name}}")
+
+        results = backfill.run_backfill(jobs, config(tmp_path))
+        rerun = backfill.summarize(backfill.run_backfill(jobs, config(tmp_path)))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [res["status"] for res in results] == ["skipped", "uploaded", "skipped"]
+    assert results[1]["scrape_time"] == "2025-07-03T12:00:00+00:00"
+    assert landing_keys(tmp_path) == [
+        "population_scrape/california/year=2025/month=07/2025-07-03_12-00-00_population_ranks.parquet",
+    ]
+    assert (rerun["uploaded"], rerun["skipped"]) == (0, 3)
@@ -0,0 +1,107 @@
+import io
+from datetime import datetime, timezone
+
+import pyarrow.parquet as pq
+import pytest
+
+import change_detection
+import compaction
+import http_extractor
+from landing_reader import parse_landing_key
+
+
+def landing_objects(store):
+    # partition manifests live next to the scrapes
+    return [obj for obj in store.list_objects("population_scrape/") if parse_landing_key(obj.key)]
+
+
+@pytest.fixture
+def table(california_html):
+    return http_extractor.parse_table_html(california_html, max_iter=10)
+
+
+def august(day):
+    return datetime(2025, 8, day, 8, tzinfo=timezone.utc)
+
+
+def test_content_hash_ignores_whitespace(table):
+    headers, rows = table
+    spaced = [[f" {cell}  " for cell in row] for row in rows]
+
+    assert change_detection.content_hash(change_detection.normalized_records(headers, rows)) == \
+        change_detection.content_hash(change_detection.normalized_records(headers, spaced))
+
+
+def test_row_diff(table):
+    headers, rows = table
+    base = change_detection.normalized_records(headers, rows[:3])
+    new = change_detection.normalized_records(headers, [rows[0], [*rows[1][:2], "1,500,000", *rows[1][3:]], rows[3]])
+
+    diff = change_detection.row_diff(base, new, "Name")
+
+    assert [r["Name"] for r in diff["added"]] == ["San Francisco"]
+    assert [r["Name"] for r in diff["changed"]] == ["San Diego"]
+    assert diff["removed"] == ["San Jose"]
+
+
+def test_unchanged_scrape_skipped(landing, scrape, table):
+    headers, rows = table
+
+    first = scrape("california", august(1), "skip", (headers, rows))
+    second = scrape("california", august(2), "skip", (headers, rows))
+
+    assert first["action"] == "uploaded"
+    assert second == {**first, "action": "skipped"}
+    assert len(landing_objects(landing)) == 1
+
+
+@pytest.mark.parametrize("mode", ["skip", "diff"])
+def test_unchanged_scrape_kept_in_new_month(landing, scrape, table, mode):
+    headers, rows = table
+
+    first = scrape("california", august(1), mode, (headers, rows))
+    res = scrape("california", datetime(2025, 9, 1, 8, tzinfo=timezone.utc), mode)
+    again = scrape("california", datetime(2025, 9, 2, 8, tzinfo=timezone.utc), mode)
+
+    assert res["action"] == "uploaded"
+    assert "/year=2025/month=09/" in res["s3_key"]
+    assert again == {**res, "action": "skipped"}
+    assert [parse_landing_key(obj.key)["month"] for obj in landing_objects(landing)] == ["08", "09"]
+    assert change_detection.load_state(landing, "california")["base_key"] == res["s3_key"] != first["s3_key"]
+
+
+def test_mode_off_always_uploads(landing, scrape, table):
+    headers, rows = table
+    scrape("california", august(1), "off", (headers, rows))
+    scrape("california", august(2), "off", (headers, rows))
+
+    assert len(landing_objects(landing)) == 2
+
+
+@pytest.mark.parametrize("compression_name,file_type", [("none", "json"), ("zstd", "json.zst")])
+def test_diff_rebuilt_by_compaction(stores, landing, scrape, table, scraper_lambda, monkeypatch, compression_name, file_type):
+    monkeypatch.setattr(scraper_lambda, "COMPRESSION", compression_name)
+    headers, rows = table
+    changed = [row[:] for row in rows]
+    changed[0][2] = "3,900,000"
+
+    scrape("california", august(1), "diff", (headers, rows))
+    res = scrape("california", august(2), "diff", (headers, changed))
+    assert res["action"] == "diff"
+    assert res["s3_key"].endswith(f"_population_ranks_diff.{file_type}")
+
+    compaction.run_compaction(landing, stores["processed"], stores["published"], "population_scrape/")
+
+    latest = pq.read_table(io.BytesIO(stores["published"].get("population_city_latest/california/year=2025/month=08/part-00000.parquet")))
+    assert latest.num_rows == len(rows)
+    assert latest.column("population")[0].as_py() == 3900000
+    assert {ts.day for ts in latest.column("scraped_at").to_pylist()} == {2}
+
+
+def test_large_change_writes_full_snapshot(landing, scrape, table):
+    headers, rows = table
+    scrape("california", august(1), "diff", (headers, rows[:5]))
+    res = scrape("california", august(2), "diff", (headers, rows[5:]))
+
+    assert res["action"] == "uploaded"
+    assert change_detection.load_state(landing, "california")["base_key"] == res["s3_key"]
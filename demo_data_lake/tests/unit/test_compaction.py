@@ -0,0 +1,126 @@
+import io
+from datetime import datetime, timezone
+
+import pyarrow.parquet as pq
+import pytest
+
+import compaction
+import http_extractor
+import partition_manifest
+from output_formats import serialize_rows
+
+
+@pytest.fixture
+def land(stores, scraper_lambda, california_html):
+    headers, rows = http_extractor.parse_table_html(california_html, max_iter=100)
+
+    def land(target, scrape_time, output_format="parquet", row_count=5, rows_override=None, indexed=False):
+        s3_path = f"population_scrape/{target}/"
+        output = serialize_rows(headers, rows_override or rows[:row_count], scrape_time, output_format)
+        key = scraper_lambda.create_s3_key(s3_path, scrape_time, "population_ranks", output.file_type)
+        stores["landing"].put(key, output.body, output.content_type)
+        if indexed:
+            entry = partition_manifest.ManifestEntry(key, row_count, len(output.body), f"hash-{key}", scrape_time.isoformat())
+            partition_manifest.record_object(stores["landing"], "population_scrape/", target, s3_path, entry)
+        return key
+
+    return land
+
+
+def run(stores):
+    return compaction.run_compaction(stores["landing"], stores["processed"], stores["published"], "population_scrape/")
+
+
+def read(store, key):
+    return pq.read_table(io.BytesIO(store.get(key)))
+
+
+def test_compacts_partition_from_mixed_formats(stores, land):
+    land("california", datetime(2025, 8, 1, 8, tzinfo=timezone.utc), "json")
+    land("california", datetime(2025, 8, 2, 8, tzinfo=timezone.utc), "parquet")
+
+    results = run(stores)
+
+    assert results == [{"partition": "california/year=2025/month=08", "landing_objects": 2, "rows": 10}]
+    processed = read(stores["processed"], "population_scrape/california/year=2025/month=08/part-00000.parquet")
+    assert processed.num_rows == 10
+    assert set(processed.column("target").to_pylist()) == {"california"}
+    assert processed.column("population")[0].as_py() == 3820914
+
+
+def test_published_keeps_latest_row_per_city(stores, land, california_html):
+    headers, rows = http_extractor.parse_table_html(california_html, max_iter=3)
+    newer = [row[:] for row in rows]
+    newer[0][2] = "3,900,000"
+
+    land("california", datetime(2025, 8, 1, 8, tzinfo=timezone.utc), rows_override=rows)
+    land("california", datetime(2025, 8, 2, 8, tzinfo=timezone.utc), rows_override=newer)
+    run(stores)
+
+    published = read(stores["published"], "population_city_latest/california/year=2025/month=08/part-00000.parquet")
+    assert published.column("city").to_pylist() == ["Los Angeles", "San Diego", "San Jose"]
+    assert published.column("population")[0].as_py() == 3900000
+
+
+def test_only_changed_partitions_reprocessed(stores, land):
+    land("california", datetime(2025, 7, 31, 8, tzinfo=timezone.utc))
+    land("texas", datetime(2025, 8, 1, 8, tzinfo=timezone.utc))
+    assert len(run(stores)) == 2
+
+    assert run(stores) == []
+
+    land("texas", datetime(2025, 8, 2, 8, tzinfo=timezone.utc))
+    assert [res["partition"] for res in run(stores)] == ["texas/year=2025/month=08"]
+
+
+def test_ignores_non_landing_keys(stores, land):
+    land("california", datetime(2025, 8, 1, 8, tzinfo=timezone.utc))
+    stores["landing"].put("population_scrape/california/year=2025/month=08/_manifest.json", b"{}")
+
+    assert [res["landing_objects"] for res in run(stores)] == [1]
+
+
+def test_changes_found_from_manifest_index(stores, land, monkeypatch):
+    land("california", datetime(2025, 8, 1, 8, tzinfo=timezone.utc), indexed=True)
+    land("texas", datetime(2025, 8, 1, 8, tzinfo=timezone.utc), indexed=True)
+    # not in any manifest, so not compacted while the prefix has an index
+    land("nevada", datetime(2025, 8, 1, 8, tzinfo=timezone.utc))
+
+    def no_listing(prefix=""):
+        raise AssertionError("landing prefix listed")
+
+    monkeypatch.setattr(stores["landing"], "list_objects", no_listing)
+
+    assert [res["partition"] for res in run(stores)] == ["california/year=2025/month=08", "texas/year=2025/month=08"]
+    assert run(stores) == []
+
+    land("texas", datetime(2025, 8, 2, 8, tzinfo=timezone.utc), indexed=True)
+    assert run(stores) == [{"partition": "texas/year=2025/month=08", "landing_objects": 2, "rows": 10}]
+
+
+def test_drop_duplicates_keeps_first_row():
+    import pyarrow as pa
+
+    table = pa.table({
+        "city": ["A", "B", "A", None, "C", None, "B"],
+        "scraped_at": [1, 1, 1, 1, 2, 1, 2],
+        "rank": [1, 2, 3, 4, 5, 6, 7],
+    })
+
+    assert compaction.drop_duplicates(table, ["city", "scraped_at"]).column("rank").to_pylist() == [1, 2, 4, 5, 7]
+    assert compaction.drop_duplicates(table, ["city"]).column("rank").to_pylist() == [1, 2, 4, 5]
+    assert compaction.drop_duplicates(table.slice(0, 0), ["city"]).num_rows == 0
+
+
+def test_handler_logs_failures(monkeypatch, caplog):
+    def failing_compaction(*args, **kwargs):
+        raise RuntimeError("landing bucket missing")
+
+    monkeypatch.setattr(compaction, "run_compaction", failing_compaction)
+
+    res = compaction.lambda_handler({}, None)
+
+    assert res["statusCode"] == 500
+    [record] = [record for record in caplog.records if record.levelname == "ERROR"]
+    assert record.getMessage() == "Compaction failed"
+    assert str(record.exc_info[1]) == "landing bucket missing"
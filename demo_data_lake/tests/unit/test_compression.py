@@ -0,0 +1,72 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import compression
+import http_extractor
+import output_formats
+from object_store import LocalObjectStore, S3ObjectWriter
+
+SCRAPE_TIME = datetime(2025, 8, 20, 14, 35, 22, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("compression_name", ["gzip", "zstd"])
+def test_chunked_round_trip(compression_name):
+    chunks = [b'{"rank": "1"}\n' * 50, b"", b'{"rank": "2"}\n' * 50]
+    compressor = compression.ChunkCompressor(compression_name)
+    body = b"".join(compressor.compress(chunk) for chunk in chunks) + compressor.flush()
+
+    assert len(body) < len(b"".join(chunks))
+    assert compression.decompress(body, compression_name) == b"".join(chunks)
+
+
+def test_file_types():
+    assert compression.compressed_file_type("jsonl", "gzip") == "jsonl.gz"
+    assert compression.compressed_file_type("json", "zstd") == "json.zst"
+    # columnar formats already compress their pages
+    assert compression.compressed_file_type("parquet", "gzip") == "parquet"
+    assert compression.split_file_type("jsonl.gz") == ("jsonl", "gzip")
+    assert compression.split_file_type("parquet") == ("parquet", "none")
+    with pytest.raises(ValueError):
+        compression.compressed_file_type("json", "brotli")
+
+
+def test_s3_writer_sets_content_encoding():
+    calls = []
+
+    class Client:
+        def put_object(self, **kwargs):
+            calls.append(kwargs)
+
+    with S3ObjectWriter(Client(), "bucket", "key.jsonl.gz", "application/x-ndjson", content_encoding="gzip") as writer:
+        writer.write(compression.compress(b"{}\n", "gzip"))
+
+    assert calls[0]["ContentType"] == "application/x-ndjson"
+    assert calls[0]["ContentEncoding"] == "gzip"
+
+
+@pytest.mark.parametrize("output_format,compression_name,extension", [
+    ("jsonl", "gzip", "jsonl.gz"),
+    ("jsonl", "zstd", "jsonl.zst"),
+    ("json", "gzip", "json.gz"),
+    ("parquet", "zstd", "parquet"),
+])
+def test_compressed_snapshot_read_back(california_html, scraper_lambda, monkeypatch, tmp_path,
+                                       output_format, compression_name, extension):
+    from landing_reader import read_landing_body, read_landing_table
+    from targets import Target
+
+    headers, rows = http_extractor.parse_table_html(california_html, max_iter=100)
+    store = LocalObjectStore(str(tmp_path))
+    monkeypatch.setattr(scraper_lambda, "landing_store", store)
+    monkeypatch.setattr(scraper_lambda, "OUTPUT_FORMAT", output_format)
+    monkeypatch.setattr(scraper_lambda, "COMPRESSION", compression_name)
+    monkeypatch.setattr(output_formats, "JSONL_CHUNK_ROWS", 7)
+
+    key, _ = scraper_lambda.upload_snapshot(Target("california", "", "population_scrape/california/"), SCRAPE_TIME, headers, rows)
+    table = read_landing_table(store, key)
+
+    assert key.endswith(f"_population_ranks.{extension}")
+    assert read_landing_body(store, key)[0] == output_format
+    assert table.num_rows == len(rows)
+    assert table.column("population").to_pylist()[0] == 3820914
@@ -0,0 +1,92 @@
+from datetime import datetime, timezone
+
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+import pytest
+
+import http_extractor
+from output_formats import arrow_table
+from src.config.configuration_assets import ApplicationProps
+from src.stacks.data_lake_stack import POPULATION_SCRAPE_COLUMNS, DataLakeStack
+
+
+def synth_data_lake_stack(**overrides):
+    app = core.App()
+    props = ApplicationProps("configs/dev_config.yaml")
+    for name, value in overrides.items():
+        setattr(props, name, value)
+    stack = DataLakeStack(app, "data-lake-stack", props=props)
+    return props, assertions.Template.from_stack(stack)
+
+
+def test_database_per_zone():
+    _, template = synth_data_lake_stack()
+
+    template.resource_count_is("AWS::Glue::Database", 2)
+    for zone in ("landing", "processed"):
+        template.has_resource_properties("AWS::Glue::Database", {
+            "DatabaseInput": assertions.Match.object_like({"Name": f"data_lake_{zone}"})
+        })
+
+
+def test_population_scrape_tables_project_partitions():
+    props, template = synth_data_lake_stack()
+
+    template.resource_count_is("AWS::Glue::Table", 2)
+    for zone in ("landing", "processed"):
+        template.has_resource_properties("AWS::Glue::Table", {
+            "DatabaseName": f"data_lake_{zone}",
+            "TableInput": assertions.Match.object_like({
+                "Name": "population_scrape",
+                "PartitionKeys": [
+                    {"Name": "target", "Type": "string"},
+                    {"Name": "year", "Type": "int"},
+                    {"Name": "month", "Type": "int"},
+                ],
+                "Parameters": assertions.Match.object_like({
+                    "projection.enabled": "true",
+                    "projection.target.values": ",".join(props.population_scrape_targets),
+                    "projection.year.range": props.population_scrape_years,
+                    "projection.month.range": "1,12",
+                    "projection.month.digits": "2",
+                }),
+            })
+        })
+
+
+@pytest.mark.parametrize("overrides", [
+    {"population_scrape_output_format": "jsonl"},
+    {"population_scrape_change_detection": "diff"},
+])
+def test_no_landing_table_for_non_parquet_landing(overrides):
+    _, template = synth_data_lake_stack(**overrides)
+
+    template.resource_count_is("AWS::Glue::Table", 1)
+    template.has_resource_properties("AWS::Glue::Table", {"DatabaseName": "data_lake_processed"})
+
+
+def test_projection_template_matches_s3_key_layout():
+    _, template = synth_data_lake_stack()
+
+    tables = template.find_resources("AWS::Glue::Table")
+    bucket_ids = {
+        table["Properties"]["DatabaseName"]: table["Properties"]["TableInput"]["Parameters"]["storage.location.template"]["Fn::Join"][1][1]["Ref"]
+        for table in tables.values()
+    }
+    assert bucket_ids["data_lake_landing"].startswith("LandingBucket")
+    assert bucket_ids["data_lake_processed"].startswith("ProcessedBucket")
+
+    for table in tables.values():
+        location = table["Properties"]["TableInput"]["Parameters"]["storage.location.template"]["Fn::Join"][1]
+        # same as create_s3_key: <prefix>/<target>/year=2025/month=08/
+        assert location[2] == "/population_scrape/${target}/year=${year}/month=${month}/"
+        columns = [column["Name"] for column in table["Properties"]["TableInput"]["StorageDescriptor"]["Columns"]]
+        assert "target" not in columns
+        assert {"rank", "city", "population", "scraped_at"} <= set(columns)
+
+
+def test_columns_match_scraper_output(california_html):
+    headers, rows = http_extractor.parse_table_html(california_html, max_iter=5)
+    table = arrow_table(headers, rows, datetime(2025, 8, 1, tzinfo=timezone.utc))
+
+    assert table.column_names == [name for name, _ in POPULATION_SCRAPE_COLUMNS]
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from driver_pool import ChromeDriverPool
+
+
+class FakeDriver:
+    def __init__(self, temp_root):
+        self.temp_root = temp_root
+        self.healthy = True
+        self.quit_called = False
+
+    def execute_script(self, script):
+        if not self.healthy:
+            raise WebDriverException("chrome not reachable")
+        return 1
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture
+def created():
+    return []
+
+
+@pytest.fixture
+def pool(created):
+    def factory(temp_root):
+        driver = FakeDriver(temp_root)
+        created.append(driver)
+        return driver
+
+    pool = ChromeDriverPool(factory, max_uses=3)
+    yield pool
+    pool.close()
+
+
+def test_driver_reused_between_calls(pool, created):
+    with pool.driver() as first:
+        pass
+    with pool.driver() as second:
+        pass
+
+    assert first is second
+    assert len(created) == 1
+
+
+def test_driver_recycled_after_max_uses(pool, created):
+    for _ in range(4):
+        with pool.driver():
+            pass
+
+    assert len(created) == 2
+    assert created[0].quit_called
+    assert not os.path.exists(created[0].temp_root)
+
+
+def test_unhealthy_driver_replaced(pool, created):
+    with pool.driver() as first:
+        pass
+    first.healthy = False
+
+    with pool.driver() as second:
+        pass
+
+    assert second is not first
+    assert first.quit_called
+    assert not os.path.exists(first.temp_root)
+
+
+def test_crashed_driver_discarded(pool, created):
+    with pytest.raises(WebDriverException):
+        with pool.driver():
+            raise WebDriverException("tab crashed")
+
+    assert created[0].quit_called
+    assert not os.path.exists(created[0].temp_root)
+
+    with pool.driver() as driver:
+        assert driver is not created[0]
+
+
+def test_close_removes_temp_dirs(pool, created):
+    with pool.driver():
+        pass
+    assert os.path.isdir(created[0].temp_root)
+
+    pool.close()
+    assert created[0].quit_called
+    assert not os.path.exists(created[0].temp_root)
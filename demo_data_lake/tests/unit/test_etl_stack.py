@@ -0,0 +1,69 @@
+import json
+
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+
+from src.config.configuration_assets import ApplicationProps
+from src.stacks.etl_stack import EtlStack
+
+
+def synth_etl_stack():
+    app = core.App()
+    props = ApplicationProps("configs/dev_config.yaml")
+    stack = EtlStack(app, "etl-stack", props=props)
+    return props, assertions.Template.from_stack(stack)
+
+
+def test_scraper_targets_from_config():
+    props, template = synth_etl_stack()
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {
+            "Variables": assertions.Match.object_like({
+                "S3_PATH": "population_scrape/",
+                "TARGETS": json.dumps(props.population_scrape_targets),
+                "OUTPUT_FORMAT": props.population_scrape_output_format,
+                "CHANGE_DETECTION": props.population_scrape_change_detection,
+            })
+        }
+    })
+
+
+def test_compaction_function_reuses_scraper_image():
+    _, template = synth_etl_stack()
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "ImageConfig": {"Command": ["compaction.lambda_handler"]},
+        "Environment": {
+            "Variables": assertions.Match.object_like({"LANDING_PREFIX": "population_scrape/"})
+        }
+    })
+    template.resource_count_is("AWS::Events::Rule", 3)
+
+
+def test_publish_function_reads_processed_zone():
+    _, template = synth_etl_stack()
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "ImageConfig": {"Command": ["published_layer.lambda_handler"]},
+        "Environment": {
+            "Variables": assertions.Match.object_like({"FASTEST_GROWING_LIMIT": "10"})
+        }
+    })
+    template.has_resource_properties("AWS::Events::Rule", {"ScheduleExpression": "cron(30 9 * * ? *)"})
+
+
+def test_scraper_alarms_on_emf_metrics():
+    _, template = synth_etl_stack()
+
+    template.resource_count_is("AWS::CloudWatch::Alarm", 4)
+    template.has_resource_properties("AWS::CloudWatch::Alarm", {
+        "MetricName": "RowsScraped",
+        "Namespace": "PopulationScraper",
+        "Dimensions": [{"Name": "service", "Value": "population_scraper"}],
+        "TreatMissingData": "breaching",
+    })
+    template.has_resource_properties("AWS::CloudWatch::Alarm", {
+        "MetricName": "RunDuration",
+        "Threshold": 480000,
+    })
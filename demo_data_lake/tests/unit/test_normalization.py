@@ -0,0 +1,99 @@
+import pyarrow as pa
+import pytest
+
+import http_extractor
+import normalization
+import population_schema
+
+HEADERS = ["Rank", "Name", "2025 Pop.", "2020 Pop.", "Change", "Density (mi²)", "Area (mi²)"]
+
+
+def test_clean_table_passes(california_html):
+    headers, rows = http_extractor.parse_table_html(california_html, max_iter=100)
+
+    normalized = normalization.normalize_rows(headers, rows)
+
+    assert normalized.bad_rows == []
+    assert normalized.valid_rows == list(range(len(rows)))
+    assert normalized.table.column("population").type == pa.int64()
+    assert normalized.table.column("population")[0].as_py() == 3820914
+
+
+def test_bad_rows_reported():
+    rows = [
+        ["1", "Los Angeles", "3,820,914", "3,898,747", "-2.00%", "8,304", "469"],
+        ["2", "San Diego", "1,404,452", "1,386,932", "1.26%", "4,319", "325"],
+        ["3", "San Jose", "lots", "1,013,240", "-2.13%", "5,787", "178"],
+        ["4", "Fresno", "-5", "542,107", "0.9%", "4,760", "115"],
+        ["5", "Los Angeles", "1,000", "1,000", "0%", "1", "1"],
+        ["6", "Oakland", "436,504"],
+        ["0", "", "n/a", "", "", "", ""],
+    ]
+
+    normalized = normalization.normalize_rows(HEADERS, rows)
+    errors = {bad.row: {(e["column"], e["rule"]) for e in bad.errors} for bad in normalized.bad_rows}
+
+    assert normalized.valid_rows == [0, 1]
+    assert normalized.table.column("city").to_pylist() == ["Los Angeles", "San Diego"]
+    assert errors == {
+        2: {("population", "type"), ("population", "required")},
+        3: {("population", "min")},
+        4: {("city", "unique")},
+        5: {(None, "length")},
+        6: {("rank", "min"), ("city", "required"), ("population", "required")},
+    }
+    report = normalized.report()
+    assert report["bad_rows"] == 5
+    assert report["errors_by_rule"]["population:required"] == 2
+    assert report["sample"][0] == {"row": 2, "errors": [{"column": "population", "rule": "type", "value": "lots"},
+                                                        {"column": "population", "rule": "required", "value": "lots"}]}
+
+
+@pytest.mark.parametrize("rows", [[["1", "Los Angeles"], ["2"]], []])
+def test_no_row_of_header_width(rows):
+    normalized = normalization.normalize_rows(HEADERS, rows)
+
+    assert normalized.num_rows == 0
+    assert normalized.table.num_rows == 0
+    assert "population" in normalized.table.column_names
+    assert normalized.report()["errors_by_rule"] == ({"None:length": len(rows)} if rows else {})
+
+
+@pytest.mark.parametrize("rows, expected, invalid", [
+    (
+        [["1", "A", "12,000", "", "+1.5 %", "—", "1e2"], ["x", " B ", "n/a", "7", "abc", "3", ""]],
+        [[1, None], ["A", "B"], [12000, None], [None, 7], [1.5, None], [None, 3.0], [100.0, None], [2025, 2025], [2020, 2020]],
+        {"rank": [False, True], "growth_pct": [False, True]},
+    ),
+    (
+        [["1", "A"], []],
+        [[1, None], ["A", None], [None, None], [None, None], [None, None], [None, None], [None, None], [2025, 2025], [2020, 2020]],
+        {},
+    ),
+])
+def test_typed_arrays(rows, expected, invalid):
+    fields, arrays, masks = normalization.typed_arrays(HEADERS, rows)
+
+    assert [field.name for field in fields] == [name for name, _ in population_schema.column_specs(HEADERS)] + \
+        ["population_year", "prior_population_year"]
+    assert [array.to_pylist() for array in arrays] == expected
+    assert {name: mask.to_pylist() for name, mask in masks.items() if any(mask.to_pylist())} == invalid
+
+
+def test_scrape_drops_bad_rows(scraper_lambda, monkeypatch, tmp_path):
+    from datetime import datetime, timezone
+
+    from object_store import LocalObjectStore
+    from targets import Target
+
+    rows = [["1", "A", "100", "90", "1%", "1", "1"], ["2", "A", "50", "40", "1%", "1", "1"]]
+    monkeypatch.setattr(scraper_lambda, "landing_store", LocalObjectStore(str(tmp_path)))
+    monkeypatch.setattr(scraper_lambda, "OUTPUT_FORMAT", "parquet")
+    monkeypatch.setattr(scraper_lambda, "extract_table", lambda url, max_iter: (HEADERS, rows))
+
+    res = scraper_lambda.scrape_and_upload(Target("ca", "", "population_scrape/ca/"), datetime(2025, 8, 1, tzinfo=timezone.utc), "off")
+
+    assert res["rows"] == 1
+    assert res["rejected_rows"] == 1
+    assert res["validation"]["errors_by_rule"] == {"city:unique": 1}
+
@@ -0,0 +1,114 @@
+import pytest
+
+from object_store import LocalObjectStore, ObjectStore, ObjectWriter, S3ObjectWriter
+
+
+class FakeS3Client:
+    def __init__(self, fail_complete=False):
+        self.fail_complete = fail_complete
+        self.calls = []
+        self.parts = []
+
+    def put_object(self, **kwargs):
+        self.calls.append(("put_object", kwargs))
+
+    def create_multipart_upload(self, **kwargs):
+        self.calls.append(("create_multipart_upload", kwargs))
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, **kwargs):
+        self.calls.append(("upload_part", kwargs))
+        self.parts.append(kwargs["Body"])
+        return {"ETag": f"etag-{kwargs['PartNumber']}"}
+
+    def complete_multipart_upload(self, **kwargs):
+        self.calls.append(("complete_multipart_upload", kwargs))
+        if self.fail_complete:
+            raise RuntimeError("complete failed")
+
+    def abort_multipart_upload(self, **kwargs):
+        self.calls.append(("abort_multipart_upload", kwargs))
+
+    def names(self):
+        return [name for name, _ in self.calls]
+
+
+def test_small_object_single_put():
+    client = FakeS3Client()
+    with S3ObjectWriter(client, "bucket", "key.jsonl", "application/x-ndjson", part_size=16) as writer:
+        writer.write(b"0123456789")
+
+    assert client.names() == ["put_object"]
+    assert client.calls[0][1]["Body"] == b"0123456789"
+    assert client.calls[0][1]["ContentType"] == "application/x-ndjson"
+
+
+def test_large_object_multipart():
+    client = FakeS3Client()
+    with S3ObjectWriter(client, "bucket", "key.jsonl", part_size=16) as writer:
+        for _ in range(5):
+            writer.write(b"0123456789")
+
+    assert client.names() == ["create_multipart_upload", "upload_part", "upload_part", "upload_part",
+                              "complete_multipart_upload"]
+    assert b"".join(client.parts) == b"0123456789" * 5
+    # only the last part may be smaller than part_size
+    assert all(len(part) >= 16 for part in client.parts[:-1])
+    assert client.calls[-1][1]["MultipartUpload"]["Parts"][-1] == {"ETag": "etag-3", "PartNumber": 3}
+    assert writer.bytes_written == 50
+
+
+def test_failed_multipart_aborted():
+    client = FakeS3Client(fail_complete=True)
+    writer = S3ObjectWriter(client, "bucket", "key.jsonl", part_size=4)
+    writer.write(b"0123456789")
+
+    with pytest.raises(RuntimeError):
+        writer.close()
+
+    assert client.names()[-1] == "abort_multipart_upload"
+
+
+def test_local_writer_only_visible_after_close(tmp_path):
+    store = LocalObjectStore(str(tmp_path))
+    writer = store.open_writer("a/b.jsonl")
+    writer.write(b"line\n")
+
+    assert not store.exists("a/b.jsonl")
+    assert list(store.list_objects()) == []
+
+    writer.close()
+    assert store.get("a/b.jsonl") == b"line\n"
+
+
+def test_local_writer_abort_leaves_nothing(tmp_path):
+    store = LocalObjectStore(str(tmp_path))
+
+    with pytest.raises(ValueError):
+        with store.open_writer("a/b.jsonl") as writer:
+            writer.write(b"partial")
+            raise ValueError("serialization failed")
+
+    assert list((tmp_path / "a").iterdir()) == []
+
+
+def test_configured_store_follows_local_backend_env(monkeypatch, tmp_path):
+    from object_store import S3ObjectStore, configured_store
+
+    monkeypatch.setenv("LOCAL_ROOT", str(tmp_path))
+    store = configured_store("landing")
+    assert isinstance(store, LocalObjectStore)
+    assert store.root == str(tmp_path / "landing")
+
+    monkeypatch.delenv("LOCAL_ROOT")
+    monkeypatch.setenv("LOCAL_ENDPOINT_URL", "http://127.0.0.1:5000")
+    store = configured_store("landing")
+    assert isinstance(store, S3ObjectStore)
+    assert store.client.meta.endpoint_url == "http://127.0.0.1:5000"
+
+
+def test_interfaces_are_abstract():
+    with pytest.raises(TypeError):
+        ObjectStore()
+    with pytest.raises(TypeError):
+        ObjectWriter()
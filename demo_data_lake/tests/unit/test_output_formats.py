@@ -0,0 +1,118 @@
+import io
+import json
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import http_extractor
+import population_schema
+from normalization import typed_arrays
+from output_formats import serialize_rows
+
+SCRAPE_TIME = datetime(2025, 8, 20, 14, 35, 22, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def scraped_table(california_html):
+    return http_extractor.parse_table_html(california_html, max_iter=100)
+
+
+def test_column_specs_canonical_names(scraped_table):
+    headers, _ = scraped_table
+    assert population_schema.column_specs(headers) == [
+        ("rank", "int"),
+        ("city", "string"),
+        ("population", "int"),
+        ("prior_population", "int"),
+        ("growth_pct", "float"),
+        ("density_per_sq_mi", "float"),
+        ("area_sq_mi", "float"),
+    ]
+
+
+def test_typed_arrays(scraped_table):
+    headers, rows = scraped_table
+    fields, arrays, _ = typed_arrays(headers, rows)
+    columns = {field.name: array.to_pylist() for field, array in zip(fields, arrays)}
+
+    assert columns["population"] == [int(row[2].replace(",", "")) for row in rows]
+    assert columns["growth_pct"][0] == -1.84
+    assert columns["population_year"][0] == 2025
+    assert columns["prior_population_year"][0] == 2020
+
+
+def test_typed_arrays_bad_cells():
+    fields, arrays, _ = typed_arrays(["Rank", "Name", "2025 Pop."], [["1", "A", "n/a"], ["x", "B", "12,000"]])
+    columns = {field.name: array.to_pylist() for field, array in zip(fields, arrays)}
+    assert columns["rank"] == [1, None]
+    assert columns["population"] == [None, 12000]
+
+
+def test_serialize_json_keeps_raw_rows(scraped_table):
+    headers, rows = scraped_table
+    output = serialize_rows(headers, rows, SCRAPE_TIME, "json")
+
+    assert output.file_type == "json"
+    assert json.loads(output.body)[0]["2025 Pop."] == "3,820,914"
+
+
+def test_serialize_parquet_typed(scraped_table):
+    headers, rows = scraped_table
+    output = serialize_rows(headers, rows, SCRAPE_TIME, "parquet")
+    table = pq.read_table(io.BytesIO(output.body))
+
+    assert output.file_type == "parquet"
+    assert table.num_rows == len(rows)
+    assert table.schema.field("population").type == pa.int64()
+    assert table.schema.field("growth_pct").type == pa.float64()
+    assert table.column("population")[0].as_py() == 3820914
+    assert table.column("scraped_at")[0].as_py() == SCRAPE_TIME
+
+
+def test_serialize_arrow(scraped_table):
+    headers, rows = scraped_table
+    output = serialize_rows(headers, rows, SCRAPE_TIME, "arrow")
+    table = pa.ipc.open_file(pa.BufferReader(output.body)).read_all()
+
+    assert output.file_type == "arrow"
+    assert table.column("city").to_pylist()[:2] == ["Los Angeles", "San Diego"]
+
+
+def test_serialize_unknown_format(scraped_table):
+    headers, rows = scraped_table
+    with pytest.raises(ValueError):
+        serialize_rows(headers, rows, SCRAPE_TIME, "csv")
+
+
+def test_stream_jsonl_chunks(scraped_table, monkeypatch):
+    import output_formats
+
+    headers, rows = scraped_table
+    monkeypatch.setattr(output_formats, "JSONL_CHUNK_ROWS", 5)
+    output = output_formats.stream_rows(headers, rows, SCRAPE_TIME, "jsonl")
+    chunks = list(output.chunks)
+
+    assert output.file_type == "jsonl"
+    assert len(chunks) == 3
+    lines = b"".join(chunks).decode("utf-8").splitlines()
+    assert [json.loads(line)["Name"] for line in lines] == [row[1] for row in rows]
+
+
+def test_streamed_snapshot_read_back(scraped_table, scraper_lambda, monkeypatch, tmp_path):
+    from landing_reader import read_landing_table
+    from object_store import LocalObjectStore
+    from targets import Target
+
+    headers, rows = scraped_table
+    store = LocalObjectStore(str(tmp_path))
+    monkeypatch.setattr(scraper_lambda, "landing_store", store)
+    monkeypatch.setattr(scraper_lambda, "OUTPUT_FORMAT", "jsonl")
+
+    key, _ = scraper_lambda.upload_snapshot(Target("california", "", "population_scrape/california/"), SCRAPE_TIME, headers, rows)
+    table = read_landing_table(store, key)
+
+    assert key.endswith("_population_ranks.jsonl")
+    assert table.column("population").to_pylist()[0] == 3820914
+    assert table.column("target").to_pylist() == ["california"] * len(rows)
@@ -0,0 +1,47 @@
+from datetime import date, datetime, timezone
+
+import partition_manifest
+from object_store import LocalObjectStore
+
+
+class NoListStore(LocalObjectStore):
+    def list_objects(self, prefix=""):
+        raise AssertionError("manifest reads must not list the bucket")
+
+
+def test_manifest_lists_uploads(landing, scrape):
+    res = scrape("california", datetime(2025, 8, 20, 8, tzinfo=timezone.utc))
+
+    entries = partition_manifest.load_manifest(landing, "population_scrape/california/", 2025, 8)
+
+    assert [entry.key for entry in entries] == [res["s3_key"]]
+    assert entries[0].rows == 10
+    assert entries[0].bytes == len(landing.get(res["s3_key"]))
+    assert entries[0].scraped_at == datetime(2025, 8, 20, 8, tzinfo=timezone.utc)
+    assert partition_manifest.load_index(landing, "population_scrape/") == {
+        "california": {"s3_path": "population_scrape/california/", "partitions": ["2025-08"]},
+    }
+
+
+def test_resolve_range_without_listing(landing, scrape, tmp_path):
+    for day in (datetime(2025, 7, 31, 23, tzinfo=timezone.utc), datetime(2025, 8, 1, 8, tzinfo=timezone.utc),
+                datetime(2025, 9, 2, 8, tzinfo=timezone.utc)):
+        scrape("california", day)
+        scrape("texas", day)
+
+    store = NoListStore(str(tmp_path / "landing"))
+    entries = partition_manifest.resolve_range(store, "population_scrape/", date(2025, 7, 31), date(2025, 8, 31))
+    texas = partition_manifest.resolve_range(store, "population_scrape/", date(2025, 8, 1), date(2025, 12, 31), ["texas", "nevada"])
+
+    assert len(entries) == 4
+    assert [entry.scraped_at.month for entry in entries] == [7, 7, 8, 8]
+    assert [entry.key.split("/")[1] for entry in texas] == ["texas", "texas"]
+
+
+def test_recording_twice_keeps_one_entry(landing):
+    entry = partition_manifest.ManifestEntry("population_scrape/ca/year=2025/month=08/2025-08-20_08-00-00_population_ranks.parquet",
+                                             10, 100, "abc", "2025-08-20T08:00:00+00:00")
+    partition_manifest.record_object(landing, "population_scrape/", "ca", "population_scrape/ca/", entry)
+    partition_manifest.record_object(landing, "population_scrape/", "ca", "population_scrape/ca/", entry)
+
+    assert partition_manifest.load_manifest(landing, "population_scrape/ca/", 2025, 8) == [entry]
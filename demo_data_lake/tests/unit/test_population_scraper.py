@@ -0,0 +1,285 @@
+import http.client
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+import http_extractor
+import targets
+
+
+def test_parse_table_html(california_html):
+    headers, rows = http_extractor.parse_table_html(california_html, max_iter=100)
+
+    assert headers == ["Rank", "Name", "2025 Pop.", "2020 Pop.", "Change", "Density (mi²)", "Area (mi²)"]
+    assert len(rows) == 12
+    assert rows[0] == ["1", "Los Angeles", "3,820,914", "3,898,747", "-1.84%", "8,092", "472"]
+    assert all(len(row) == len(headers) for row in rows)
+
+
+def test_parse_table_html_max_iter(california_html):
+    _, rows = http_extractor.parse_table_html(california_html, max_iter=3)
+    assert [row[1] for row in rows] == ["Los Angeles", "San Diego", "San Jose"]
+
+
+def test_parse_table_html_missing_table():
+    headers, rows = http_extractor.parse_table_html("<html><table class='other'><tr><td>1</td></tr></table></html>")
+    assert headers == []
+    assert rows == []
+
+
+def test_parse_table_html_unclosed_cells():
+    html = (
+        "<table class='wpr-table'><thead><tr><th>Rank<th>Name</thead>"
+        "<tbody><tr><td>1<td>Los Angeles<tr><td>2<td>San Diego</tbody></table>"
+    )
+    headers, rows = http_extractor.parse_table_html(html)
+    assert headers == ["Rank", "Name"]
+    assert rows == [["1", "Los Angeles"], ["2", "San Diego"]]
+
+
+def test_parse_table_html_implicit_tbody():
+    html = (
+        "<table class='wpr-table'><thead><tr><th>Rank</th><th>Name</th></tr></thead>"
+        "<tr><td>1</td><td>Los Angeles</td></tr><tr><td>2</td><td>San Diego</td></tr></table>"
+    )
+    headers, rows = http_extractor.parse_table_html(html)
+    assert headers == ["Rank", "Name"]
+    assert rows == [["1", "Los Angeles"], ["2", "San Diego"]]
+
+
+def test_extract_http(fixture_server):
+    headers, rows = http_extractor.extract_most_populated_cities_http(f"{fixture_server}/wpr_california.html", 5)
+    assert len(headers) == 7
+    assert len(rows) == 5
+
+
+def test_extract_http_missing_page(fixture_server):
+    assert http_extractor.extract_most_populated_cities_http(f"{fixture_server}/missing.html") == ([], [])
+
+
+@pytest.mark.parametrize("error", [ValueError("unknown url type"), ConnectionResetError(), http.client.IncompleteRead(b"")])
+def test_extract_http_request_errors(monkeypatch, error):
+    def failing_fetch(data_url, max_iter):
+        raise error
+
+    monkeypatch.setattr(http_extractor, "fetch_table", failing_fetch)
+    assert http_extractor.extract_most_populated_cities_http("http://example.com") == ([], [])
+
+
+def test_extract_table_falls_back_to_selenium(scraper_lambda, monkeypatch):
+    calls = []
+
+    def fake_backend(name, result):
+        def backend(data_url, max_iter):
+            calls.append(name)
+            return result
+        return backend
+
+    monkeypatch.setitem(scraper_lambda.EXTRACTION_BACKENDS, "http", fake_backend("http", ([], [])))
+    monkeypatch.setitem(scraper_lambda.EXTRACTION_BACKENDS, "selenium", fake_backend("selenium", (["Rank"], [["1"]])))
+
+    assert scraper_lambda.extract_table("http://example.com", 10, "auto") == (["Rank"], [["1"]])
+    assert calls == ["http", "selenium"]
+
+
+def test_extract_table_unknown_backend(scraper_lambda):
+    with pytest.raises(ValueError):
+        scraper_lambda.extract_table("http://example.com", 10, "lynx")
+
+
+class FakeTableDriver:
+    """
+    Minimal WebDriver stand-in that answers the table script with a fixed matrix
+    """
+
+    def __init__(self, headers, rows):
+        self.headers = headers
+        self.rows = rows
+        self.scripts = []
+
+    def get(self, url):
+        self.url = url
+
+    def find_element(self, by, value):
+        return object()
+
+    def execute_script(self, script, table_class, max_iter):
+        self.scripts.append(script)
+        if table_class != "wpr-table":
+            return None
+        return [self.headers, self.rows[:max_iter]]
+
+
+def test_extract_script_mode_single_round_trip(scraper_lambda, california_html):
+    headers, rows = http_extractor.parse_table_html(california_html, max_iter=100)
+    driver = FakeTableDriver(headers, rows)
+
+    res_headers, res_rows = scraper_lambda.extract_most_populated_cities(driver, "http://example.com", 4, mode="script")
+
+    assert res_headers == headers
+    assert res_rows == rows[:4]
+    assert driver.scripts == [scraper_lambda.TABLE_SCRIPT]
+
+
+def test_extract_script_mode_missing_table(scraper_lambda):
+    driver = FakeTableDriver([], [])
+    driver.execute_script = lambda script, table_class, max_iter: None
+
+    assert scraper_lambda.extract_most_populated_cities(driver, "http://example.com", mode="script") == ([], [])
+
+
+def test_extract_driver_crash_discards_driver(scraper_lambda, monkeypatch):
+    from selenium.common.exceptions import WebDriverException
+
+    from driver_pool import ChromeDriverPool
+
+    class CrashingDriver(FakeTableDriver):
+        def execute_script(self, script, *args):
+            raise WebDriverException("chrome not reachable")
+
+        def quit(self):
+            self.quit_called = True
+
+    drivers = []
+
+    def factory(temp_root):
+        drivers.append(CrashingDriver([], []))
+        return drivers[-1]
+
+    monkeypatch.setattr(scraper_lambda, "driver_pool", ChromeDriverPool(factory))
+    monkeypatch.setattr(scraper_lambda.WebDriverWait, "until", lambda self, condition: True)
+
+    with pytest.raises(WebDriverException):
+        scraper_lambda.extract_with_selenium("http://example.com")
+
+    assert drivers[0].quit_called
+    assert scraper_lambda.driver_pool._idle == []
+
+
+def test_load_targets_from_event():
+    res = targets.load_targets({"targets": ["Texas", {"name": "ohio", "url": "http://example.com/ohio"}]},
+                               '["california"]', "population_scrape/")
+
+    assert [t.name for t in res] == ["texas", "ohio"]
+    assert res[0].url == "https://worldpopulationreview.com/us-cities/texas"
+    assert res[0].s3_path == "population_scrape/texas/"
+    assert res[1].url == "http://example.com/ohio"
+
+
+def test_load_targets_from_config_and_legacy_url():
+    configured = targets.load_targets({}, '["california", "nevada"]', "population_scrape")
+    assert [t.s3_path for t in configured] == ["population_scrape/california/", "population_scrape/nevada/"]
+
+    legacy = targets.load_targets(None, "", "population_scrape/california/", "https://example.com/us-cities/california")
+    assert legacy == [targets.Target("california", "https://example.com/us-cities/california", "population_scrape/california/")]
+
+    with pytest.raises(ValueError):
+        targets.load_targets({"targets": ["texas", "Texas"]}, "", "population_scrape/")
+
+
+def test_scrape_targets_reports_per_target(scraper_lambda, monkeypatch):
+    def fake_scrape_target(target, scrape_time, deadline=None):
+        if target.name == "nevada":
+            raise Exception("Problem grabbing data.")
+        return {"target": target.name, "status": "succeeded", "s3_key": target.s3_path, "rows": 1}
+
+    monkeypatch.setattr(scraper_lambda, "scrape_target", fake_scrape_target)
+    monkeypatch.setattr(scraper_lambda, "TARGETS", '["california", "nevada", "texas"]')
+
+    res = scraper_lambda.lambda_handler({}, None)
+    body = json.loads(res["body"])
+
+    assert res["statusCode"] == 207
+    assert [r["status"] for r in body["results"]] == ["succeeded", "failed", "succeeded"]
+    assert body["results"][1]["error"] == "Problem grabbing data."
+
+
+def test_scrape_targets_times_out_slow_target(scraper_lambda, monkeypatch):
+    release = threading.Event()
+
+    def fake_scrape_target(target, scrape_time, deadline=None):
+        if target.name == "slow":
+            release.wait(5)
+        return {"target": target.name, "status": "succeeded"}
+
+    monkeypatch.setattr(scraper_lambda, "scrape_target", fake_scrape_target)
+    results = scraper_lambda.scrape_targets(
+        [targets.Target("fast", "", ""), targets.Target("slow", "", "")], None, timeout=0.2)
+    release.set()
+
+    assert [r["status"] for r in results] == ["succeeded", "timed_out"]
+
+
+def test_timed_out_target_writes_nothing(scraper_lambda, monkeypatch, tmp_path):
+    from object_store import LocalObjectStore
+
+    store = LocalObjectStore(str(tmp_path))
+    extracted = threading.Event()
+    release = threading.Event()
+    outcome = {}
+
+    def slow_extract(url, max_iter):
+        extracted.set()
+        release.wait(5)
+        return ["Rank", "Name", "2025 Pop."], [["1", "A", "100"]]
+
+    def watched_scrape_target(target, scrape_time, mode=None, deadline=None):
+        try:
+            return scrape_target(target, scrape_time, mode, deadline)
+        except Exception as e:
+            outcome["error"] = e
+            raise
+        finally:
+            outcome["done"] = True
+
+    scrape_target = scraper_lambda.scrape_target
+    monkeypatch.setattr(scraper_lambda, "landing_store", store)
+    monkeypatch.setattr(scraper_lambda, "extract_table", slow_extract)
+    monkeypatch.setattr(scraper_lambda, "scrape_target", watched_scrape_target)
+
+    results = scraper_lambda.scrape_targets([targets.Target("slow", "", "population_scrape/slow/")],
+                                            datetime(2025, 8, 1, tzinfo=timezone.utc), timeout=0.2)
+    assert extracted.is_set()
+    release.set()
+    for _ in range(100):
+        if outcome.get("done"):
+            break
+        time.sleep(0.05)
+
+    assert [r["status"] for r in results] == ["timed_out"]
+    assert isinstance(outcome["error"], TimeoutError)
+    assert list(store.list_objects("")) == []
+
+
+def test_scrape_target_records_phases(scraper_lambda, monkeypatch, fixture_server, tmp_path):
+    from object_store import LocalObjectStore
+    from targets import Target
+
+    monkeypatch.setattr(scraper_lambda, "landing_store", LocalObjectStore(str(tmp_path)))
+    target = Target("california", f"{fixture_server}/wpr_california.html", "population_scrape/california/")
+
+    res = scraper_lambda.scrape_target(target, datetime(2025, 8, 20, tzinfo=timezone.utc), mode="off")
+
+    assert set(res["phases_ms"]) == {"navigation", "extraction", "validation", "serialization", "upload"}
+    assert res["payload_bytes"] == (tmp_path / res["s3_key"]).stat().st_size
+
+
+def test_lambda_handler_emits_metrics(scraper_lambda, monkeypatch, capsys):
+    def fake_scrape_target(target, scrape_time, mode=None, deadline=None):
+        return {"target": target.name, "status": "succeeded", "rows": 12, "payload_bytes": 2048,
+                "phases_ms": {"navigation": 120.0, "extraction": 30.0}}
+
+    monkeypatch.setattr(scraper_lambda, "scrape_target", fake_scrape_target)
+    monkeypatch.setattr(scraper_lambda, "TARGETS", '["california", "texas"]')
+
+    scraper_lambda.lambda_handler({}, None)
+
+    emf = [json.loads(line) for line in capsys.readouterr().out.splitlines() if '"_aws"' in line]
+    metric_names = {metric["Name"] for blob in emf for metric in blob["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+    assert {"TargetsSucceeded", "TargetsFailed", "RowsScraped", "PayloadBytes", "NavigationDuration",
+            "RunDuration", "PeakRss"} <= metric_names
+    assert emf[0]["RowsScraped"] == [12, 12]
+    assert emf[0]["_aws"]["CloudWatchMetrics"][0]["Namespace"] == "PopulationScraper"
@@ -0,0 +1,117 @@
+import io
+import json
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import compaction
+import published_layer
+
+
+@pytest.fixture
+def process(stores):
+    def process(target, year, month, scrapes):
+        """
+        scrapes: {day: [(city, population), ...]} ranked in list order
+        """
+        rows = []
+        for day, cities in scrapes.items():
+            scraped_at = datetime(year, month, day, 8, tzinfo=timezone.utc)
+            rows += [
+                {"rank": rank, "city": city, "population": population, "scraped_at": scraped_at, "target": target}
+                for rank, (city, population) in enumerate(cities, start=1)
+            ]
+        partition = compaction.Partition(target, str(year), f"{month:02d}")
+        compaction.write_parquet(stores["processed"], partition.key(compaction.PROCESSED_PREFIX), pa.Table.from_pylist(rows))
+
+    return process
+
+
+def run(stores):
+    return published_layer.run_publish(stores["processed"], stores["published"], limit=2)
+
+
+def read(store, key):
+    return pq.read_table(io.BytesIO(store.get(key)))
+
+
+def test_month_over_month_deltas(stores, process):
+    process("california", 2025, 7, {31: [("Los Angeles", 1000), ("San Diego", 500), ("San Jose", 400)]})
+    # the earlier August scrape is superseded by the month end one
+    process("california", 2025, 8, {
+        1: [("Los Angeles", 1001), ("San Diego", 501), ("San Jose", 401)],
+        30: [("Los Angeles", 1010), ("San Jose", 520), ("San Diego", 505), ("Fresno", 300)],
+    })
+
+    results = run(stores)
+
+    assert [res["partition"] for res in results] == ["california/year=2025/month=07", "california/year=2025/month=08"]
+    deltas = read(stores["published"], "population_city_deltas/california/year=2025/month=08/part-00000.parquet")
+    assert deltas.column("city").to_pylist() == ["Los Angeles", "San Jose", "San Diego", "Fresno"]
+    assert deltas.column("rank_change").to_pylist() == [0, 1, -1, None]
+    assert deltas.column("population_change").to_pylist() == [10, 120, 5, None]
+    assert deltas.column("population_change_pct").to_pylist()[1] == pytest.approx(30.0)
+
+    first = read(stores["published"], "population_city_deltas/california/year=2025/month=07/part-00000.parquet")
+    assert first.column("previous_rank").null_count == first.num_rows
+
+
+def test_latest_rankings_and_fastest_growing(stores, process):
+    process("california", 2025, 7, {31: [("Los Angeles", 1000), ("San Diego", 500), ("San Jose", 400)]})
+    process("california", 2025, 8, {31: [("Los Angeles", 1100), ("San Diego", 505), ("San Jose", 480)]})
+    process("texas", 2025, 8, {31: [("Houston", 900), ("Dallas", 800)]})
+    run(stores)
+
+    rankings = read(stores["published"], published_layer.RANKINGS_KEY)
+    assert list(zip(rankings.column("target").to_pylist(), rankings.column("city").to_pylist())) == [
+        ("california", "Los Angeles"), ("california", "San Diego"), ("california", "San Jose"),
+        ("texas", "Houston"), ("texas", "Dallas"),
+    ]
+    metadata = pq.ParquetFile(io.BytesIO(stores["published"].get(published_layer.RANKINGS_KEY))).metadata
+    assert [column.column_index for column in metadata.row_group(0).sorting_columns] == [
+        rankings.schema.get_field_index("target"), rankings.schema.get_field_index("rank"),
+    ]
+
+    growing = read(stores["published"], published_layer.FASTEST_GROWING_KEY)
+    # texas has a single month so no growth yet, the limit keeps two california cities
+    assert growing.column("city").to_pylist() == ["San Jose", "Los Angeles"]
+    assert growing.column("growth_rank").to_pylist() == [1, 2]
+
+    index = json.loads(stores["published"].get(published_layer.INDEX_KEY))
+    assert index["tables"]["rankings"]["months"] == {
+        "california": "california/year=2025/month=08", "texas": "texas/year=2025/month=08",
+    }
+    assert index["tables"]["rankings"]["rows"] == 5
+
+
+def test_only_changed_months_rebuilt(stores, process):
+    process("california", 2025, 6, {30: [("Los Angeles", 990)]})
+    process("california", 2025, 7, {31: [("Los Angeles", 1000)]})
+    process("california", 2025, 8, {31: [("Los Angeles", 1010)]})
+    process("texas", 2025, 8, {31: [("Houston", 900)]})
+    assert len(run(stores)) == 4
+
+    assert run(stores) == []
+
+    # a July change moves the July and August deltas, June and texas are left alone
+    process("california", 2025, 7, {31: [("Los Angeles", 1005)]})
+    assert [(res["partition"], res["source_changed"]) for res in run(stores)] == [
+        ("california/year=2025/month=07", True),
+        ("california/year=2025/month=08", False),
+    ]
+    rankings = read(stores["published"], published_layer.RANKINGS_KEY)
+    assert rankings.column("population_change").to_pylist() == [5, None]
+
+
+def test_new_scrape_in_latest_month_refreshes_rankings(stores, process):
+    process("california", 2025, 7, {31: [("Los Angeles", 1000)]})
+    process("california", 2025, 8, {1: [("Los Angeles", 1001)]})
+    run(stores)
+
+    process("california", 2025, 8, {1: [("Los Angeles", 1001)], 2: [("Los Angeles", 1002)]})
+    run(stores)
+
+    rankings = read(stores["published"], published_layer.RANKINGS_KEY)
+    assert rankings.column("population").to_pylist() == [1002]
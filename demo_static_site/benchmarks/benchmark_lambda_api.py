@@ -0,0 +1,347 @@
+"""
+Latency, consumed capacity and memory benchmark for the blog API lambda.
+
+Seeds DynamoDB Local (http://localhost:8000), or an in-process moto server with --in-process, with posts of realistic sizes and drives lambda_handler
+with API Gateway v2 events, serially and from a thread pool, then prints the results as JSON.
+
+    python benchmarks/benchmark_lambda_api.py --sizes 1000,10000,100000 --output results.json
+    python benchmarks/benchmark_lambda_api.py --compare results.json --max-regression 0.2
+    python benchmarks/benchmark_lambda_api.py --in-process --sizes 1000 --requests 50
+
+/send_message goes to a real queue on the moto server with --in-process, or on --sqs-endpoint (e.g. ElasticMQ).
+Without either it is timed against an in-process stub and reported as send_message_stubbed.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from local_stack import POSTS_INDEX_NAME, QUEUE_NAME, create_table, moto_endpoint
+
+LAMBDA_API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "assets", "lambdas", "lambda-api")
+ENDPOINT_URL = "http://localhost:8000"
+WORDS = ["data", "lake", "lambda", "python", "pipeline", "dynamodb", "query", "table", "static", "site",
+         "deploy", "stack", "bucket", "event", "stream", "cache", "schema", "partition", "latency", "cost"]
+
+
+@dataclass
+class LambdaContext:
+    function_name: str = "benchmark_lambda_api"
+    function_version: str = "$LATEST"
+    invoked_function_arn: str = "arn:aws:lambda:us-east-1:123456789012:function:benchmark_lambda_api"
+    memory_limit_in_mb: int = 128
+    aws_request_id: str = "benchmark"
+    log_group_name: str = "/aws/lambda/benchmark_lambda_api"
+    log_stream_name: str = "benchmark"
+
+
+class Capacity_meter:
+    """
+    Sums the ConsumedCapacity DynamoDB reports, per thread so concurrent requests are counted separately
+    """
+
+    OPERATIONS = ["Query", "Scan", "GetItem", "PutItem", "BatchWriteItem"]
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def install(self, client) -> None:
+        for operation in self.OPERATIONS:
+            client.meta.events.register(f"provide-client-params.dynamodb.{operation}", self.request_capacity)
+            client.meta.events.register(f"after-call.dynamodb.{operation}", self.record_capacity)
+
+    def request_capacity(self, params, **kwargs):
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+    def record_capacity(self, parsed, **kwargs):
+        consumed = parsed.get("ConsumedCapacity") or []
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+        self.local.units = self.units() + sum(entry.get("CapacityUnits", 0) for entry in consumed)
+
+    def units(self) -> float:
+        return getattr(self.local, "units", 0.0)
+
+    def reset(self) -> None:
+        self.local.units = 0.0
+
+
+class Benchmark_queue:
+    """
+    Accepts send_message calls in process so the route can be timed without a local SQS
+    """
+
+    def send_message(self, **kwargs):
+        return {"MessageId": "benchmark"}
+
+
+def create_queue(endpoint_url: str):
+    """
+    SQS client and url of the user message queue on a local endpoint, as local_stack.provision creates it
+    """
+    import boto3
+
+    sqs = boto3.client("sqs", endpoint_url=endpoint_url)
+    return sqs, sqs.create_queue(QueueName=QUEUE_NAME)["QueueUrl"]
+
+
+def configure_environment(table_name: str, with_cache: bool, endpoint_url: Optional[str] = None) -> None:
+    # the lambda reads its configuration at import time
+    os.environ["DDB_TABLE_NAME"] = table_name
+    os.environ["DDB_POSTS_INDEX_NAME"] = POSTS_INDEX_NAME
+    os.environ["STATIC_SITE_URL"] = "http://localhost"
+    os.environ.setdefault("USER_MESSAGE_QUEUE_URL", "http://localhost:9324/000000000000/user-messages")
+    if endpoint_url:
+        os.environ["LOCAL_ENDPOINT_URL"] = endpoint_url
+    else:
+        os.environ["LOCAL"] = "true"
+    os.environ["POSTS_CACHE_TTL_SECONDS"] = "60" if with_cache else "0"
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "local")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "local")
+    os.environ.setdefault("POWERTOOLS_LOG_LEVEL", "WARNING")
+    os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "true")
+
+
+def words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def synthetic_post(rng: random.Random) -> Dict[str, str]:
+    """
+    Title of 3-12 words and a body around 1.5KB with a long tail, capped well below the 400KB item limit
+    """
+    content_bytes = min(int(rng.lognormvariate(7.0, 0.8)), 32_000)
+    content = words(rng, max(content_bytes // 7, 1))[:content_bytes]
+    return {"title": words(rng, rng.randint(3, 12)).title(), "content": content}
+
+
+def seed_posts(api, table_name: str, count: int, rng: random.Random) -> float:
+    """
+    Write count posts through put_rows, one second apart so created_at ordering is realistic
+    """
+    started = time.perf_counter()
+    epoch = time.time() - count
+    batch = []
+    for index in range(count):
+        post = synthetic_post(rng)
+        created_at = time.strftime("%Y-%m-%dT%H:%M:%S.000000Z", time.gmtime(epoch + index))
+        batch.append(api.post_item(api.create_post(post["title"], post["content"], created_at=created_at)))
+        if len(batch) == api.MAX_POSTS_PER_BATCH or index == count - 1:
+            failed = api.put_rows(batch, table_name)
+            if failed:
+                raise RuntimeError(f"Could not seed {len(failed)} posts")
+            batch = []
+    return time.perf_counter() - started
+
+
+def http_event(method: str, path: str, query: Optional[Dict[str, str]] = None, body: Any = None) -> dict:
+    query = query or {}
+    return {
+        "version": "2.0",
+        "routeKey": f"{method} {path}",
+        "rawPath": path,
+        "rawQueryString": "&".join(f"{key}={value}" for key, value in query.items()),
+        "queryStringParameters": query or None,
+        "headers": {"accept": "*/*", "content-type": "application/json", "host": "localhost"},
+        "requestContext": {
+            "accountId": "123456789012",
+            "apiId": "benchmark",
+            "domainName": "localhost",
+            "http": {"method": method, "path": path, "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1", "userAgent": "benchmark"},
+            "requestId": "benchmark",
+            "routeKey": f"{method} {path}",
+            "stage": "$default",
+            "time": "01/Jan/2025:00:00:00 +0000",
+            "timeEpoch": 1735689600000,
+        },
+        "body": json.dumps(body) if body is not None else None,
+        "isBase64Encoded": False,
+    }
+
+
+def scenarios(count: int, full_scan_max: int, rng: random.Random) -> Dict[str, Callable[[], dict]]:
+    res = {
+        "get_posts_page": lambda: http_event("GET", "/get_posts", {"limit": "20"}),
+        "get_posts_summary_page": lambda: http_event("GET", "/get_posts", {"limit": "100", "summary": "true"}),
+        "add_post": lambda: http_event("POST", "/add_post", body=synthetic_post(rng)),
+        "send_message": lambda: http_event("POST", "/send_message", body={
+            "yourName": "Benchmark", "subject": words(rng, 4), "message": words(rng, 60)
+        }),
+    }
+    # the unpaginated list reads the whole table, skip it where that would dominate the run
+    if count <= full_scan_max:
+        res["get_posts_all"] = lambda: http_event("GET", "/get_posts")
+    return res
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def timed_request(api, meter: Capacity_meter, make_event: Callable[[], dict]) -> Dict[str, float]:
+    event = make_event()
+    meter.reset()
+    started = time.perf_counter()
+    response = api.lambda_handler(event, LambdaContext())
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return {"ms": elapsed_ms, "capacity": meter.units(), "error": response.get("statusCode", 500) >= 400}
+
+
+def run_scenario(api, meter: Capacity_meter, make_event: Callable[[], dict], requests: int,
+                 concurrency: int, memory_samples: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    if concurrency == 1:
+        samples = [timed_request(api, meter, make_event) for _ in range(requests)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = list(executor.map(lambda _: timed_request(api, meter, make_event), range(requests)))
+    wall_seconds = time.perf_counter() - started
+
+    # allocations are traced in a separate pass so tracing overhead does not skew the latencies
+    api.posts_cache.clear()
+    tracemalloc.start()
+    for _ in range(memory_samples):
+        timed_request(api, meter, make_event)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = sorted(sample["ms"] for sample in samples)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(sample["error"] for sample in samples),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "throughput_rps": round(requests / wall_seconds, 2),
+        "consumed_capacity_per_request": round(sum(sample["capacity"] for sample in samples) / requests, 3),
+        "peak_traced_bytes": peak_bytes,
+    }
+
+
+def compare(results: Dict[str, Any], baseline_path: str, max_regression: float) -> List[str]:
+    """
+    Scenarios whose p95 grew by more than max_regression against a previous run
+    """
+    with open(baseline_path) as f:
+        baseline = {
+            (res["posts"], res["scenario"], res["concurrency"]): res for res in json.load(f)["results"]
+        }
+
+    regressions = []
+    for res in results["results"]:
+        before = baseline.get((res["posts"], res["scenario"], res["concurrency"]))
+        if before and before["p95_ms"] > 0 and res["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            regressions.append(
+                f"{res['scenario']} posts={res['posts']} concurrency={res['concurrency']}: "
+                f"p95 {before['p95_ms']}ms -> {res['p95_ms']}ms"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the blog API lambda against DynamoDB Local.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma separated post counts to seed")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="Threads for the concurrent mode")
+    parser.add_argument("--memory-samples", type=int, default=10, help="Requests traced for peak allocations")
+    parser.add_argument("--full-scan-max", type=int, default=10000, help="Largest table the unpaginated list runs against")
+    parser.add_argument("--with-cache", action="store_true", help="Keep the /get_posts response cache enabled")
+    parser.add_argument("--reuse-tables", action="store_true", help="Skip seeding when the benchmark table exists")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="Previous results to check p95 regressions against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p95 growth as a fraction")
+    parser.add_argument("--in-process", action="store_true", help="Run against a moto server in this process instead of DynamoDB Local")
+    parser.add_argument("--sqs-endpoint", help="Local SQS such as ElasticMQ for /send_message, defaults to the moto server with --in-process")
+    args = parser.parse_args(argv)
+
+    with (moto_endpoint() if args.in_process else contextlib.nullcontext(ENDPOINT_URL)) as endpoint_url:
+        return run_benchmark(args, endpoint_url if args.in_process else None)
+
+
+def run_benchmark(args, endpoint_url: Optional[str]) -> int:
+    sizes = [int(size) for size in args.sizes.split(",")]
+    configure_environment(f"benchmarkPosts{sizes[0]}", args.with_cache, endpoint_url)
+    sys.path.insert(0, LAMBDA_API_DIR)
+    import lambda_function as api
+
+    sqs_endpoint = args.sqs_endpoint or endpoint_url
+    if sqs_endpoint:
+        api.sqs, api.user_message_queue_url = create_queue(sqs_endpoint)
+    else:
+        # no SQS to send to, the route is timed without the queue call
+        api.sqs = Benchmark_queue()
+    meter = Capacity_meter()
+    meter.install(api.dynamodb.meta.client)
+    rng = random.Random(args.seed)
+
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "endpoint": endpoint_url or ENDPOINT_URL,
+            "with_cache": args.with_cache,
+            "send_message_queue": api.user_message_queue_url if sqs_endpoint else "stubbed",
+            "cold_start": api.get_cold_start_report(),
+        },
+        "seeding": [],
+        "results": [],
+    }
+
+    for count in sizes:
+        table_name = f"benchmarkPosts{count}"
+        # routes read the table name from module config
+        api.ddb_table_name = table_name
+        api.posts_cache.clear()
+
+        existing = table_name in api.dynamodb.meta.client.list_tables()["TableNames"]
+        if not (args.reuse_tables and existing):
+            create_table(api.dynamodb, table_name)
+            seconds = seed_posts(api, table_name, count, rng)
+            results["seeding"].append({"posts": count, "seconds": round(seconds, 2)})
+
+        for name, make_event in scenarios(count, args.full_scan_max, rng).items():
+            # a stubbed queue is not comparable with a real one, keep it apart in --compare
+            if name == "send_message" and not sqs_endpoint:
+                name = "send_message_stubbed"
+            for concurrency in sorted({1, args.concurrency}):
+                res = run_scenario(api, meter, make_event, args.requests, concurrency, args.memory_samples)
+                results["results"].append({"posts": count, "scenario": name, **res})
+                print(f"{name} posts={count} concurrency={concurrency} p95={res['p95_ms']}ms", file=sys.stderr)
+
+    # ru_maxrss is KB on Linux
+    results["environment"]["max_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""
+The blog API, its authorizer and the user message consumer wired to an in-process moto server.
+
+DynamoDB, SQS and SNS calls of the lambdas go to LOCAL_ENDPOINT_URL, so the routes and the
+send_message -> queue -> consumer -> SNS path run on a laptop without AWS or Docker.
+
+    python benchmarks/local_stack.py
+"""
+import contextlib
+import importlib.util
+import json
+import os
+import socket
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+LAMBDAS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "assets", "lambdas")
+POSTS_INDEX_NAME = "PostsByCreatedAt"
+TABLE_NAME = "localPosts"
+QUEUE_NAME = "local-user-messages"
+TOPIC_NAME = "local-user-messages"
+# kid and secret of the authorizer's AUTH_KEYS, tokens for the protected routes are signed with it
+AUTH_KID = "local"
+AUTH_SECRET = "local-secret"
+PROTECTED_ROUTES = ("/add_post", "/add_posts")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def moto_endpoint() -> Iterator[str]:
+    """
+    Endpoint of a moto server running on a thread of this process, stopped on exit
+    """
+    import logging
+    from moto.server import ThreadedMotoServer
+
+    # one access log line per call would bury the results
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "local")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "local")
+    port = free_port()
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.stop()
+
+
+def create_table(dynamodb, table_name: str) -> None:
+    # same layout as StaticSiteBlogPostsTable with its PostsByCreatedAt index
+    try:
+        dynamodb.Table(table_name).delete()
+        dynamodb.meta.client.get_waiter("table_not_exists").wait(TableName=table_name)
+    except dynamodb.meta.client.exceptions.ResourceNotFoundException:
+        pass
+
+    dynamodb.create_table(
+        TableName=table_name,
+        KeySchema=[{"AttributeName": "post_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "post_id", "AttributeType": "S"},
+            {"AttributeName": "feed", "AttributeType": "S"},
+            {"AttributeName": "created_at", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexes=[{
+            "IndexName": POSTS_INDEX_NAME,
+            "KeySchema": [
+                {"AttributeName": "feed", "KeyType": "HASH"},
+                {"AttributeName": "created_at", "KeyType": "RANGE"},
+            ],
+            "Projection": {"ProjectionType": "ALL"},
+        }],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    dynamodb.meta.client.get_waiter("table_exists").wait(TableName=table_name)
+
+
+def provision(endpoint_url: str, table_name: str = TABLE_NAME) -> Dict[str, str]:
+    """
+    Resources of StaticSiteStack the lambdas talk to, plus a queue subscribed to the topic to read notifications from.
+    Returns the environment the lambdas need, they read it at import time.
+    """
+    import boto3
+
+    create_table(boto3.resource("dynamodb", endpoint_url=endpoint_url), table_name)
+    sqs = boto3.client("sqs", endpoint_url=endpoint_url)
+    sns = boto3.client("sns", endpoint_url=endpoint_url)
+    queue_url = sqs.create_queue(QueueName=QUEUE_NAME)["QueueUrl"]
+    topic_arn = sns.create_topic(Name=TOPIC_NAME)["TopicArn"]
+
+    # stands in for the email subscription of UserMessageTopic
+    notifications_url = sqs.create_queue(QueueName=f"{TOPIC_NAME}-notifications")["QueueUrl"]
+    notifications_arn = sqs.get_queue_attributes(QueueUrl=notifications_url, AttributeNames=["QueueArn"])["Attributes"]["QueueArn"]
+    sns.subscribe(TopicArn=topic_arn, Protocol="sqs", Endpoint=notifications_arn, Attributes={"RawMessageDelivery": "true"})
+
+    return {
+        "LOCAL_ENDPOINT_URL": endpoint_url,
+        "DDB_TABLE_NAME": table_name,
+        "DDB_POSTS_INDEX_NAME": POSTS_INDEX_NAME,
+        "STATIC_SITE_URL": "http://localhost",
+        "USER_MESSAGE_QUEUE_URL": queue_url,
+        "USER_MESSAGE_SNS_ARN": topic_arn,
+        "LOCAL_NOTIFICATIONS_QUEUE_URL": notifications_url,
+        "AUTH_KEYS": json.dumps({AUTH_KID: AUTH_SECRET}),
+        "POWERTOOLS_LOG_LEVEL": os.environ.get("POWERTOOLS_LOG_LEVEL", "WARNING"),
+        "POWERTOOLS_TRACE_DISABLED": "true",
+        "POWERTOOLS_METRICS_NAMESPACE": "Local",
+    }
+
+
+def load_lambda(directory: str, module_name: str):
+    # every lambda is a lambda_function.py, load them under distinct names so they don't replace each other
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(LAMBDAS_DIR, directory, "lambda_function.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Lambda_context:
+    function_name = "local_stack"
+    function_version = "$LATEST"
+    invoked_function_arn = "arn:aws:lambda:us-east-1:123456789012:function:local_stack"
+    memory_limit_in_mb = 128
+    aws_request_id = "local"
+    log_group_name = "/aws/lambda/local_stack"
+    log_stream_name = "local"
+
+
+class Local_stack:
+    """
+    Invokes the lambdas the way API Gateway, the authorizer and the SQS event source do in StaticSiteStack
+    """
+
+    def __init__(self, environment: Dict[str, str]):
+        os.environ.update(environment)
+        self.environment = environment
+        self.api = load_lambda("lambda-api", "local_lambda_api")
+        self.auth = load_lambda("lambda-auth", "local_lambda_auth")
+        self.consumer = load_lambda("lambda-message-consumer", "local_lambda_message_consumer")
+
+        import boto3
+
+        self.sqs = boto3.client("sqs", endpoint_url=environment["LOCAL_ENDPOINT_URL"])
+
+    def token(self, subject: str = "local", lifetime: int = 3600) -> str:
+        issued_at = int(time.time())
+        claims = {"sub": subject, "iat": issued_at, "exp": issued_at + lifetime}
+        return self.auth.sign_token(claims, AUTH_KID, AUTH_SECRET.encode("utf-8"))
+
+    def request(self, method: str, path: str, query: Optional[Dict[str, str]] = None, body: Any = None,
+                token: Optional[str] = None) -> dict:
+        """
+        API Gateway v2 request, protected routes are rejected with 403 unless the authorizer accepts the token
+        """
+        query = query or {}
+        headers = {"accept": "*/*", "content-type": "application/json", "host": "localhost"}
+        if token:
+            headers["authorization"] = f"Bearer {token}"
+        event = {
+            "version": "2.0",
+            "routeKey": f"{method} {path}",
+            "rawPath": path,
+            "rawQueryString": "&".join(f"{key}={value}" for key, value in query.items()),
+            "queryStringParameters": query or None,
+            "headers": headers,
+            "requestContext": {
+                "accountId": "123456789012",
+                "apiId": "local",
+                "domainName": "localhost",
+                "http": {"method": method, "path": path, "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1", "userAgent": "local"},
+                "requestId": "local",
+                "routeKey": f"{method} {path}",
+                "stage": "$default",
+                "time": "01/Jan/2025:00:00:00 +0000",
+                "timeEpoch": 1735689600000,
+            },
+            "body": json.dumps(body) if body is not None else None,
+            "isBase64Encoded": False,
+        }
+        if path in PROTECTED_ROUTES and not self.auth.lambda_handler(event, Lambda_context())["isAuthorized"]:
+            return {"statusCode": 403, "body": json.dumps({"message": "Forbidden"})}
+        return self.api.lambda_handler(event, Lambda_context())
+
+    def deliver_messages(self, max_batches: int = 10) -> List[dict]:
+        """
+        Hand queued user messages to the consumer in batches like the SQS event source, deleting the ones it accepted
+        """
+        results = []
+        queue_url = self.environment["USER_MESSAGE_QUEUE_URL"]
+        for _ in range(max_batches):
+            received = self.sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10).get("Messages", [])
+            if not received:
+                break
+            records = [
+                {"messageId": message["MessageId"], "receiptHandle": message["ReceiptHandle"], "body": message["Body"]}
+                for message in received
+            ]
+            res = self.consumer.lambda_handler({"Records": records}, Lambda_context())
+            failed = {failure["itemIdentifier"] for failure in res["batchItemFailures"]}
+            for record in records:
+                if record["messageId"] not in failed:
+                    self.sqs.delete_message(QueueUrl=queue_url, ReceiptHandle=record["receiptHandle"])
+            results.append(res)
+        return results
+
+    def notifications(self) -> List[str]:
+        """
+        Messages published to the user message topic since the last call
+        """
+        queue_url = self.environment["LOCAL_NOTIFICATIONS_QUEUE_URL"]
+        messages = []
+        while True:
+            received = self.sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10).get("Messages", [])
+            if not received:
+                return messages
+            for message in received:
+                messages.append(message["Body"])
+                self.sqs.delete_message(QueueUrl=queue_url, ReceiptHandle=message["ReceiptHandle"])
+
+
+def demo() -> Dict[str, Any]:
+    with moto_endpoint() as endpoint_url:
+        stack = Local_stack(provision(endpoint_url))
+        token = stack.token()
+        created = stack.request("POST", "/add_post", body={"title": "Local post", "content": "Written without AWS"}, token=token)
+        rejected = stack.request("POST", "/add_post", body={"title": "No token", "content": "Rejected"})
+        listed = stack.request("GET", "/get_posts", {"limit": "10"})
+        sent = stack.request("POST", "/send_message", body={"yourName": "Local", "subject": "Hello", "message": "From the local stack"})
+        stack.deliver_messages()
+        return {
+            "endpoint": endpoint_url,
+            "add_post": created["statusCode"],
+            "add_post_without_token": rejected["statusCode"],
+            "get_posts": json.loads(listed["body"]),
+            "send_message": sent["statusCode"],
+            "notifications": stack.notifications(),
+        }
+
+
+if __name__ == "__main__":
+    print(json.dumps(demo(), indent=2))
@@ -1,48 +1,191 @@
-from dataclasses import dataclass, asdict
+import time
+
+# cold start timing starts before anything else is imported
+_init_started = time.perf_counter()
+
+from dataclasses import dataclass, asdict, fields, MISSING
+from datetime import datetime, timezone
 import uuid
 import os
-import boto3
+import base64
+import binascii
+import hashlib
+import random
+import threading
+from collections import OrderedDict
 import json
-from typing import List, Dict, Any
-from botocore.exceptions import ClientError
+from typing import List, Dict, Any, Optional, Callable
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.logging import correlation_paths
 from aws_lambda_powertools.utilities.typing import LambdaContext
-from aws_lambda_powertools.event_handler import APIGatewayHttpResolver
+from aws_lambda_powertools.event_handler import APIGatewayHttpResolver, Response, content_types
+from aws_lambda_powertools.event_handler.exceptions import BadRequestError, NotFoundError
+
+_imports_done = time.perf_counter()
 
 logger = Logger(service="APP")
-tracer = Tracer(service="APP")
+# boto3 is imported and patched for X-Ray on first client use instead of at import.
+# Tracer still loads the X-Ray SDK, and the botocore session it uses, while the container initialises.
+tracer = Tracer(service="APP", auto_patch=False)
 
 ddb_table_name = os.environ["DDB_TABLE_NAME"]
 static_site_url = os.environ["STATIC_SITE_URL"]
-user_message_sns_arn = os.environ["USER_MESSAGE_SNS_ARN"]
+# send_message only enqueues, the message consumer lambda publishes to the user messages topic
+user_message_queue_url = os.environ["USER_MESSAGE_QUEUE_URL"]
+# GSI with feed as hash key and created_at as range key, posts are scanned when it is not configured
+posts_index_name = os.environ.get("DDB_POSTS_INDEX_NAME", "")
+POSTS_FEED = "blog"
+# posts written before the index existed have no created_at, the backfill dates them so they sort oldest
+LEGACY_CREATED_AT = "1970-01-01T00:00:00.000000Z"
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# BatchWriteItem takes at most 25 requests per call
+BATCH_WRITE_SIZE = 25
+BATCH_WRITE_MAX_RETRIES = 5
+BATCH_WRITE_BASE_DELAY_SECONDS = 0.05
+MAX_POSTS_PER_BATCH = 500
+
+# posts are cached per warm container, a write only invalidates the container that handled it
+POSTS_CACHE_TTL_SECONDS = int(os.environ.get("POSTS_CACHE_TTL_SECONDS", "60"))
+POSTS_CACHE_MAX_ENTRIES = int(os.environ.get("POSTS_CACHE_MAX_ENTRIES", "64"))
+# the page reloads the list right after adding a post, so browsers revalidate every time and get a 304 via the ETag
+POSTS_CACHE_CONTROL = "no-cache"
 
 app = APIGatewayHttpResolver()
 
-if os.environ.get('LOCAL') == 'true':
-    endpoint_url = "http://localhost:8000"
+# filled in as the container initialises, logged once on the first invocation
+cold_start_report: Dict[str, Any] = {
+    "imports_ms": round((_imports_done - _init_started) * 1000, 2),
+    "clients_ms": {},
+}
+_cold_start_logged = False
 
-    dynamodb = boto3.resource(
-        'dynamodb',
-        endpoint_url=endpoint_url
-    )
-else:
-    dynamodb = boto3.resource(
-        'dynamodb'
-    )
 
-sns = boto3.client('sns')
+class Lazy_client:
+    """
+    Builds a boto3 client or resource on first attribute access and reuses it for the life of the container,
+    so requests that never touch a service don't pay for creating it
+    """
+
+    _boto3_patched = False
+    _lock = threading.Lock()
+
+    def __init__(self, name: str, factory: Callable[[Any], Any]):
+        self.name = name
+        self.factory = factory
+        self.client = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.client is not None
+
+    def get(self):
+        if self.client is None:
+            with Lazy_client._lock:
+                if self.client is None:
+                    started = time.perf_counter()
+                    import boto3
+
+                    if not Lazy_client._boto3_patched:
+                        tracer.patch(["boto3"])
+                        Lazy_client._boto3_patched = True
+                    self.client = self.factory(boto3)
+                    cold_start_report["clients_ms"][self.name] = round((time.perf_counter() - started) * 1000, 2)
+        return self.client
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+
+
+def botocore_exceptions():
+    """
+    botocore.exceptions on first use, an except clause only evaluates it once something was raised
+    """
+    from botocore import exceptions
+    return exceptions
+
+
+def local_endpoint_url(service: str) -> Optional[str]:
+    """
+    LOCAL_ENDPOINT_URL sends every AWS call to a local stand-in such as moto_server,
+    LOCAL=true only points DynamoDB at DynamoDB Local on port 8000
+    """
+    if os.environ.get('LOCAL_ENDPOINT_URL'):
+        return os.environ['LOCAL_ENDPOINT_URL']
+    if service == 'dynamodb' and os.environ.get('LOCAL') == 'true':
+        return "http://localhost:8000"
+    return None
+
+
+def create_dynamodb(boto3):
+    return boto3.resource('dynamodb', endpoint_url=local_endpoint_url('dynamodb'))
+
+
+dynamodb = Lazy_client("dynamodb", create_dynamodb)
+sqs = Lazy_client("sqs", lambda boto3: boto3.client('sqs', endpoint_url=local_endpoint_url('sqs')))
 
 @dataclass
 class Blog_post:
     post_id: str
     title: str
     content: str
+    created_at: Optional[str] = None
+
+@dataclass
+class Blog_post_summary:
+    post_id: str
+    title: str
+    created_at: Optional[str] = None
+
+@dataclass
+class Posts_page:
+    posts: list
+    next_token: Optional[str] = None
+
+class Posts_cache:
+    """
+    Small TTL + LRU cache of serialized /get_posts responses
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+posts_cache = Posts_cache(POSTS_CACHE_TTL_SECONDS, POSTS_CACHE_MAX_ENTRIES)
 
-def create_post(title:str, content:str, post_id:str = None) -> Blog_post:
+def create_post(title:str, content:str, post_id:str = None, created_at:str = None) -> Blog_post:
     if not post_id:
         post_id = str(uuid.uuid4())
 
+    if not created_at:
+        # fixed width UTC timestamps sort the same as strings and as times
+        created_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
     try:
         title = str(title)
         title = title.strip()
@@ -66,13 +209,21 @@ def create_post(title:str, content:str, post_id:str = None) -> Blog_post:
     return Blog_post(
         post_id=post_id,
         title=title,
-        content=content
+        content=content,
+        created_at=created_at
     )
 
+def post_item(post: Blog_post) -> Dict[str, str]:
+    # every post shares the feed hash key so the created_at index can return them newest first
+    item = {key: value for key, value in asdict(post).items() if value is not None}
+    item["feed"] = POSTS_FEED
+    return item
+
 def put_row(new_row: Dict[str, str], ddb_tn: str) -> str:
     table = dynamodb.Table(ddb_tn)
     response = table.put_item(
-        Item=new_row
+        # DynamoDB rejects NULL values for index keys
+        Item={key: value for key, value in new_row.items() if value is not None}
     )
 
     if response['ResponseMetadata']['HTTPStatusCode'] != 200:
@@ -80,31 +231,179 @@ def put_row(new_row: Dict[str, str], ddb_tn: str) -> str:
 
     return True
 
-def fetch_posts(ddb_tn:str) -> list[Blog_post]:
-    # get all items from dynamodb
+def put_rows(new_rows: List[Dict[str, str]], ddb_tn: str) -> Dict[str, str]:
+    """
+    Write rows in 25 item batch_write_item calls, retrying UnprocessedItems with exponential backoff.
+    Returns the error for every post_id that could not be written.
+    """
+    failed = {}
+    for start in range(0, len(new_rows), BATCH_WRITE_SIZE):
+        requests = [
+            {"PutRequest": {"Item": {key: value for key, value in row.items() if value is not None}}}
+            for row in new_rows[start:start + BATCH_WRITE_SIZE]
+        ]
+
+        for attempt in range(BATCH_WRITE_MAX_RETRIES + 1):
+            try:
+                response = dynamodb.batch_write_item(RequestItems={ddb_tn: requests})
+            except botocore_exceptions().ClientError as e:
+                for request in requests:
+                    failed[request["PutRequest"]["Item"]["post_id"]] = e.response['Error']['Code']
+                requests = []
+                break
+
+            requests = response.get("UnprocessedItems", {}).get(ddb_tn, [])
+            if not requests or attempt == BATCH_WRITE_MAX_RETRIES:
+                break
+            # full jitter keeps retries from piling onto the same throttled partition
+            time.sleep(random.uniform(0, BATCH_WRITE_BASE_DELAY_SECONDS * 2 ** attempt))
+
+        for request in requests:
+            failed[request["PutRequest"]["Item"]["post_id"]] = "Unprocessed after retries"
+
+    return failed
+
+def backfill_posts_index(ddb_tn: str) -> int:
+    """
+    One-off migration for posts written before the created_at index, sets feed and created_at on every
+    item missing them so the index query returns them. Safe to run again, returns the number of posts updated.
+    """
+    table = dynamodb.Table(ddb_tn)
+    scan_kwargs = {
+        "ProjectionExpression": "#post_id",
+        "FilterExpression": "attribute_not_exists(#feed) OR attribute_not_exists(#created_at)",
+        "ExpressionAttributeNames": {"#post_id": "post_id", "#feed": "feed", "#created_at": "created_at"},
+    }
+
+    updated = 0
+    while True:
+        res_scan = table.scan(**scan_kwargs)
+        for item in res_scan['Items']:
+            try:
+                table.update_item(
+                    Key={"post_id": item["post_id"]},
+                    UpdateExpression="SET #feed = if_not_exists(#feed, :feed), #created_at = if_not_exists(#created_at, :created_at)",
+                    # a post deleted since the scan must not come back as a stub
+                    ConditionExpression="attribute_exists(#post_id)",
+                    ExpressionAttributeNames={"#post_id": "post_id", "#feed": "feed", "#created_at": "created_at"},
+                    ExpressionAttributeValues={":feed": POSTS_FEED, ":created_at": LEGACY_CREATED_AT},
+                )
+            except botocore_exceptions().ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                continue
+            updated += 1
+
+        if 'LastEvaluatedKey' not in res_scan:
+            return updated
+        scan_kwargs["ExclusiveStartKey"] = res_scan['LastEvaluatedKey']
+
+def encode_next_token(last_evaluated_key: Optional[Dict[str, Any]]) -> Optional[str]:
+    # opaque to the client, it only has to hand it back
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode("utf-8")).decode("ascii")
+
+def decode_next_token(next_token: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not next_token:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(next_token.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise ValueError("Invalid next_token.")
+    if not isinstance(key, dict):
+        raise ValueError("Invalid next_token.")
+    return key
+
+def model_keys(model) -> List[str]:
+    return [field.name for field in fields(model)]
+
+def required_model_keys(model) -> List[str]:
+    return [field.name for field in fields(model) if field.default is MISSING]
+
+def to_model(model, post: Dict[str, Any]):
+    if not all(key in post for key in required_model_keys(model)):
+        raise ValueError("Missing required keys in post")
+    key_filter_dict = {key: post[key] for key in model_keys(model) if key in post}
+    return model(**key_filter_dict)
+
+def fetch_posts_page(ddb_tn:str, limit:Optional[int] = DEFAULT_PAGE_SIZE, next_token:str = None, summary:bool = False) -> Posts_page:
+    """
+    Read one page of posts, summary pages leave the post content out of the read.
+    With the created_at index configured pages come back newest first.
+    A limit of None reads a full 1 MB page.
+    """
+    model = Blog_post_summary if summary else Blog_post
+    projected_keys = model_keys(model)
+
+    read_kwargs = {
+        "ProjectionExpression": ", ".join(f"#{key}" for key in projected_keys),
+        "ExpressionAttributeNames": {f"#{key}": key for key in projected_keys},
+    }
+    if limit is not None:
+        read_kwargs["Limit"] = max(1, min(limit, MAX_PAGE_SIZE))
+    exclusive_start_key = decode_next_token(next_token)
+    if exclusive_start_key:
+        read_kwargs["ExclusiveStartKey"] = exclusive_start_key
+
     try:
         table = dynamodb.Table(ddb_tn)
-        res_scan = table.scan()
-    except ClientError as e:
+        if posts_index_name:
+            read_kwargs["ExpressionAttributeNames"]["#feed"] = "feed"
+            res_scan = table.query(
+                IndexName=posts_index_name,
+                KeyConditionExpression="#feed = :feed",
+                ExpressionAttributeValues={":feed": POSTS_FEED},
+                ScanIndexForward=False,
+                **read_kwargs
+            )
+        else:
+            res_scan = table.scan(**read_kwargs)
+    except botocore_exceptions().ClientError as e:
         error_code = e.response['Error']['Code']
 
         if error_code == 'ResourceNotFoundException':
             raise Exception("Table not found")
+        # a next_token edited by the client decodes to a start key DynamoDB rejects
+        if error_code == 'ValidationException' and exclusive_start_key:
+            raise ValueError("Invalid next_token.")
+        raise
         
     # convert all items to blog post objects
     processed_posts = []
     for post in res_scan['Items']: 
         try:
-            required_keys = ['post_id', 'title', 'content']
-            if all(item in required_keys for item in post.keys()):
-                key_filter_dict = {key: post[key] for key in required_keys if key in post}
-                processed_posts.append(Blog_post(**post))
-            else:
-                raise ValueError("Missing required keys in post")
+            processed_posts.append(to_model(model, post))
         except Exception as e:
             logger.error(f"Error processing post: {e}. post -> {post}")
     
-    return processed_posts
+    return Posts_page(posts=processed_posts, next_token=encode_next_token(res_scan.get('LastEvaluatedKey')))
+
+def fetch_post(ddb_tn:str, post_id:str) -> Optional[Blog_post]:
+    """
+    Single post by id with one get_item
+    """
+    projected_keys = model_keys(Blog_post)
+    table = dynamodb.Table(ddb_tn)
+    res = table.get_item(
+        Key={"post_id": post_id},
+        ProjectionExpression=", ".join(f"#{key}" for key in projected_keys),
+        ExpressionAttributeNames={f"#{key}": key for key in projected_keys},
+    )
+    if "Item" not in res:
+        return None
+    return to_model(Blog_post, res["Item"])
+
+def fetch_posts(ddb_tn:str, summary:bool = False) -> list[Blog_post]:
+    # get all items from dynamodb in 1 MB pages, following the read past each page
+    processed_posts = []
+    next_token = None
+    while True:
+        page = fetch_posts_page(ddb_tn, None, next_token, summary)
+        processed_posts.extend(page.posts)
+        next_token = page.next_token
+        if not next_token:
+            return processed_posts
 
 @app.post("/add_post")
 @tracer.capture_method
@@ -119,56 +418,203 @@ def add_post() -> Dict[str, str]:
 
     new_post = create_post(new_title, new_content)
 
-    if put_row(asdict(new_post), ddb_table_name):
+    if put_row(post_item(new_post), ddb_table_name):
+        posts_cache.clear()
         return {"Message": "Row added to table."}
     else:
         return {"Error: Failed to add row."}
     
+@app.post("/add_posts")
+@tracer.capture_method
+def add_posts() -> Dict[str, Any]:
+    tracer.put_annotation(key="User", value='')
+    logger.info(f"Request for creating posts in bulk received.")
+
+    body = app.current_event.json_body or {}
+    new_posts = body.get('posts') if isinstance(body, dict) else None
+    if not isinstance(new_posts, list) or not new_posts:
+        raise BadRequestError("A non empty list of posts is required.")
+    if len(new_posts) > MAX_POSTS_PER_BATCH:
+        raise BadRequestError(f"At most {MAX_POSTS_PER_BATCH} posts per request.")
+
+    results = []
+    valid_posts = []
+    for index, raw_post in enumerate(new_posts):
+        try:
+            if not isinstance(raw_post, dict) or not raw_post.get('title') or not raw_post.get('content'):
+                raise ValueError("Title and content are required.")
+            new_post = create_post(raw_post['title'], raw_post['content'])
+        except Exception as e:
+            results.append({"index": index, "status": "invalid", "error": str(e)})
+            continue
+        valid_posts.append((index, new_post))
+
+    failed = put_rows([post_item(post) for _, post in valid_posts], ddb_table_name)
+    for index, post in valid_posts:
+        if post.post_id in failed:
+            results.append({"index": index, "status": "failed", "post_id": post.post_id, "error": failed[post.post_id]})
+        else:
+            results.append({"index": index, "status": "created", "post_id": post.post_id})
+
+    created = len(valid_posts) - len(failed)
+    if created:
+        posts_cache.clear()
+    logger.info(f"Created {created} of {len(new_posts)} posts.")
+
+    return {
+        "created": created,
+        "failed": len(new_posts) - created,
+        "results": sorted(results, key=lambda res: res["index"])
+    }
+
+def read_posts(params: Dict[str, str], summary: bool) -> Any:
+    # without paging parameters keep returning the plain list the website expects
+    if 'limit' not in params and 'next_token' not in params:
+        query_res = fetch_posts(ddb_table_name, summary)
+        logger.info(f"Data extracted from dynamodb")
+
+        # return rows extracted from response
+        extracted_rows = [asdict(post) for post in query_res]
+        logger.info(f"found {len(extracted_rows)} rows to display.")
+        return extracted_rows
+
+    try:
+        limit = int(params.get('limit', DEFAULT_PAGE_SIZE))
+        page = fetch_posts_page(ddb_table_name, limit, params.get('next_token'), summary)
+    except ValueError as e:
+        raise BadRequestError(str(e) or "Invalid limit.")
+
+    logger.info(f"found {len(page.posts)} rows for page.")
+    return {
+        "posts": [asdict(post) for post in page.posts],
+        "next_token": page.next_token
+    }
+
 @app.get("/get_posts")
 @tracer.capture_method
-def get_posts() -> list[Dict[str, str]]:
+def get_posts() -> Response:
     tracer.put_annotation(key="User", value='')
     logger.info(f"Request for table data received")
 
-    # scan dynamodb
-    query_res = fetch_posts(os.environ['DDB_TABLE_NAME'])
-    logger.info(f"Data extracted from dynamodb")
-    
-    # return rows extracted from response
-    extracted_rows = [asdict(post) for post in query_res]
-    logger.info(f"found {len(extracted_rows)} rows to display.")
-    
-    return extracted_rows
+    params = app.current_event.query_string_parameters or {}
+    summary = params.get('summary', '').lower() in ('1', 'true', 'yes')
+    cache_key = (summary, params.get('limit'), params.get('next_token'))
+
+    cached = posts_cache.get(cache_key)
+    if cached is None:
+        body = json.dumps(read_posts(params, summary))
+        cached = (body, '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"')
+        posts_cache.set(cache_key, cached)
+    else:
+        logger.info(f"Serving posts from cache")
+
+    body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": POSTS_CACHE_CONTROL}
+
+    # HTTP API lower cases header names
+    if (app.current_event.headers or {}).get("if-none-match") == etag:
+        return Response(status_code=304, content_type=None, body="", headers=headers)
+
+    return Response(status_code=200, content_type=content_types.APPLICATION_JSON, body=body, headers=headers)
+
+@app.get("/posts/<post_id>")
+@tracer.capture_method
+def get_post(post_id: str) -> Dict[str, str]:
+    tracer.put_annotation(key="User", value='')
+    logger.info(f"Request for post {post_id} received")
+
+    post = fetch_post(ddb_table_name, post_id)
+    if post is None:
+        raise NotFoundError(f"Post {post_id} not found.")
+
+    return asdict(post)
+
+def message_dedup_key(message: Dict[str, Optional[str]]) -> str:
+    """
+    Same sender, subject and text hash to the same key so double submits are only delivered once
+    """
+    payload = json.dumps(message, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 
 @app.post("/send_message")
 @tracer.capture_method
-def send_message() -> Dict[str, str]:
+def send_message() -> Response:
     tracer.put_annotation(key="User", value='')
-    logger.info(f"Sending message to sns for delivery")
+    logger.info(f"Queueing message for delivery")
 
-    print(app.current_event.json_body)
+    body = app.current_event.json_body
+    if not isinstance(body, dict) or not body.get('message'):
+        raise BadRequestError("A message is required.")
+
+    message = {
+        "name": body.get('yourName', None),
+        "subject": body.get('subject', None),
+        "message": body.get('message', None),
+    }
+    dedup_key = message_dedup_key(message)
 
     try:
-        message = {
-            "name": app.current_event.json_body.get('yourName', None),
-            "subject": app.current_event.json_body.get('subject', None),
-            "message": app.current_event.json_body.get('message', None),
-        }
-
-        response = sns.publish(
-            TopicArn=user_message_sns_arn,
-            Message=json.dumps(message),  # Convert dict to JSON string
-            Subject=f"New user message from {app.current_event.json_body.get('yourName', None)}"
+        sqs.send_message(
+            QueueUrl=user_message_queue_url,
+            MessageBody=json.dumps({**message, "dedup_key": dedup_key}),
         )
-    
-        return {"message": "Message sent successfully"}
-    except Exception as e:
-        return {"message": str(e)}
+    except (botocore_exceptions().ClientError, botocore_exceptions().BotoCoreError) as e:
+        # endpoint and connection failures are as retryable for the caller as a throttled queue
+        logger.exception("Could not queue message")
+        return Response(
+            status_code=503,
+            content_type=content_types.APPLICATION_JSON,
+            body=json.dumps({"message": "Message could not be sent, please try again later."}),
+        )
+
+    return Response(
+        status_code=202,
+        content_type=content_types.APPLICATION_JSON,
+        body=json.dumps({"message": "Message sent successfully", "dedup_key": dedup_key}),
+    )
+
+def get_cold_start_report() -> Dict[str, Any]:
+    """
+    Import and init durations of this container plus the time spent building each AWS client so far
+    """
+    return {
+        "imports_ms": cold_start_report["imports_ms"],
+        "init_ms": cold_start_report["init_ms"],
+        "clients_ms": dict(cold_start_report["clients_ms"]),
+    }
+
+
+def log_cold_start(context: LambdaContext) -> None:
+    """
+    Log the cold start report once per container, tagged with the function version so init time can be tracked per deploy
+    """
+    global _cold_start_logged
+    if _cold_start_logged:
+        return
+    _cold_start_logged = True
+    logger.info("Cold start report", extra={
+        "cold_start_report": get_cold_start_report(),
+        "function_version": getattr(context, "function_version", None),
+    })
+
+
+cold_start_report["init_ms"] = round((time.perf_counter() - _init_started) * 1000, 2)
+
 
 @logger.inject_lambda_context(correlation_id_path=correlation_paths.API_GATEWAY_REST, log_event=True)
 @tracer.capture_lambda_handler
 def lambda_handler(event: dict, context: LambdaContext):
+    log_cold_start(context)
     logger.info(event)
+
+    # direct invoke only, API Gateway events never carry this key
+    if event.get("backfill_posts_index"):
+        updated = backfill_posts_index(ddb_table_name)
+        posts_cache.clear()
+        logger.info(f"Backfilled feed and created_at on {updated} posts.")
+        return {"updated": updated}
+
     res = app.resolve(event, context)
 
     return res
@@ -1,9 +1,18 @@
 import pytest
 from typing import Any, Dict
-import lambda_tdd_v2
 import os
 import json
 import boto3
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+# the module reads its configuration at import time, default to the local DynamoDB setup
+os.environ.setdefault("DDB_TABLE_NAME", "blogPostsTable")
+os.environ.setdefault("STATIC_SITE_URL", "http://localhost")
+os.environ.setdefault("USER_MESSAGE_QUEUE_URL", "http://localhost:9324/000000000000/user-messages")
+os.environ.setdefault("LOCAL", "true")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import lambda_function
 from dataclasses import dataclass, asdict
 from aws_lambda_powertools import Logger
 from aws_lambda_powertools.utilities.typing import LambdaContext as LambdaContextData
@@ -104,7 +113,7 @@ def set_up_local_env():
 
 @pytest.fixture
 def post_object():
-    return lambda_tdd_v2.Blog_post("333333", "test_title", "test_content")
+    return lambda_function.Blog_post("333333", "test_title", "test_content")
 
 @pytest.fixture
 def api_gateway_event_add_post():
@@ -192,19 +201,19 @@ def api_gateway_event_get_posts():
 
 # UNIT TESTS
 def test_create_post_input():
-    create_post_res = lambda_tdd_v2.create_post("test_title", "test_content") 
+    create_post_res = lambda_function.create_post("test_title", "test_content") 
     assert create_post_res.title == "test_title"
     assert create_post_res.content == "test_content"
     assert create_post_res.post_id is not None
     isinstance(create_post_res.post_id, str)
-    assert isinstance(create_post_res, lambda_tdd_v2.Blog_post)
+    assert isinstance(create_post_res, lambda_function.Blog_post)
 
 def test_create_post_error():
     with pytest.raises(Exception, match="Content issue."):
-        lambda_tdd_v2.create_post("test_title", "")
+        lambda_function.create_post("test_title", "")
 
     with pytest.raises(Exception, match="Title issue."):
-        lambda_tdd_v2.create_post("", "test_content")
+        lambda_function.create_post("", "test_content")
 
 def test_create_post_length():
     # the title and posts should have a limited amount of characters in the end resulting objects
@@ -212,36 +221,36 @@ def test_create_post_length():
     # the length of the content should be 2000 characters
     long_string = "a" * 3500
 
-    create_post_res_1 = lambda_tdd_v2.create_post("test_title", long_string)
+    create_post_res_1 = lambda_function.create_post("test_title", long_string)
     assert len(create_post_res_1.content) == 2000
 
-    create_post_res_2 = lambda_tdd_v2.create_post(long_string, "test_content")
+    create_post_res_2 = lambda_function.create_post(long_string, "test_content")
     assert len(create_post_res_2.title) == 100
 
 # INTEGRATION TESTS
 def test_put_row(set_up_local_env, post_object):
     set_up_local_env
 
-    assert lambda_tdd_v2.put_row(asdict(post_object), os.environ["DDB_TABLE_NAME"])
+    assert lambda_function.put_row(asdict(post_object), os.environ["DDB_TABLE_NAME"])
     
 def test_fetch_posts(set_up_local_env, post_object):
     set_up_local_env
 
-    res_posts = lambda_tdd_v2.fetch_posts(os.environ['DDB_TABLE_NAME'])
+    res_posts = lambda_function.fetch_posts(os.environ['DDB_TABLE_NAME'])
     isinstance(res_posts, list)
     for i in res_posts:
-        assert isinstance(i, lambda_tdd_v2.Blog_post)
+        assert isinstance(i, lambda_function.Blog_post)
 
 def test_fetch_posts(set_up_local_env, post_object):
     set_up_local_env
 
-    res_posts = lambda_tdd_v2.fetch_posts(os.environ['DDB_TABLE_NAME'])
+    res_posts = lambda_function.fetch_posts(os.environ['DDB_TABLE_NAME'])
     isinstance(res_posts, list)
     for i in res_posts:
-        assert isinstance(i, lambda_tdd_v2.Blog_post)
+        assert isinstance(i, lambda_function.Blog_post)
 
 def test_add_post(api_gateway_event_get_posts, mock_context):
-    res_get_posts = lambda_tdd_v2.lambda_handler(api_gateway_event_get_posts, mock_context)['body']
+    res_get_posts = lambda_function.lambda_handler(api_gateway_event_get_posts, mock_context)['body']
     assert isinstance(res_get_posts, str)
     body = json.loads(res_get_posts)
     assert isinstance(body, list)
@@ -249,4 +258,414 @@ def test_add_post(api_gateway_event_get_posts, mock_context):
         assert isinstance(i, dict)
         assert "post_id" in i
         assert "title" in i
-        assert "content" in i
\ No newline at end of file
+        assert "content" in i
+
+
+def test_next_token_round_trip():
+    key = {"post_id": "2"}
+    token = lambda_function.encode_next_token(key)
+    assert isinstance(token, str)
+    assert lambda_function.decode_next_token(token) == key
+    assert lambda_function.encode_next_token(None) is None
+
+    with pytest.raises(ValueError, match="Invalid next_token."):
+        lambda_function.decode_next_token("not-a-token")
+
+def test_fetch_posts_page(set_up_local_env):
+    set_up_local_env
+
+    seen = []
+    next_token = None
+    while True:
+        page = lambda_function.fetch_posts_page(os.environ['DDB_TABLE_NAME'], limit=2, next_token=next_token)
+        assert len(page.posts) <= 2
+        seen.extend(post.post_id for post in page.posts)
+        next_token = page.next_token
+        if not next_token:
+            break
+
+    assert len(seen) == len(set(seen))
+    assert {'1', '2', '3'} <= set(seen)
+
+def test_fetch_posts_page_summary(set_up_local_env):
+    set_up_local_env
+
+    page = lambda_function.fetch_posts_page(os.environ['DDB_TABLE_NAME'], limit=5, summary=True)
+    for post in page.posts:
+        assert isinstance(post, lambda_function.Blog_post_summary)
+
+def test_get_posts_paginated(set_up_local_env, api_gateway_event_get_posts, mock_context):
+    api_gateway_event_get_posts["queryStringParameters"] = {"limit": "2", "summary": "true"}
+    res = lambda_function.lambda_handler(api_gateway_event_get_posts, mock_context)
+
+    body = json.loads(res['body'])
+    assert len(body["posts"]) == 2
+    assert body["next_token"]
+    for post in body["posts"]:
+        assert "content" not in post
+
+def test_get_posts_invalid_token(api_gateway_event_get_posts, mock_context):
+    api_gateway_event_get_posts["queryStringParameters"] = {"next_token": "not-a-token"}
+    res = lambda_function.lambda_handler(api_gateway_event_get_posts, mock_context)
+
+    assert res['statusCode'] == 400
+
+class FakeScanTable:
+    def __init__(self, pages=None, error=None):
+        self.pages = pages or [{"Items": []}]
+        self.error = error
+        self.calls = []
+
+    def scan(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.error:
+            raise self.error
+        return self.pages[len(self.calls) - 1]
+
+class FakeTableDynamodb:
+    def __init__(self, table):
+        self.table = table
+
+    def Table(self, name):
+        return self.table
+
+def test_fetch_posts_reads_full_pages(monkeypatch):
+    table = FakeScanTable(pages=[
+        {"Items": [{"post_id": "1", "title": "t", "content": "c"}], "LastEvaluatedKey": {"post_id": "1"}},
+        {"Items": [{"post_id": "2", "title": "t", "content": "c"}]},
+    ])
+    monkeypatch.setattr(lambda_function, "dynamodb", FakeTableDynamodb(table))
+    monkeypatch.setattr(lambda_function, "posts_index_name", "")
+
+    posts = lambda_function.fetch_posts("posts")
+
+    assert [post.post_id for post in posts] == ["1", "2"]
+    assert all("Limit" not in call for call in table.calls)
+    assert table.calls[1]["ExclusiveStartKey"] == {"post_id": "1"}
+
+def test_get_posts_tampered_token(monkeypatch, api_gateway_event_get_posts, mock_context):
+    error = ClientError({"Error": {"Code": "ValidationException", "Message": "The provided starting key is invalid"}}, "Scan")
+    monkeypatch.setattr(lambda_function, "dynamodb", FakeTableDynamodb(FakeScanTable(error=error)))
+    monkeypatch.setattr(lambda_function, "posts_index_name", "")
+    lambda_function.posts_cache.clear()
+
+    api_gateway_event_get_posts["queryStringParameters"] = {"next_token": lambda_function.encode_next_token({"post_id": {"nested": 1}})}
+    res = lambda_function.lambda_handler(api_gateway_event_get_posts, mock_context)
+
+    assert res['statusCode'] == 400
+
+@pytest.fixture
+def counted_fetch_posts(monkeypatch):
+    lambda_function.posts_cache.clear()
+    calls = []
+
+    def fake_fetch_posts(ddb_tn, summary=False):
+        calls.append(summary)
+        return [lambda_function.Blog_post("1", "First Post", "This is the first post")]
+
+    monkeypatch.setattr(lambda_function, "fetch_posts", fake_fetch_posts)
+    yield calls
+    lambda_function.posts_cache.clear()
+
+def test_get_posts_cached(counted_fetch_posts, api_gateway_event_get_posts, mock_context):
+    first = lambda_function.lambda_handler(api_gateway_event_get_posts, mock_context)
+    second = lambda_function.lambda_handler(api_gateway_event_get_posts, mock_context)
+
+    assert counted_fetch_posts == [False]
+    assert first['body'] == second['body']
+    assert first['headers']['ETag'] == second['headers']['ETag']
+    assert first['headers']['Cache-Control'] == "no-cache"
+
+def test_get_posts_not_modified(counted_fetch_posts, api_gateway_event_get_posts, mock_context):
+    etag = lambda_function.lambda_handler(api_gateway_event_get_posts, mock_context)['headers']['ETag']
+
+    api_gateway_event_get_posts["headers"]["if-none-match"] = etag
+    res = lambda_function.lambda_handler(api_gateway_event_get_posts, mock_context)
+
+    assert res['statusCode'] == 304
+    assert not res['body']
+
+def test_add_post_invalidates_cache(counted_fetch_posts, monkeypatch, api_gateway_event_get_posts, api_gateway_event_add_post, mock_context):
+    monkeypatch.setattr(lambda_function, "put_row", lambda new_row, ddb_tn: True)
+
+    lambda_function.lambda_handler(api_gateway_event_get_posts, mock_context)
+    lambda_function.lambda_handler(api_gateway_event_add_post, mock_context)
+    lambda_function.lambda_handler(api_gateway_event_get_posts, mock_context)
+
+    assert counted_fetch_posts == [False, False]
+
+def test_posts_cache_bounds(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(lambda_function.time, "monotonic", lambda: now[0])
+
+    cache = lambda_function.Posts_cache(ttl_seconds=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+    now[0] += 59
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.get("c") is None
+
+@pytest.fixture
+def indexed_table(monkeypatch):
+    # same layout as StaticSiteBlogPostsTable with its PostsByCreatedAt index
+    table_name = 'blogPostsIndexedTable'
+    dynamodb = boto3.resource('dynamodb', endpoint_url="http://localhost:8000")
+    try:
+        dynamodb.Table(table_name).delete()
+    except Exception as e:
+        print(e)
+    dynamodb.create_table(
+        TableName=table_name,
+        KeySchema=[{'AttributeName': 'post_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[
+            {'AttributeName': 'post_id', 'AttributeType': 'S'},
+            {'AttributeName': 'feed', 'AttributeType': 'S'},
+            {'AttributeName': 'created_at', 'AttributeType': 'S'},
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': 'PostsByCreatedAt',
+            'KeySchema': [
+                {'AttributeName': 'feed', 'KeyType': 'HASH'},
+                {'AttributeName': 'created_at', 'KeyType': 'RANGE'},
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    monkeypatch.setattr(lambda_function, "posts_index_name", "PostsByCreatedAt")
+    return table_name
+
+def test_create_post_created_at():
+    post = lambda_function.create_post("test_title", "test_content")
+    assert post.created_at.endswith("Z")
+    assert lambda_function.post_item(post)["feed"] == lambda_function.POSTS_FEED
+
+def test_fetch_posts_page_newest_first(indexed_table):
+    for day in range(1, 6):
+        post = lambda_function.create_post(f"post {day}", "content", created_at=f"2025-08-0{day}T00:00:00.000000Z")
+        lambda_function.put_row(lambda_function.post_item(post), indexed_table)
+
+    first = lambda_function.fetch_posts_page(indexed_table, limit=2)
+    second = lambda_function.fetch_posts_page(indexed_table, limit=2, next_token=first.next_token)
+
+    assert [post.title for post in first.posts + second.posts] == ["post 5", "post 4", "post 3", "post 2"]
+
+def test_get_post_by_id(indexed_table, monkeypatch, api_gateway_event_get_posts, mock_context):
+    post = lambda_function.create_post("single", "content")
+    lambda_function.put_row(lambda_function.post_item(post), indexed_table)
+    monkeypatch.setattr(lambda_function, "ddb_table_name", indexed_table)
+
+    api_gateway_event_get_posts["rawPath"] = f"/posts/{post.post_id}"
+    api_gateway_event_get_posts["requestContext"]["http"]["path"] = f"/posts/{post.post_id}"
+    res = lambda_function.lambda_handler(api_gateway_event_get_posts, mock_context)
+    assert res['statusCode'] == 200
+    assert json.loads(res['body']) == asdict(post)
+
+    api_gateway_event_get_posts["rawPath"] = "/posts/missing"
+    api_gateway_event_get_posts["requestContext"]["http"]["path"] = "/posts/missing"
+    res = lambda_function.lambda_handler(api_gateway_event_get_posts, mock_context)
+    assert res['statusCode'] == 404
+
+def test_backfill_posts_index(monkeypatch, mock_context):
+    class FakeTable:
+        def __init__(self):
+            self.updated = []
+
+        def scan(self, **kwargs):
+            if "ExclusiveStartKey" not in kwargs:
+                return {"Items": [{"post_id": "old"}], "LastEvaluatedKey": {"post_id": "old"}}
+            return {"Items": [{"post_id": "deleted"}]}
+
+        def update_item(self, Key, **kwargs):
+            if Key["post_id"] == "deleted":
+                raise ClientError({"Error": {"Code": "ConditionalCheckFailedException", "Message": ""}}, "UpdateItem")
+            assert kwargs["ExpressionAttributeValues"] == {":feed": lambda_function.POSTS_FEED, ":created_at": lambda_function.LEGACY_CREATED_AT}
+            self.updated.append(Key["post_id"])
+
+    class FakeDynamodb:
+        def __init__(self):
+            self.table = FakeTable()
+
+        def Table(self, name):
+            return self.table
+
+    fake = FakeDynamodb()
+    monkeypatch.setattr(lambda_function, "dynamodb", fake)
+
+    res = lambda_function.lambda_handler({"backfill_posts_index": True}, mock_context)
+
+    assert res == {"updated": 1}
+    assert fake.table.updated == ["old"]
+
+def test_put_rows_batches(set_up_local_env):
+    set_up_local_env
+
+    posts = [lambda_function.create_post(f"bulk {i}", "bulk content") for i in range(60)]
+    failed = lambda_function.put_rows([lambda_function.post_item(post) for post in posts], os.environ['DDB_TABLE_NAME'])
+
+    assert failed == {}
+    stored = {post.post_id for post in lambda_function.fetch_posts(os.environ['DDB_TABLE_NAME'])}
+    assert {post.post_id for post in posts} <= stored
+
+def test_put_rows_retries_unprocessed(monkeypatch):
+    class FakeDynamodb:
+        def __init__(self):
+            self.calls = []
+
+        def batch_write_item(self, RequestItems):
+            requests = RequestItems["posts"]
+            self.calls.append(len(requests))
+            # throttle the last item of the first attempt only
+            if len(self.calls) == 1:
+                return {"UnprocessedItems": {"posts": requests[-1:]}}
+            return {"UnprocessedItems": {}}
+
+    fake = FakeDynamodb()
+    monkeypatch.setattr(lambda_function, "dynamodb", fake)
+    monkeypatch.setattr(lambda_function.time, "sleep", lambda seconds: None)
+
+    rows = [{"post_id": str(i), "title": "t", "content": "c"} for i in range(30)]
+    assert lambda_function.put_rows(rows, "posts") == {}
+    assert fake.calls == [25, 1, 5]
+
+def test_put_rows_gives_up(monkeypatch):
+    class ThrottledDynamodb:
+        def batch_write_item(self, RequestItems):
+            return {"UnprocessedItems": RequestItems}
+
+    monkeypatch.setattr(lambda_function, "dynamodb", ThrottledDynamodb())
+    monkeypatch.setattr(lambda_function.time, "sleep", lambda seconds: None)
+
+    assert lambda_function.put_rows([{"post_id": "1", "title": "t", "content": "c"}], "posts") == {"1": "Unprocessed after retries"}
+
+def test_add_posts(monkeypatch, api_gateway_event_add_post, mock_context):
+    written = []
+
+    def fake_put_rows(new_rows, ddb_tn):
+        written.extend(new_rows)
+        return {}
+
+    monkeypatch.setattr(lambda_function, "put_rows", fake_put_rows)
+    api_gateway_event_add_post["rawPath"] = "/add_posts"
+    api_gateway_event_add_post["requestContext"]["http"]["path"] = "/add_posts"
+    api_gateway_event_add_post["body"] = json.dumps({"posts": [
+        {"title": "One", "content": "First"},
+        {"title": "", "content": "Missing title"},
+        {"title": "Three", "content": "Third"},
+    ]})
+
+    body = json.loads(lambda_function.lambda_handler(api_gateway_event_add_post, mock_context)['body'])
+
+    assert body["created"] == 2
+    assert body["failed"] == 1
+    assert [res["status"] for res in body["results"]] == ["created", "invalid", "created"]
+    assert [row["title"] for row in written] == ["One", "Three"]
+
+
+def test_lazy_client_built_once(monkeypatch):
+    built = []
+
+    def factory(boto3):
+        built.append(boto3)
+        return boto3.client("sns")
+
+    client = lambda_function.Lazy_client("test-sns", factory)
+    assert not client.loaded
+
+    assert client.meta.service_model.service_name == "sns"
+    assert client.get() is client.get()
+    assert len(built) == 1
+    assert "test-sns" in lambda_function.get_cold_start_report()["clients_ms"]
+
+
+def test_local_endpoint_url(monkeypatch):
+    monkeypatch.delenv("LOCAL_ENDPOINT_URL", raising=False)
+    monkeypatch.setenv("LOCAL", "true")
+    assert lambda_function.local_endpoint_url("dynamodb") == "http://localhost:8000"
+    assert lambda_function.local_endpoint_url("sqs") is None
+
+    monkeypatch.setenv("LOCAL_ENDPOINT_URL", "http://127.0.0.1:5000")
+    assert lambda_function.local_endpoint_url("dynamodb") == "http://127.0.0.1:5000"
+    assert lambda_function.local_endpoint_url("sqs") == "http://127.0.0.1:5000"
+
+    monkeypatch.delenv("LOCAL_ENDPOINT_URL")
+    monkeypatch.setenv("LOCAL", "false")
+    assert lambda_function.local_endpoint_url("dynamodb") is None
+
+
+def test_cold_start_report_logged_once(monkeypatch, mock_context):
+    logged = []
+    monkeypatch.setattr(lambda_function, "_cold_start_logged", False)
+    monkeypatch.setattr(lambda_function.logger, "info", lambda *args, **kwargs: logged.append((args, kwargs)))
+
+    lambda_function.log_cold_start(mock_context)
+    lambda_function.log_cold_start(mock_context)
+
+    assert len(logged) == 1
+    report = logged[0][1]["extra"]["cold_start_report"]
+    assert report["imports_ms"] >= 0
+    assert report["init_ms"] >= report["imports_ms"]
+    assert logged[0][1]["extra"]["function_version"] == "$LATEST"
+
+
+class FakeSqs:
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    def send_message(self, **kwargs):
+        if self.error:
+            raise self.error
+        self.sent.append(kwargs)
+        return {"MessageId": "1"}
+
+
+@pytest.fixture
+def api_gateway_event_send_message(api_gateway_event_add_post):
+    api_gateway_event_add_post["rawPath"] = "/send_message"
+    api_gateway_event_add_post["requestContext"]["http"]["path"] = "/send_message"
+    api_gateway_event_add_post["body"] = json.dumps({"yourName": "Ted", "subject": "Hi", "message": "Hello"})
+    return api_gateway_event_add_post
+
+
+def test_send_message_enqueues(monkeypatch, api_gateway_event_send_message, mock_context):
+    sqs = FakeSqs()
+    monkeypatch.setattr(lambda_function, "sqs", sqs)
+
+    res = lambda_function.lambda_handler(api_gateway_event_send_message, mock_context)
+
+    assert res["statusCode"] == 202
+    assert json.loads(res["body"])["message"] == "Message sent successfully"
+    queued = json.loads(sqs.sent[0]["MessageBody"])
+    assert queued["message"] == "Hello"
+    assert queued["dedup_key"] == lambda_function.message_dedup_key({"name": "Ted", "subject": "Hi", "message": "Hello"})
+
+
+@pytest.mark.parametrize("error", [
+    ClientError({"Error": {"Code": "ServiceUnavailable", "Message": "down"}}, "SendMessage"),
+    EndpointConnectionError(endpoint_url="https://sqs.us-east-1.amazonaws.com"),
+])
+def test_send_message_queue_error(error, monkeypatch, api_gateway_event_send_message, mock_context):
+    monkeypatch.setattr(lambda_function, "sqs", FakeSqs(error))
+
+    res = lambda_function.lambda_handler(api_gateway_event_send_message, mock_context)
+
+    assert res["statusCode"] == 503
+
+
+def test_send_message_requires_message(monkeypatch, api_gateway_event_send_message, mock_context):
+    monkeypatch.setattr(lambda_function, "sqs", FakeSqs())
+    api_gateway_event_send_message["body"] = json.dumps({"yourName": "Ted"})
+
+    res = lambda_function.lambda_handler(api_gateway_event_send_message, mock_context)
+
+    assert res["statusCode"] == 400
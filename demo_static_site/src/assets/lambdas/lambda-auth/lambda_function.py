@@ -1,74 +1,226 @@
-from typing import Any, Dict
-# from aws_lambda_powertools.utilities.typing import LambdaContext
-
-
-def lambda_handler(event: dict[str:Any], context):
-    print(event)
-    print(context)
-
-    # if event['identitySource'] != ['Bearer 88888']:
-    #     return {
-    #     "isAuthorized": False,
-    #     "context": {
-    #         "exampleKey": "exampleValue"
-    #       }
-    #     }
-    return {
-    "isAuthorized": True,
-    "context": {
-        "exampleKey": "exampleValue"
-      }
-    }
+import os
+import sys
+import json
+import time
+import hmac
+import base64
+import hashlib
+import logging
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# keys are either inlined as {"kid": "secret"} JSON for local runs or read from a Secrets Manager secret
+auth_keys = os.environ.get("AUTH_KEYS", "")
+auth_keys_secret_arn = os.environ.get("AUTH_KEYS_SECRET_ARN", "")
+KEY_CACHE_TTL_SECONDS = int(os.environ.get("KEY_CACHE_TTL_SECONDS", "300"))
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get("RESULT_CACHE_TTL_SECONDS", "300"))
+RESULT_CACHE_MAX_ENTRIES = 1024
+TOKEN_ISSUER = os.environ.get("TOKEN_ISSUER", "")
+# tokens may be used this long after exp / before nbf to absorb clock skew
+CLOCK_SKEW_SECONDS = 30
+SUPPORTED_ALGORITHMS = {"HS256": hashlib.sha256}
+
+
+class Token_error(Exception):
+    pass
+
+
+class Key_set:
+    """
+    Signing keys by kid, loaded once and reloaded after the TTL so rotated secrets are picked up
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.keys: Dict[str, bytes] = {}
+        self.loaded_at: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def load(self) -> Dict[str, bytes]:
+        if auth_keys:
+            raw = auth_keys
+        elif auth_keys_secret_arn:
+            import boto3
+
+            # LOCAL_ENDPOINT_URL reads the secret from a local stand-in such as moto_server
+            client = boto3.client("secretsmanager", endpoint_url=os.environ.get("LOCAL_ENDPOINT_URL") or None)
+            raw = client.get_secret_value(SecretId=auth_keys_secret_arn)["SecretString"]
+        else:
+            raise Token_error("No signing keys configured.")
+        return {kid: secret.encode("utf-8") for kid, secret in json.loads(raw).items()}
+
+    def get(self, kid: str) -> Optional[bytes]:
+        with self.lock:
+            if self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl_seconds:
+                self.keys = self.load()
+                self.loaded_at = time.monotonic()
+            return self.keys.get(kid)
+
+
+class Result_cache:
+    """
+    Recent verification results by token hash, entries never outlive the token itself
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, result = entry
+            if time.time() >= expires_at:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return result
+
+    def set(self, key: str, result: Dict[str, Any], token_expires_at: Optional[float]) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self.lock:
+            self.entries[key] = (expires_at, result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+key_set = Key_set(KEY_CACHE_TTL_SECONDS)
+result_cache = Result_cache(RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_MAX_ENTRIES)
+
+
+def b64url_decode(segment: str) -> bytes:
+    try:
+        return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+    except (ValueError, TypeError):
+        raise Token_error("Malformed token.")
 
-if __name__ == "__main__":
 
-    lambda_handler({
-      "version": "2.0",
-      "type": "REQUEST",
-      "routeArn": "arn:aws:execute-api:us-east-1:123456789012:abcdef123/test/GET/request",
-      "identitySource": ["user1", "123"],
-      "routeKey": "$default",
-      "rawPath": "/my/path",
-      "rawQueryString": "parameter1=value1&parameter1=value2&parameter2=value",
-      "cookies": ["cookie1", "cookie2"],
-      "headers": {
-        "header1": "value1",
-        "header2": "value2"
-      },
-      "queryStringParameters": {
-        "parameter1": "value1,value2",
-        "parameter2": "value"
-      },
-      "requestContext": {
-        "accountId": "123456789012",
-        "apiId": "api-id",
-        "authentication": {
-          "clientCert": {
-            "clientCertPem": "CERT_CONTENT",
-            "subjectDN": "www.example.com",
-            "issuerDN": "Example issuer",
-            "serialNumber": "1",
-            "validity": {
-              "notBefore": "May 28 12:30:02 2019 GMT",
-              "notAfter": "Aug  5 09:36:04 2021 GMT"
-            }
-          }
-        },
-        "domainName": "id.execute-api.us-east-1.amazonaws.com",
-        "domainPrefix": "id",
-        "http": {
-          "method": "POST",
-          "path": "/my/path",
-          "protocol": "HTTP/1.1",
-          "sourceIp": "IP",
-          "userAgent": "agent"
-        },
-        "requestId": "id",
-        "routeKey": "$default",
-        "stage": "$default",
-        "time": "12/Mar/2020:19:03:58 +0000",
-        "timeEpoch": 1583348638390
-      },
-      "pathParameters": { "parameter1": "value1" },
-      "stageVariables": { "stageVariable1": "value1", "stageVariable2": "value2" }
-    }, {})
\ No newline at end of file
+def b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def sign_token(claims: Dict[str, Any], kid: str, secret: bytes) -> str:
+    """
+    HS256 JWT for the given claims, used to mint tokens for the site admin and in tests
+    """
+    header = {"alg": "HS256", "typ": "JWT", "kid": kid}
+    signing_input = ".".join(
+        b64url_encode(json.dumps(part, separators=(",", ":")).encode("utf-8")) for part in (header, claims)
+    )
+    signature = hmac.new(secret, signing_input.encode("ascii"), hashlib.sha256).digest()
+    return f"{signing_input}.{b64url_encode(signature)}"
+
+
+def numeric_claim(claims: Dict[str, Any], name: str) -> Optional[float]:
+    if name not in claims:
+        return None
+    try:
+        value = float(claims[name])
+    except (TypeError, ValueError):
+        raise Token_error(f"Malformed {name} claim.")
+    if not math.isfinite(value):
+        raise Token_error(f"Malformed {name} claim.")
+    return value
+
+
+def verify_token(token: str, now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Claims of a valid HS256 JWT signed with one of the configured keys, raises Token_error otherwise
+    """
+    now = time.time() if now is None else now
+    if not token.isascii():
+        raise Token_error("Malformed token.")
+    try:
+        header_segment, claims_segment, signature_segment = token.split(".")
+        header = json.loads(b64url_decode(header_segment))
+        claims = json.loads(b64url_decode(claims_segment))
+    except ValueError:
+        raise Token_error("Malformed token.")
+    if not isinstance(header, dict) or not isinstance(claims, dict):
+        raise Token_error("Malformed token.")
+
+    digest = SUPPORTED_ALGORITHMS.get(header.get("alg"))
+    if digest is None:
+        raise Token_error("Unsupported token algorithm.")
+    secret = key_set.get(str(header.get("kid", "")))
+    if secret is None:
+        raise Token_error("Unknown signing key.")
+
+    expected = hmac.new(secret, f"{header_segment}.{claims_segment}".encode("ascii"), digest).digest()
+    if not hmac.compare_digest(expected, b64url_decode(signature_segment)):
+        raise Token_error("Invalid token signature.")
+
+    # a token without exp would never expire, and neither would its cached result
+    expires_at = numeric_claim(claims, "exp")
+    if expires_at is None:
+        raise Token_error("Token has no expiry.")
+    not_before = numeric_claim(claims, "nbf")
+    if now > expires_at + CLOCK_SKEW_SECONDS:
+        raise Token_error("Token expired.")
+    if not_before is not None and now < not_before - CLOCK_SKEW_SECONDS:
+        raise Token_error("Token not yet valid.")
+    # compare_digest only takes ASCII str, a crafted non-ASCII iss must be a deny and not a TypeError
+    if TOKEN_ISSUER and not hmac.compare_digest(str(claims.get("iss", "")).encode("utf-8"), TOKEN_ISSUER.encode("utf-8")):
+        raise Token_error("Unexpected token issuer.")
+    return claims
+
+
+def bearer_token(event: dict) -> Optional[str]:
+    identity = (event.get("identitySource") or [None])[0]
+    if not identity:
+        identity = (event.get("headers") or {}).get("authorization")
+    if not identity or not identity.startswith("Bearer "):
+        return None
+    return identity[len("Bearer "):].strip()
+
+
+def authorize(token: str) -> Dict[str, Any]:
+    """
+    Simple authorizer response for the token, cached so repeat tokens skip signature checks
+    """
+    cache_key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    token_expires_at = None
+    try:
+        claims = verify_token(token)
+        token_expires_at = numeric_claim(claims, "exp")
+        result = {"isAuthorized": True, "context": {"sub": str(claims.get("sub", ""))}}
+    except Token_error as e:
+        logger.info("Rejected token: %s", e)
+        result = {"isAuthorized": False, "context": {}}
+
+    result_cache.set(cache_key, result, token_expires_at)
+    return result
+
+
+def lambda_handler(event: dict, context):
+    token = bearer_token(event)
+    if not token:
+        return {"isAuthorized": False, "context": {}}
+    return authorize(token)
+
+
+if __name__ == "__main__":
+    # mint a token from the configured keys: python lambda_function.py <kid> <subject> [lifetime seconds]
+    kid, subject = sys.argv[1], sys.argv[2]
+    lifetime = int(sys.argv[3]) if len(sys.argv) > 3 else 3600
+    issued_at = int(time.time())
+    claims = {"sub": subject, "iat": issued_at, "exp": issued_at + lifetime}
+    if TOKEN_ISSUER:
+        claims["iss"] = TOKEN_ISSUER
+    print(sign_token(claims, kid, key_set.get(kid)))
@@ -0,0 +1,87 @@
+import importlib.util
+import os
+import time
+
+import pytest
+
+# lambda-api also ships a lambda_function module, load this one under its own name
+spec = importlib.util.spec_from_file_location(
+    "auth_lambda", os.path.join(os.path.dirname(__file__), "lambda_function.py")
+)
+auth = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(auth)
+
+SECRET = b"test-signing-key"
+
+
+@pytest.fixture(autouse=True)
+def configured_keys(monkeypatch):
+    monkeypatch.setattr(auth, "auth_keys", '{"primary": "test-signing-key"}')
+    monkeypatch.setattr(auth, "key_set", auth.Key_set(300))
+    monkeypatch.setattr(auth, "result_cache", auth.Result_cache(300, 16))
+
+
+def authorizer_event(token):
+    return {"version": "2.0", "type": "REQUEST", "identitySource": [f"Bearer {token}"]}
+
+
+def valid_token(**claims):
+    return auth.sign_token({"sub": "admin", "exp": time.time() + 600, **claims}, "primary", SECRET)
+
+
+def test_valid_token_authorized():
+    res = auth.lambda_handler(authorizer_event(valid_token()), None)
+
+    assert res == {"isAuthorized": True, "context": {"sub": "admin"}}
+
+
+@pytest.mark.parametrize("token", [
+    valid_token()[:-4] + "AAAA",
+    auth.sign_token({"sub": "admin"}, "primary", b"wrong-key"),
+    auth.sign_token({"sub": "admin"}, "retired", SECRET),
+    auth.sign_token({"sub": "admin", "exp": time.time() - 3600}, "primary", SECRET),
+    auth.sign_token({"sub": "admin", "exp": "soon"}, "primary", SECRET),
+    auth.sign_token({"sub": "admin"}, "primary", SECRET),
+    auth.sign_token({"sub": "admin", "exp": float("inf")}, "primary", SECRET),
+    "not-a-token",
+    "88888",
+])
+def test_invalid_tokens_rejected(token):
+    assert auth.lambda_handler(authorizer_event(token), None)["isAuthorized"] is False
+
+
+def test_unexpected_issuer_rejected(monkeypatch):
+    monkeypatch.setattr(auth, "TOKEN_ISSUER", "blog-admin")
+
+    assert auth.lambda_handler(authorizer_event(valid_token(iss="blog-admin")), None)["isAuthorized"] is True
+    assert auth.lambda_handler(authorizer_event(valid_token(iss="blög-admin")), None)["isAuthorized"] is False
+    assert auth.lambda_handler(authorizer_event(valid_token()), None)["isAuthorized"] is False
+
+
+def test_missing_bearer_rejected():
+    assert auth.lambda_handler({"identitySource": ["Basic abc"]}, None)["isAuthorized"] is False
+    assert auth.lambda_handler({}, None)["isAuthorized"] is False
+
+
+def test_results_are_cached(monkeypatch):
+    token = valid_token()
+    calls = []
+    verify = auth.verify_token
+    monkeypatch.setattr(auth, "verify_token", lambda t: calls.append(t) or verify(t))
+
+    auth.lambda_handler(authorizer_event(token), None)
+    auth.lambda_handler(authorizer_event(token), None)
+
+    assert len(calls) == 1
+
+
+def test_key_set_reloads_after_ttl(monkeypatch):
+    key_set = auth.Key_set(0)
+    monkeypatch.setattr(auth, "key_set", key_set)
+    assert key_set.get("primary") == SECRET
+
+    monkeypatch.setattr(auth, "auth_keys", '{"rotated": "new-key"}')
+    time.sleep(0.01)
+
+    assert key_set.get("primary") is None
+    assert key_set.get("rotated") == b"new-key"
@@ -0,0 +1,138 @@
+import os
+import json
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+import boto3
+from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+logger = Logger(service="USER_MESSAGES")
+tracer = Tracer(service="USER_MESSAGES")
+
+user_message_sns_arn = os.environ["USER_MESSAGE_SNS_ARN"]
+# dedup keys delivered by this container are remembered for a while to drop retried double submits
+DEDUP_TTL_SECONDS = int(os.environ.get("MESSAGE_DEDUP_TTL_SECONDS", "3600"))
+DEDUP_MAX_ENTRIES = 1024
+# SNS subjects are limited to 100 characters
+MAX_SUBJECT_LENGTH = 100
+
+# LOCAL_ENDPOINT_URL sends the publish to a local stand-in such as moto_server
+sns = boto3.client('sns', endpoint_url=os.environ.get('LOCAL_ENDPOINT_URL') or None)
+
+
+class Recent_keys:
+    """
+    Bounded set of dedup keys seen recently in this container, oldest keys are dropped first
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, float]" = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        seen_at = self.entries.get(key)
+        if seen_at is None:
+            return False
+        if time.monotonic() - seen_at > self.ttl_seconds:
+            del self.entries[key]
+            return False
+        return True
+
+    def add(self, key: str) -> None:
+        self.entries[key] = time.monotonic()
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+recent_keys = Recent_keys(DEDUP_TTL_SECONDS, DEDUP_MAX_ENTRIES)
+
+
+def parse_record(record: dict) -> Optional[Dict[str, Any]]:
+    """
+    Queued message body, None when it can't be delivered and retrying won't help
+    """
+    try:
+        message = json.loads(record["body"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not isinstance(message, dict) or not message.get("message"):
+        return None
+    return message
+
+
+def unique_messages(records: List[dict]) -> List[Dict[str, Any]]:
+    """
+    Deliverable messages of the batch with duplicates removed, keeping the receipt order
+    """
+    messages = []
+    batch_keys = set()
+    for record in records:
+        message = parse_record(record)
+        if message is None:
+            logger.warning("Dropping malformed message", extra={"message_id": record.get("messageId")})
+            continue
+
+        key = message.get("dedup_key") or record.get("messageId")
+        if key in batch_keys or key in recent_keys:
+            logger.info("Dropping duplicate message", extra={"dedup_key": key})
+            continue
+        batch_keys.add(key)
+        messages.append({**message, "dedup_key": key})
+    return messages
+
+
+def format_message(message: Dict[str, Any]) -> str:
+    return json.dumps({
+        "name": message.get("name"),
+        "subject": message.get("subject"),
+        "message": message.get("message"),
+    })
+
+
+def digest(messages: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    One notification for the batch, a single message keeps the format sent before messages were queued
+    """
+    if len(messages) == 1:
+        return {
+            "Subject": f"New user message from {messages[0].get('name')}"[:MAX_SUBJECT_LENGTH],
+            "Message": format_message(messages[0]),
+        }
+
+    sections = [
+        f"From: {message.get('name')}\nSubject: {message.get('subject')}\n\n{message.get('message')}"
+        for message in messages
+    ]
+    return {
+        "Subject": f"{len(messages)} new user messages",
+        "Message": "\n\n----------\n\n".join(sections),
+    }
+
+
+@tracer.capture_method
+def publish(messages: List[Dict[str, Any]]) -> None:
+    sns.publish(TopicArn=user_message_sns_arn, **digest(messages))
+
+
+@logger.inject_lambda_context
+@tracer.capture_lambda_handler
+def lambda_handler(event: dict, context: LambdaContext):
+    records = event.get("Records", [])
+    messages = unique_messages(records)
+
+    if messages:
+        try:
+            publish(messages)
+        except Exception:
+            # the whole batch is retried, messages already delivered by other batches are dropped as duplicates
+            logger.exception("Could not publish user messages")
+            return {"batchItemFailures": [{"itemIdentifier": record["messageId"]} for record in records]}
+
+        for message in messages:
+            recent_keys.add(message["dedup_key"])
+
+    logger.info("Published user messages", extra={"received": len(records), "published": len(messages)})
+    return {"batchItemFailures": []}
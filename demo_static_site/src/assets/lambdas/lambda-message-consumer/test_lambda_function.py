@@ -0,0 +1,92 @@
+import importlib.util
+import json
+import os
+from dataclasses import dataclass
+
+import pytest
+
+os.environ.setdefault("USER_MESSAGE_SNS_ARN", "arn:aws:sns:us-east-1:123456789012:user-messages")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+# lambda-api also ships a lambda_function module, load this one under its own name
+spec = importlib.util.spec_from_file_location(
+    "message_consumer_lambda", os.path.join(os.path.dirname(__file__), "lambda_function.py")
+)
+consumer = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(consumer)
+
+
+@dataclass
+class LambdaContext:
+    function_name: str = "user_message_consumer"
+    function_version: str = "$LATEST"
+    invoked_function_arn: str = "arn:aws:lambda:us-east-1:123456789012:function:user_message_consumer"
+    memory_limit_in_mb: int = 128
+    aws_request_id: str = "1234-5678-9012"
+
+
+class FakeSns:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.published = []
+
+    def publish(self, **kwargs):
+        if self.fail:
+            raise RuntimeError("SNS unavailable")
+        self.published.append(kwargs)
+        return {"MessageId": str(len(self.published))}
+
+
+def sqs_record(message_id, name="Ted", subject="Hi", message="Hello", dedup_key=None):
+    body = {"name": name, "subject": subject, "message": message}
+    if dedup_key:
+        body["dedup_key"] = dedup_key
+    return {"messageId": message_id, "body": json.dumps(body)}
+
+
+@pytest.fixture
+def fake_sns(monkeypatch):
+    sns = FakeSns()
+    monkeypatch.setattr(consumer, "sns", sns)
+    monkeypatch.setattr(consumer, "recent_keys", consumer.Recent_keys(3600, 16))
+    return sns
+
+
+def test_single_message_keeps_format(fake_sns):
+    res = consumer.lambda_handler({"Records": [sqs_record("1", dedup_key="a")]}, LambdaContext())
+
+    assert res == {"batchItemFailures": []}
+    assert fake_sns.published[0]["Subject"] == "New user message from Ted"
+    assert json.loads(fake_sns.published[0]["Message"])["message"] == "Hello"
+
+
+def test_batch_is_digested_and_deduplicated(fake_sns):
+    records = [
+        sqs_record("1", message="First", dedup_key="a"),
+        sqs_record("2", message="First", dedup_key="a"),
+        sqs_record("3", message="Second", dedup_key="b"),
+        {"messageId": "4", "body": "not json"},
+    ]
+
+    consumer.lambda_handler({"Records": records}, LambdaContext())
+
+    assert len(fake_sns.published) == 1
+    assert fake_sns.published[0]["Subject"] == "2 new user messages"
+    assert "First" in fake_sns.published[0]["Message"]
+    assert "Second" in fake_sns.published[0]["Message"]
+
+
+def test_redelivered_message_is_dropped(fake_sns):
+    consumer.lambda_handler({"Records": [sqs_record("1", dedup_key="a")]}, LambdaContext())
+    consumer.lambda_handler({"Records": [sqs_record("2", dedup_key="a")]}, LambdaContext())
+
+    assert len(fake_sns.published) == 1
+
+
+def test_publish_failure_retries_batch(fake_sns):
+    fake_sns.fail = True
+
+    res = consumer.lambda_handler({"Records": [sqs_record("1", dedup_key="a"), sqs_record("2", dedup_key="b")]}, LambdaContext())
+
+    assert res["batchItemFailures"] == [{"itemIdentifier": "1"}, {"itemIdentifier": "2"}]
+    assert "a" not in consumer.recent_keys
@@ -17,6 +17,9 @@ from aws_cdk import (
     CustomResource,
     aws_sns as sns,
     aws_sns_subscriptions as subscriptions,
+    aws_sqs as sqs,
+    aws_lambda_event_sources as lambda_event_sources,
+    aws_secretsmanager as secretsmanager,
 )
 import os
 from constructs import Construct
@@ -66,6 +69,24 @@ class StaticSiteStack(Stack):
             subscriptions.EmailSubscription(props.project_email_address)
         )
 
+        # send_message only enqueues, the consumer lambda publishes to the topic in batches
+        user_message_dead_letter_queue = sqs.Queue(
+            self,
+            "StaticSiteUserMessagesDeadLetterQueue",
+            retention_period=Duration.days(14)
+        )
+
+        user_message_queue = sqs.Queue(
+            self,
+            "StaticSiteUserMessagesQueue",
+            # six times the consumer timeout plus the batching window, so a batch is not redelivered while it is still being published
+            visibility_timeout=Duration.seconds(6 * 30 + 60),
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=3,
+                queue=user_message_dead_letter_queue
+            )
+        )
+
         # Create an HTTP API Gateway
         http_api = apigatewayv2.HttpApi(
             self,
@@ -94,28 +115,72 @@ class StaticSiteStack(Stack):
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST
         )
 
-        # lambda_auth_role = iam.Role(
-        #     self,
-        #     "StaticSiteLambdaAuthRole",
-        #     assumed_by=iam.ServicePrincipal("lambda.amazonaws.com")
-        # )
+        # every post is written with feed="blog" so one index partition holds them newest first
+        blog_posts_index_name = "PostsByCreatedAt"
+        blog_post_dynamodb_table.add_global_secondary_index(
+            index_name=blog_posts_index_name,
+            partition_key=dynamodb.Attribute(
+                name="feed",
+                type=dynamodb.AttributeType.STRING
+            ),
+            sort_key=dynamodb.Attribute(
+                name="created_at",
+                type=dynamodb.AttributeType.STRING
+            ),
+            projection_type=dynamodb.ProjectionType.ALL
+        )
+
+        # {"kid": "secret"} map used to sign and verify admin tokens, add a kid to rotate
+        auth_keys_secret = secretsmanager.Secret(
+            self,
+            "StaticSiteAuthKeys",
+            description="HS256 signing keys for the static site API authorizer",
+            generate_secret_string=secretsmanager.SecretStringGenerator(
+                secret_string_template="{}",
+                generate_string_key="primary",
+                exclude_punctuation=True,
+                password_length=64
+            )
+        )
+
+        lambda_auth_role = iam.Role(
+            self,
+            "StaticSiteLambdaAuthRole",
+            assumed_by=iam.ServicePrincipal("lambda.amazonaws.com")
+        )
 
-        # lambda_auth_role.add_managed_policy(iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AWSLambdaBasicExecutionRole"))
+        lambda_auth_role.add_managed_policy(iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AWSLambdaBasicExecutionRole"))
 
         # Lambda authorizer
-        # auth_handler_code_location = os.path.join(os.getcwd(), "src/assets/lambdas/lambda-auth")
-        # auth_handler = lambda_.Function(
-        #     self, 'StaticSiteAuthLambda',
-        #     runtime=lambda_.Runtime.PYTHON_3_10,
-        #     handler='lambda_function.lambda_handler',
-        #     code=lambda_.Code.from_asset(auth_handler_code_location),
-        #     role=lambda_auth_role,
-        #     timeout=Duration.seconds(30)
-        # )
-
-        # authorizer = authorizers.HttpLambdaAuthorizer("SimpleAuthorizer", auth_handler,
-        #     response_types=[authorizers.HttpLambdaResponseType.SIMPLE]
-        # )
+        auth_handler_code_location = os.path.join(os.getcwd(), "src/assets/lambdas/lambda-auth")
+        auth_handler = lambda_.Function(
+            self, 'StaticSiteAuthLambda',
+            runtime=lambda_.Runtime.PYTHON_3_10,
+            handler='lambda_function.lambda_handler',
+            code=lambda_.Code.from_asset(auth_handler_code_location),
+            role=lambda_auth_role,
+            environment={
+                "AUTH_KEYS_SECRET_ARN": auth_keys_secret.secret_arn,
+                "KEY_CACHE_TTL_SECONDS": "300",
+                "RESULT_CACHE_TTL_SECONDS": "300"
+            },
+            timeout=Duration.seconds(30)
+        )
+
+        auth_keys_secret.grant_read(auth_handler)
+
+        # API Gateway caches the decision per Authorization header, so repeat callers skip the authorizer lambda
+        authorizer = authorizers.HttpLambdaAuthorizer("TokenAuthorizer", auth_handler,
+            response_types=[authorizers.HttpLambdaResponseType.SIMPLE],
+            identity_source=["$request.header.Authorization"],
+            results_cache_ttl=Duration.minutes(5)
+        )
+
+        powertools_layer = lambda_.LayerVersion.from_layer_version_arn(
+            self, 
+            "StaticSitePowertoolsLayer",
+            f"arn:aws:lambda:{props.region}:017000801446:layer:AWSLambdaPowertoolsPythonV2:78"
+        )
 
         api_code_location = os.path.join(os.getcwd(), "src/assets/lambdas/lambda-api")
         lambda_api = lambda_.Function(
@@ -124,24 +189,49 @@ class StaticSiteStack(Stack):
             runtime=lambda_.Runtime.PYTHON_3_10,
             handler="lambda_function.lambda_handler",
             code=lambda_.Code.from_asset(api_code_location),
-            layers=[
-                lambda_.LayerVersion.from_layer_version_arn(
-                    self, 
-                    "StaticSitePowertoolsLayer",
-                    f"arn:aws:lambda:{props.region}:017000801446:layer:AWSLambdaPowertoolsPythonV2:78"
-                )
-            ],
+            layers=[powertools_layer],
             environment={
                 "DDB_TABLE_NAME": blog_post_dynamodb_table.table_name,
+                "DDB_POSTS_INDEX_NAME": blog_posts_index_name,
                 "STATIC_SITE_URL": static_site_bucket.bucket_website_url,
-                "USER_MESSAGE_SNS_ARN": user_message_topic.topic_arn
+                "USER_MESSAGE_QUEUE_URL": user_message_queue.queue_url,
+                "POSTS_CACHE_TTL_SECONDS": "60",
+                "POSTS_CACHE_MAX_ENTRIES": "64"
             },
             timeout=Duration.seconds(30),
             tracing=lambda_.Tracing.ACTIVE
         )
 
         blog_post_dynamodb_table.grant_read_write_data(lambda_api)
-        user_message_topic.grant_publish(lambda_api)
+        user_message_queue.grant_send_messages(lambda_api)
+
+        message_consumer_code_location = os.path.join(os.getcwd(), "src/assets/lambdas/lambda-message-consumer")
+        lambda_message_consumer = lambda_.Function(
+            self,
+            "StaticSiteUserMessageConsumerLambda",
+            runtime=lambda_.Runtime.PYTHON_3_10,
+            handler="lambda_function.lambda_handler",
+            code=lambda_.Code.from_asset(message_consumer_code_location),
+            layers=[powertools_layer],
+            environment={
+                "USER_MESSAGE_SNS_ARN": user_message_topic.topic_arn,
+                "MESSAGE_DEDUP_TTL_SECONDS": "3600"
+            },
+            timeout=Duration.seconds(30),
+            tracing=lambda_.Tracing.ACTIVE
+        )
+
+        user_message_topic.grant_publish(lambda_message_consumer)
+
+        # wait up to a minute to fill a batch so bursts go out as one digest
+        lambda_message_consumer.add_event_source(
+            lambda_event_sources.SqsEventSource(
+                user_message_queue,
+                batch_size=10,
+                max_batching_window=Duration.seconds(60),
+                report_batch_item_failures=True
+            )
+        )
 
         lambda_integration = integrations.HttpLambdaIntegration(
             "StaticSiteLambdaIntegration",
@@ -152,21 +242,35 @@ class StaticSiteStack(Stack):
             path="/get_posts",
             methods=[apigatewayv2.HttpMethod.GET],
             integration=lambda_integration,
-            # authorizer=authorizer
+            # public, called by the static site without a token
+        )
+
+        http_api.add_routes(
+            path="/posts/{post_id}",
+            methods=[apigatewayv2.HttpMethod.GET],
+            integration=lambda_integration,
+            # public, called by the static site without a token
         )
 
         http_api.add_routes(
             path="/add_post",
             methods=[apigatewayv2.HttpMethod.POST],
             integration=lambda_integration,
-            # authorizer=authorizer
+            authorizer=authorizer
+        )
+
+        http_api.add_routes(
+            path="/add_posts",
+            methods=[apigatewayv2.HttpMethod.POST],
+            integration=lambda_integration,
+            authorizer=authorizer
         )
 
         http_api.add_routes(
             path="/send_message",
             methods=[apigatewayv2.HttpMethod.POST],
             integration=lambda_integration,
-            # authorizer=authorizer
+            # public, called by the static site without a token
         )
 
         #lambda function role
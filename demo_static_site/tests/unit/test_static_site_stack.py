@@ -0,0 +1,65 @@
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+
+from src.config.configuration_assets import ApplicationProps
+from src.stacks.static_site_stack import StaticSiteStack
+
+
+def synth_static_site_stack():
+    app = core.App()
+    props = ApplicationProps("configs/example_config.yaml")
+    stack = StaticSiteStack(app, "static-site", props=props)
+    return assertions.Template.from_stack(stack)
+
+
+def test_blog_posts_created_at_index():
+    template = synth_static_site_stack()
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "GlobalSecondaryIndexes": [{
+            "IndexName": "PostsByCreatedAt",
+            "KeySchema": [
+                {"AttributeName": "feed", "KeyType": "HASH"},
+                {"AttributeName": "created_at", "KeyType": "RANGE"},
+            ],
+            "Projection": {"ProjectionType": "ALL"},
+        }]
+    })
+    template.has_resource_properties("AWS::ApiGatewayV2::Route", {
+        "RouteKey": "GET /posts/{post_id}"
+    })
+
+
+def test_user_messages_are_queued():
+    template = synth_static_site_stack()
+
+    template.resource_count_is("AWS::SQS::Queue", 2)
+    template.has_resource_properties("AWS::Lambda::EventSourceMapping", {
+        "BatchSize": 10,
+        "MaximumBatchingWindowInSeconds": 60,
+        "FunctionResponseTypes": ["ReportBatchItemFailures"],
+    })
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({
+            "USER_MESSAGE_QUEUE_URL": assertions.Match.any_value()
+        })}
+    })
+
+
+def test_write_routes_use_cached_token_authorizer():
+    template = synth_static_site_stack()
+
+    template.has_resource_properties("AWS::ApiGatewayV2::Authorizer", {
+        "AuthorizerType": "REQUEST",
+        "IdentitySource": ["$request.header.Authorization"],
+        "AuthorizerResultTtlInSeconds": 300,
+        "EnableSimpleResponses": True,
+    })
+    template.has_resource_properties("AWS::ApiGatewayV2::Route", {
+        "RouteKey": "POST /add_post",
+        "AuthorizationType": "CUSTOM",
+    })
+    template.has_resource_properties("AWS::ApiGatewayV2::Route", {
+        "RouteKey": "GET /get_posts",
+        "AuthorizationType": "NONE",
+    })